@@ -46,6 +46,9 @@ class Settings(BaseSettings):
     # Rate Limiting
     rate_limit_per_minute: int = Field(default=60, alias="RATE_LIMIT_PER_MINUTE")
     
+    # Request bodies (cap applies after decompression)
+    max_request_body_bytes: int = Field(default=10 * 1024 * 1024, alias="MAX_REQUEST_BODY_BYTES")
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -0,0 +1,102 @@
+"""
+Content-addressed storage for retrieved documents
+
+Evaluations reference retrieved chunks by SHA-256 hash; each chunk's text is
+stored once per user in the `documents` table.
+"""
+import hashlib
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+
+def doc_hash(text: str) -> str:
+    """SHA-256 hex digest of a document's UTF-8 text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def store_documents(
+    db,
+    user_id: str,
+    eval_list: List[dict],
+    documents: Optional[Dict[str, str]] = None
+) -> List[dict]:
+    """
+    Store retrieved chunks once and make evaluation rows reference them by hash
+
+    Rows that carry full `retrieved_docs` text (older SDKs, /metrics) are
+    converted to hashes as well, so the text is never stored per evaluation.
+
+    Args:
+        db: Supabase client
+        user_id: Owner of the evaluations and documents
+        eval_list: Evaluation rows to insert (modified in place)
+        documents: Chunks sent with the request, keyed by hash
+
+    Returns:
+        list: The evaluation rows, with retrieved_doc_hashes set and retrieved_docs cleared
+
+    Raises:
+        HTTPException: 400 if a document does not match its hash, 409 (with
+            `missing_hashes`) if a referenced hash is neither sent nor stored
+    """
+    new_docs = {}
+    for hash_, text in (documents or {}).items():
+        if doc_hash(text) != hash_:
+            raise HTTPException(status_code=400, detail=f"Document content does not match hash {hash_}")
+        new_docs[hash_] = text
+
+    referenced = set()
+    for row in eval_list:
+        texts = row.get("retrieved_docs")
+        if texts:
+            hashes = [doc_hash(text) for text in texts]
+            new_docs.update(zip(hashes, texts))
+            row["retrieved_doc_hashes"] = hashes
+        row["retrieved_docs"] = None
+        referenced.update(row.get("retrieved_doc_hashes") or [])
+
+    if new_docs:
+        db.table("documents").upsert(
+            [{"user_id": user_id, "hash": h, "content": text} for h, text in new_docs.items()],
+            on_conflict="user_id,hash",
+            ignore_duplicates=True
+        ).execute()
+
+    unknown = referenced - new_docs.keys()
+    if unknown:
+        result = db.table("documents")\
+            .select("hash")\
+            .eq("user_id", user_id)\
+            .in_("hash", list(unknown))\
+            .execute()
+        missing = sorted(unknown - {row["hash"] for row in result.data})
+        if missing:
+            raise HTTPException(
+                status_code=409,
+                detail={
+                    "message": "Unknown document hashes; resend them in 'documents'",
+                    "missing_hashes": missing
+                }
+            )
+
+    return eval_list
+
+
+def resolve_documents(db, user_id: str, rows: List[dict]) -> List[dict]:
+    """Fill `retrieved_docs` from `retrieved_doc_hashes` for evaluation rows read back"""
+    hashes = {h for row in rows if not row.get("retrieved_docs") for h in (row.get("retrieved_doc_hashes") or [])}
+    if not hashes:
+        return rows
+
+    result = db.table("documents")\
+        .select("hash,content")\
+        .eq("user_id", user_id)\
+        .in_("hash", list(hashes))\
+        .execute()
+    contents = {doc["hash"]: doc["content"] for doc in result.data}
+
+    for row in rows:
+        if not row.get("retrieved_docs") and row.get("retrieved_doc_hashes"):
+            row["retrieved_docs"] = [contents.get(h, "") for h in row["retrieved_doc_hashes"]]
+    return rows
@@ -0,0 +1,135 @@
+"""
+Request body decompression middleware
+"""
+import json
+import zlib
+
+
+class BodyTooLarge(Exception):
+    """Request body exceeds the configured size cap"""
+
+
+class RequestDecompressionMiddleware:
+    """
+    Decompress request bodies sent with `Content-Encoding: gzip`, `deflate` or `zstd`
+
+    Implemented as a plain ASGI middleware so the decompressed body can be
+    substituted before routing. Both the compressed body and its decompressed
+    form are capped at `max_body_bytes` (413), and decompression stops as soon
+    as the cap is crossed, so a small compressed body cannot expand into an
+    unbounded allocation. zstd needs the `zstandard` package; without it, zstd
+    bodies are rejected with 415 like any other unknown encoding.
+    """
+
+    def __init__(self, app, max_body_bytes: int = 10 * 1024 * 1024):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = list(scope["headers"])
+        encoding = next(
+            (v.decode("latin-1").strip().lower() for k, v in headers if k == b"content-encoding"),
+            None
+        )
+        if encoding in (None, "", "identity"):
+            return await self.app(scope, receive, send)
+
+        if encoding not in self.supported_encodings():
+            return await self._reject(send, 415, f"Unsupported Content-Encoding: {encoding}")
+
+        try:
+            compressed = await self._read_body(receive)
+            if compressed is None:
+                return  # client disconnected
+            body = self._decompress(encoding, compressed)
+        except BodyTooLarge:
+            return await self._reject(send, 413, f"Request body exceeds {self.max_body_bytes} bytes")
+        except (zlib.error, ValueError) as e:
+            return await self._reject(send, 400, f"Malformed {encoding} body: {e}")
+
+        scope = dict(scope)
+        scope["headers"] = [
+            (k, v) for k, v in headers if k not in (b"content-encoding", b"content-length")
+        ] + [(b"content-length", str(len(body)).encode("latin-1"))]
+
+        delivered = False
+
+        async def replay():
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self.app(scope, replay, send)
+
+    @staticmethod
+    def supported_encodings():
+        """Content encodings this server can decode"""
+        encodings = {"gzip", "x-gzip", "deflate"}
+        try:
+            import zstandard  # noqa: F401
+            encodings.add("zstd")
+        except ImportError:
+            pass
+        return encodings
+
+    async def _read_body(self, receive):
+        """Collect the compressed body, enforcing the size cap"""
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                raise BodyTooLarge()
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                return b"".join(chunks)
+
+    def _decompress(self, encoding: str, data: bytes) -> bytes:
+        """Decompress at most max_body_bytes, raising BodyTooLarge beyond that"""
+        limit = self.max_body_bytes
+        if encoding == "zstd":
+            import zstandard
+            chunks, size = [], 0
+            try:
+                with zstandard.ZstdDecompressor().stream_reader(data) as reader:
+                    while True:
+                        chunk = reader.read(min(65536, limit - size + 1))
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        if size > limit:
+                            raise BodyTooLarge()
+                        chunks.append(chunk)
+            except zstandard.ZstdError as e:
+                raise ValueError(str(e)) from e
+            return b"".join(chunks)
+
+        # wbits 32+: accept both gzip and zlib ("deflate") framing
+        inflater = zlib.decompressobj(32 + zlib.MAX_WBITS)
+        body = inflater.decompress(data, limit + 1)
+        if len(body) > limit:
+            raise BodyTooLarge()
+        if not inflater.eof:
+            raise ValueError("truncated stream")
+        return body
+
+    @staticmethod
+    async def _reject(send, status: int, detail: str):
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1"))
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -2,7 +2,7 @@
 Pydantic models for evaluation data
 """
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic import BaseModel, Field
 
 
@@ -11,20 +11,44 @@ class EvaluationCreate(BaseModel):
     prompt: str = Field(..., description="The user prompt/question")
     response: str = Field(..., description="The LLM response")
     retrieved_docs: Optional[List[str]] = Field(None, description="Retrieved documents (RAG mode)")
+    retrieved_doc_hashes: Optional[List[str]] = Field(
+        None,
+        description="SHA-256 hashes of the retrieved documents, in place of retrieved_docs; "
+                    "texts the server has not stored yet go in the batch's 'documents'"
+    )
     
     # Metrics
-    semantic_drift: float = Field(..., ge=0, le=1)
+    semantic_drift: Optional[float] = Field(
+        ..., ge=0, le=1,
+        description="Prompt/response drift, or null when the embedding stage missed its deadline"
+    )
     uncertainty: float = Field(..., ge=0, le=1)
-    factual_support: float = Field(..., ge=0, le=1)
+    factual_support: Optional[float] = Field(
+        ..., ge=0, le=1,
+        description="Judge score, or null when the judge was skipped or missed its deadline"
+    )
     hallucination_probability: float = Field(..., ge=0, le=1)
     hallucinated: bool
     
     # Performance
-    latency_sec: float = Field(..., gt=0)
+    latency_sec: float = Field(..., ge=0)
     throughput_qps: Optional[float] = None
+    stage_timings: Optional[Dict[str, float]] = Field(
+        None, description="Seconds spent per stage, e.g. embedding_sec, judge_sec, fusion_sec"
+    )
+    
+    # Sampling
+    sample_weight: float = Field(
+        1.0, gt=0, description="Inverse of the probability this evaluation was sampled"
+    )
     
     # Metadata
     mode: str = Field(..., description="Detection mode: 'retrieved-doc entailment' or 'self-check'")
+    decision_tier: Optional[str] = Field(
+        None,
+        description="Which tier decided the verdict: 'judge', 'cheap' (drift + uncertainty) "
+                    "or 'partial' (a stage missed its deadline)"
+    )
     model_name: Optional[str] = Field(None, description="Name of the LLM model used")
     agent_name: Optional[str] = Field(None, description="Name of the agent")
     session_id: Optional[str] = Field(None, description="Session identifier for batch tracking")
@@ -42,6 +66,7 @@ class EvaluationCreate(BaseModel):
                 "hallucinated": False,
                 "latency_sec": 0.42,
                 "throughput_qps": 2.38,
+                "stage_timings": {"embedding_sec": 0.09, "judge_sec": 0.33, "fusion_sec": 0.0001},
                 "mode": "self-check",
                 "model_name": "gpt-4o-mini",
                 "agent_name": "qa_assistant"
@@ -59,14 +84,18 @@ class EvaluationResponse(BaseModel):
     prompt: str
     response: str
     retrieved_docs: Optional[List[str]]
-    semantic_drift: float
+    retrieved_doc_hashes: Optional[List[str]] = None
+    semantic_drift: Optional[float]
     uncertainty: float
-    factual_support: float
+    factual_support: Optional[float]
     hallucination_probability: float
     hallucinated: bool
     latency_sec: float
     throughput_qps: Optional[float]
+    stage_timings: Optional[Dict[str, float]] = None
+    sample_weight: Optional[float] = 1.0
     mode: str
+    decision_tier: Optional[str] = None
     model_name: Optional[str]
     agent_name: Optional[str]
     session_id: Optional[str]
@@ -82,6 +111,7 @@ class EvaluationStats(BaseModel):
     avg_semantic_drift: float
     avg_uncertainty: float
     avg_factual_support: float
+    avg_stage_timings: Dict[str, float] = Field(default_factory=dict)
     
     class Config:
         json_schema_extra = {
@@ -93,7 +123,8 @@ class EvaluationStats(BaseModel):
                 "avg_throughput": 1.92,
                 "avg_semantic_drift": 0.23,
                 "avg_uncertainty": 0.15,
-                "avg_factual_support": 0.82
+                "avg_factual_support": 0.82,
+                "avg_stage_timings": {"embedding_sec": 0.11, "judge_sec": 0.38, "fusion_sec": 0.0001}
             }
         }
 
@@ -101,6 +132,9 @@ class EvaluationStats(BaseModel):
 class BatchEvaluationRequest(BaseModel):
     """Request model for batch evaluation"""
     evaluations: List[EvaluationCreate] = Field(..., min_length=1, max_length=100)
+    documents: Optional[Dict[str, str]] = Field(
+        None, description="Retrieved document texts keyed by SHA-256 hash, sent once per document"
+    )
     
     class Config:
         json_schema_extra = {
@@ -13,6 +13,7 @@ from ..models.evaluation import (
     BatchEvaluationRequest
 )
 from ..core.database import get_service_db
+from ..core.documents import store_documents, resolve_documents
 from ..core.security import verify_api_key, get_current_user
 
 router = APIRouter(prefix="/evaluations", tags=["evaluations"])
@@ -37,6 +38,7 @@ async def create_evaluation(
         eval_data = evaluation.model_dump()
         eval_data["user_id"] = user_info["user_id"]
         eval_data["created_at"] = datetime.utcnow().isoformat()
+        store_documents(db, user_info["user_id"], [eval_data])
         
         # Insert into database
         result = db.table("evaluations").insert(eval_data).execute()
@@ -69,6 +71,11 @@ async def create_batch_evaluations(
     Create multiple evaluations in a single request
     
     Useful for batch processing and session-based tracking.
+    
+    Evaluations may reference retrieved chunks by SHA-256 hash
+    (`retrieved_doc_hashes`) and send only chunks the server has not stored
+    yet in `documents`. Unknown hashes are answered with 409 and the list of
+    `missing_hashes`, so the client can resend them.
     """
     try:
         # Verify API key
@@ -82,6 +89,9 @@ async def create_batch_evaluations(
             eval_data["created_at"] = datetime.utcnow().isoformat()
             eval_list.append(eval_data)
         
+        # Store each retrieved chunk once; rows keep only its hash
+        store_documents(db, user_info["user_id"], eval_list, batch.documents)
+        
         # Batch insert
         result = db.table("evaluations").insert(eval_list).execute()
         
@@ -143,7 +153,7 @@ async def list_evaluations(
         
         result = query.execute()
         
-        return result.data
+        return resolve_documents(db, user_info["user_id"], result.data)
     
     except HTTPException:
         raise
@@ -195,25 +205,48 @@ async def get_evaluation_stats(
                 avg_factual_support=0.0
             )
         
-        # Calculate statistics
+        # Calculate statistics, weighting each row by its sample weight so that
+        # sampled traffic yields unbiased rates and averages
         total = len(evaluations)
+        weights = [e.get("sample_weight") or 1.0 for e in evaluations]
+        total_weight = sum(weights)
+        
+        def weighted_avg(field):
+            pairs = [(e[field], w) for e, w in zip(evaluations, weights) if e.get(field) is not None]
+            pair_weight = sum(w for _, w in pairs)
+            return sum(v * w for v, w in pairs) / pair_weight if pair_weight else 0.0
+        
         hallucinations = sum(1 for e in evaluations if e["hallucinated"])
+        hallucination_rate = sum(w for e, w in zip(evaluations, weights) if e["hallucinated"]) / total_weight
+        
+        avg_latency = weighted_avg("latency_sec")
+        avg_throughput = weighted_avg("throughput_qps")
+        # semantic_drift and factual_support are null when a stage was skipped or timed out
+        avg_drift = weighted_avg("semantic_drift")
+        avg_uncertainty = weighted_avg("uncertainty")
+        avg_factual = weighted_avg("factual_support")
         
-        avg_latency = sum(e["latency_sec"] for e in evaluations) / total
-        avg_throughput = sum(e.get("throughput_qps", 0) or 0 for e in evaluations) / total
-        avg_drift = sum(e["semantic_drift"] for e in evaluations) / total
-        avg_uncertainty = sum(e["uncertainty"] for e in evaluations) / total
-        avg_factual = sum(e["factual_support"] for e in evaluations) / total
+        # Per-stage latency: each stage is averaged over the rows that report it
+        stage_totals = {}
+        for e, w in zip(evaluations, weights):
+            for stage, seconds in (e.get("stage_timings") or {}).items():
+                total_sec, stage_weight = stage_totals.get(stage, (0.0, 0.0))
+                stage_totals[stage] = (total_sec + seconds * w, stage_weight + w)
+        avg_stage_timings = {
+            stage: round(total_sec / stage_weight, 4)
+            for stage, (total_sec, stage_weight) in stage_totals.items()
+        }
         
         return EvaluationStats(
             total_evaluations=total,
             total_hallucinations=hallucinations,
-            hallucination_rate=round(hallucinations / total, 4),
+            hallucination_rate=round(hallucination_rate, 4),
             avg_latency=round(avg_latency, 4),
             avg_throughput=round(avg_throughput, 4),
             avg_semantic_drift=round(avg_drift, 4),
             avg_uncertainty=round(avg_uncertainty, 4),
-            avg_factual_support=round(avg_factual, 4)
+            avg_factual_support=round(avg_factual, 4),
+            avg_stage_timings=avg_stage_timings
         )
     
     except HTTPException:
@@ -246,7 +279,7 @@ async def get_evaluation(
         if not result.data:
             raise HTTPException(status_code=404, detail="Evaluation not found")
         
-        return result.data[0]
+        return resolve_documents(db, user_info["user_id"], result.data)[0]
     
     except HTTPException:
         raise
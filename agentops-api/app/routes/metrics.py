@@ -8,6 +8,7 @@ from loguru import logger
 
 from ..models.evaluation import EvaluationCreate
 from ..core.database import get_service_db
+from ..core.documents import store_documents
 from ..core.security import verify_api_key
 
 router = APIRouter(tags=["metrics"])
@@ -33,6 +34,7 @@ async def create_metric(
         eval_data = evaluation.model_dump()
         eval_data["user_id"] = user_info["user_id"]
         eval_data["created_at"] = datetime.utcnow().isoformat()
+        store_documents(db, user_info["user_id"], [eval_data])
         
         # Insert into database
         result = db.table("evaluations").insert(eval_data).execute()
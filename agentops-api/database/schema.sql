@@ -35,21 +35,27 @@ CREATE TABLE IF NOT EXISTS evaluations (
     -- Input data
     prompt TEXT NOT NULL,
     response TEXT NOT NULL,
-    retrieved_docs TEXT[],
+    retrieved_docs TEXT[],  -- legacy rows only; new rows reference documents by hash
+    retrieved_doc_hashes TEXT[],  -- SHA-256 hashes into documents
     
     -- Metrics
-    semantic_drift FLOAT NOT NULL CHECK (semantic_drift >= 0 AND semantic_drift <= 1),
+    semantic_drift FLOAT CHECK (semantic_drift >= 0 AND semantic_drift <= 1),  -- NULL when embeddings missed their deadline
     uncertainty FLOAT NOT NULL CHECK (uncertainty >= 0 AND uncertainty <= 1),
-    factual_support FLOAT NOT NULL CHECK (factual_support >= 0 AND factual_support <= 1),
+    factual_support FLOAT CHECK (factual_support >= 0 AND factual_support <= 1),  -- NULL when the judge was skipped
     hallucination_probability FLOAT NOT NULL CHECK (hallucination_probability >= 0 AND hallucination_probability <= 1),
     hallucinated BOOLEAN NOT NULL,
     
     -- Performance
     latency_sec FLOAT NOT NULL,
     throughput_qps FLOAT,
+    stage_timings JSONB,  -- seconds per stage, e.g. {"embedding_sec": 0.1, "judge_sec": 0.4}
+    
+    -- Sampling (inverse probability of the evaluation being sampled)
+    sample_weight FLOAT NOT NULL DEFAULT 1.0 CHECK (sample_weight > 0),
     
     -- Metadata
     mode VARCHAR(50) NOT NULL,
+    decision_tier VARCHAR(20),
     model_name VARCHAR(100),
     agent_name VARCHAR(100),
     session_id VARCHAR(255),
@@ -59,6 +65,23 @@ CREATE TABLE IF NOT EXISTS evaluations (
     CONSTRAINT fk_user FOREIGN KEY (user_id) REFERENCES users(id)
 );
 
+-- Retrieved documents, stored once per user and referenced by hash
+CREATE TABLE IF NOT EXISTS documents (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    hash CHAR(64) NOT NULL,  -- SHA-256 of content
+    content TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (user_id, hash)
+);
+
+-- Upgrades for databases created from an earlier version of this schema
+ALTER TABLE evaluations ALTER COLUMN factual_support DROP NOT NULL;
+ALTER TABLE evaluations ALTER COLUMN semantic_drift DROP NOT NULL;
+ALTER TABLE evaluations ADD COLUMN IF NOT EXISTS decision_tier VARCHAR(20);
+ALTER TABLE evaluations ADD COLUMN IF NOT EXISTS sample_weight FLOAT NOT NULL DEFAULT 1.0 CHECK (sample_weight > 0);
+ALTER TABLE evaluations ADD COLUMN IF NOT EXISTS stage_timings JSONB;
+ALTER TABLE evaluations ADD COLUMN IF NOT EXISTS retrieved_doc_hashes TEXT[];
+
 -- Indexes for common queries
 CREATE INDEX IF NOT EXISTS idx_evaluations_user_id ON evaluations(user_id);
 CREATE INDEX IF NOT EXISTS idx_evaluations_created_at ON evaluations(created_at DESC);
@@ -74,6 +97,7 @@ CREATE INDEX IF NOT EXISTS idx_api_keys_key ON api_keys(key);
 ALTER TABLE users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE api_keys ENABLE ROW LEVEL SECURITY;
 ALTER TABLE evaluations ENABLE ROW LEVEL SECURITY;
+ALTER TABLE documents ENABLE ROW LEVEL SECURITY;
 
 -- Users can read their own data
 CREATE POLICY users_select_own ON users
@@ -95,6 +119,11 @@ CREATE POLICY evaluations_all_own ON evaluations
     FOR ALL
     USING (auth.uid() = user_id);
 
+-- Users can manage their own documents
+CREATE POLICY documents_all_own ON documents
+    FOR ALL
+    USING (auth.uid() = user_id);
+
 -- Service role can do everything (bypasses RLS)
 -- This is handled by using the service_role key in the application
 
@@ -121,16 +150,17 @@ SELECT
     DATE(created_at) as date,
     COUNT(*) as total_evaluations,
     SUM(CASE WHEN hallucinated THEN 1 ELSE 0 END) as total_hallucinations,
-    AVG(hallucination_probability) as avg_hallucination_prob,
-    AVG(latency_sec) as avg_latency,
-    AVG(throughput_qps) as avg_throughput,
-    AVG(semantic_drift) as avg_semantic_drift,
-    AVG(uncertainty) as avg_uncertainty,
-    AVG(factual_support) as avg_factual_support
+    -- Averages are weighted by sample_weight so sampled traffic stays unbiased
+    SUM(hallucination_probability * sample_weight) / SUM(sample_weight) as avg_hallucination_prob,
+    SUM(latency_sec * sample_weight) / SUM(sample_weight) as avg_latency,
+    SUM(throughput_qps * sample_weight) / NULLIF(SUM(CASE WHEN throughput_qps IS NOT NULL THEN sample_weight END), 0) as avg_throughput,
+    SUM(semantic_drift * sample_weight) / NULLIF(SUM(CASE WHEN semantic_drift IS NOT NULL THEN sample_weight END), 0) as avg_semantic_drift,
+    SUM(uncertainty * sample_weight) / SUM(sample_weight) as avg_uncertainty,
+    SUM(factual_support * sample_weight) / NULLIF(SUM(CASE WHEN factual_support IS NOT NULL THEN sample_weight END), 0) as avg_factual_support,
+    SUM(sample_weight) as estimated_total_requests
 FROM evaluations
 GROUP BY user_id, agent_name, DATE(created_at);
 
 -- Grant permissions
 GRANT SELECT ON evaluation_analytics TO authenticated;
 GRANT SELECT ON evaluation_analytics TO service_role;
-
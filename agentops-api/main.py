@@ -12,6 +12,7 @@ from contextlib import asynccontextmanager
 
 from app.core.config import settings
 from app.routes import evaluations, auth, health, api_keys, metrics
+from app.middleware.decompression import RequestDecompressionMiddleware
 
 
 # Configure logging
@@ -60,6 +61,13 @@ app.add_middleware(
 )
 
 
+# Compressed request bodies (SDK batch uploads)
+app.add_middleware(
+    RequestDecompressionMiddleware,
+    max_body_bytes=settings.max_request_body_bytes,
+)
+
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
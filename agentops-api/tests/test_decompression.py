@@ -0,0 +1,83 @@
+"""
+Tests for request body decompression middleware
+"""
+import gzip
+import json
+import zlib
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.middleware.decompression import RequestDecompressionMiddleware
+
+
+async def echo_app(scope, receive, send):
+    """Minimal ASGI app returning the body and headers it received"""
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    headers = {k.decode(): v.decode() for k, v in scope["headers"]}
+    payload = json.dumps({"body": body.decode(), "headers": headers}).encode()
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": payload})
+
+
+def make_client(max_body_bytes=1024):
+    app = RequestDecompressionMiddleware(echo_app, max_body_bytes=max_body_bytes)
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_gzip_body_is_decompressed():
+    raw = json.dumps({"evaluations": [{"prompt": "Q?"}] * 5}).encode()
+    async with make_client() as client:
+        response = await client.post(
+            "/evaluations/batch",
+            content=gzip.compress(raw),
+            headers={"Content-Encoding": "gzip", "Content-Type": "application/json"}
+        )
+    data = response.json()
+    assert response.status_code == 200
+    assert data["body"] == raw.decode()
+    assert "content-encoding" not in data["headers"]
+    assert data["headers"]["content-length"] == str(len(raw))
+
+
+@pytest.mark.asyncio
+async def test_deflate_body_is_decompressed():
+    async with make_client() as client:
+        response = await client.post("/", content=zlib.compress(b"hello"),
+                                     headers={"Content-Encoding": "deflate"})
+    assert response.json()["body"] == "hello"
+
+
+@pytest.mark.asyncio
+async def test_plain_body_passes_through():
+    async with make_client() as client:
+        response = await client.post("/", content=b"plain")
+    assert response.json()["body"] == "plain"
+
+
+@pytest.mark.asyncio
+async def test_decompression_bomb_is_rejected():
+    bomb = gzip.compress(b"\0" * 100_000)
+    assert len(bomb) < 1024
+    async with make_client(max_body_bytes=1024) as client:
+        response = await client.post("/", content=bomb, headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_malformed_and_unknown_encodings_are_rejected():
+    async with make_client() as client:
+        malformed = await client.post("/", content=b"not gzip", headers={"Content-Encoding": "gzip"})
+        truncated = await client.post("/", content=gzip.compress(b"x" * 100)[:-10],
+                                      headers={"Content-Encoding": "gzip"})
+        unknown = await client.post("/", content=b"data", headers={"Content-Encoding": "br"})
+    assert malformed.status_code == 400
+    assert truncated.status_code == 400
+    assert unknown.status_code == 415
@@ -5,20 +5,102 @@ Monitor hallucinations, latency, and throughput for production LLM systems.
 """
 
 from .client import AgentOps
+from .async_client import AsyncAgentOps
+from .uncertainty import UncertaintyScorer
+from .deadlines import StagePolicy, DeadlineExceeded
+from .metrics import DDSketch
+from .uploader import BatchUploader, UploadRejected
+from .transport import HttpPool
+from .spool import UploadSpool
+from .sampling import (
+    Sampler,
+    RateSampler,
+    ReservoirSampler,
+    StratifiedSampler,
+    AdaptiveSampler,
+)
 from .detector_flexible import (
     detect_hallucination,
+    adetect_hallucination,
+    StreamingDetection,
     reset_throughput_tracker,
     get_throughput_stats,
+    get_latency_sketch,
     uncertainty_score,
+    set_uncertainty_scorer,
+    configure_embedding_cache,
+    reset_embedding_cache,
+    get_embedding_cache_stats,
+    configure_embedding_batching,
+    configure_verdict_cache,
+    clear_verdict_cache,
+    get_verdict_cache_stats,
+    get_openai_client,
+    set_openai_client,
+    openai_clients,
+    resolve_openai_clients,
+    Embedder,
+    OpenAIEmbedder,
+    HashingEmbedder,
+    set_embedder,
+    get_embedder,
+    normalize_rows,
+    batch_cosine,
+    semantic_drift_batch,
+    select_evidence,
+    judge_many,
+    configure_stage_policy,
+    get_stage_policy_stats,
 )
 
 __version__ = "0.2.2"
 
 __all__ = [
     "AgentOps",
+    "AsyncAgentOps",
     "detect_hallucination",
+    "adetect_hallucination",
+    "StreamingDetection",
     "reset_throughput_tracker",
     "get_throughput_stats",
+    "get_latency_sketch",
+    "DDSketch",
     "uncertainty_score",
+    "set_uncertainty_scorer",
+    "UncertaintyScorer",
+    "Sampler",
+    "RateSampler",
+    "ReservoirSampler",
+    "StratifiedSampler",
+    "AdaptiveSampler",
+    "configure_embedding_cache",
+    "reset_embedding_cache",
+    "get_embedding_cache_stats",
+    "configure_embedding_batching",
+    "configure_verdict_cache",
+    "clear_verdict_cache",
+    "get_verdict_cache_stats",
+    "get_openai_client",
+    "set_openai_client",
+    "openai_clients",
+    "resolve_openai_clients",
+    "Embedder",
+    "OpenAIEmbedder",
+    "HashingEmbedder",
+    "set_embedder",
+    "get_embedder",
+    "normalize_rows",
+    "batch_cosine",
+    "semantic_drift_batch",
+    "select_evidence",
+    "judge_many",
+    "configure_stage_policy",
+    "get_stage_policy_stats",
+    "StagePolicy",
+    "DeadlineExceeded",
+    "BatchUploader",
+    "UploadRejected",
+    "HttpPool",
+    "UploadSpool",
 ]
 
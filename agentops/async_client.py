@@ -0,0 +1,412 @@
+"""
+AgentOps asyncio client
+
+Async counterpart of AgentOps for services running on an event loop:
+evaluations run as tasks under a concurrency limit, uploads go through an
+asyncio queue and one pooled HTTP client, and sessions are tracked per task.
+"""
+
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+from loguru import logger
+
+from .client import _ClientCore, _SkippedStream
+from .detector_flexible import (
+    adetect_hallucination,
+    StreamingDetection,
+    openai_clients,
+    resolve_openai_clients
+)
+from .documents import BatchUpload, KnownDocuments
+from .transport import BodyEncoder, HttpPool
+from .uploader import AsyncBatchUploader
+
+# Sessions of every AsyncAgentOps instance, keyed per instance. Each task
+# sees the sessions of the context it was created in; start_session() swaps
+# in a new mapping, so sibling tasks never share a session.
+_sessions = ContextVar("agentops_sessions", default={})
+
+
+class _Session:
+    """Per-task session counters."""
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.started_at = time.time()
+        self.evaluations = 0
+        self.hallucinations = 0
+        self.latency_sec = 0.0
+
+    def record(self, result):
+        if result.get("hallucinated") is None:
+            return
+        self.evaluations += 1
+        self.hallucinations += bool(result["hallucinated"])
+        self.latency_sec += result.get("latency_sec") or 0.0
+
+    def stats(self):
+        return {
+            "session_id": self.session_id,
+            "evaluations": self.evaluations,
+            "hallucinations": self.hallucinations,
+            "hallucination_rate": round(self.hallucinations / self.evaluations, 4) if self.evaluations else 0.0,
+            "avg_latency_sec": round(self.latency_sec / self.evaluations, 4) if self.evaluations else 0.0,
+            "duration_sec": round(time.time() - self.started_at, 3)
+        }
+
+
+class AsyncAgentOps(_ClientCore):
+    """
+    AgentOps client for asyncio applications.
+
+    Mirrors AgentOps with coroutine methods. Evaluations share one
+    concurrency limit; uploads are queued and sent in batches by a
+    background task over a pooled `httpx.AsyncClient`. Use it as an async
+    context manager (or call `close()`) so queued uploads are sent before
+    the event loop stops. An instance is bound to the event loop it is
+    first used on.
+
+    Example:
+        ```python
+        from agentops import AsyncAgentOps
+
+        async with AsyncAgentOps(api_key="your_key", api_url="https://your-api.com") as ops:
+            ops.start_session()
+            result = await ops.evaluate(prompt="What is AI?", response="AI is...")
+            print(ops.end_session())
+        ```
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        api_url: Optional[str] = None,
+        track_throughput: bool = True,
+        auto_upload: bool = True,
+        max_concurrency: int = 16,
+        async_openai_client=None,
+        embedder=None,
+        tiered: bool = False,
+        sampler=None,
+        upload_batch_size: int = 100,
+        upload_interval_sec: float = 1.0,
+        upload_queue_size: int = 10000,
+        upload_overflow: str = "drop",
+        http_pool: Optional[HttpPool] = None,
+        http2: bool = False,
+        http_timeout_sec: float = 30.0,
+        http_max_connections: int = 10,
+        upload_compression: Optional[str] = None,
+        upload_compression_min_bytes: int = 1024,
+        dedupe_docs: bool = False
+    ):
+        """
+        Initialize the async AgentOps client.
+
+        Args:
+            api_key: AgentOps API key (from dashboard or auth/api-keys endpoint)
+            api_url: AgentOps API base URL (default: None, local evaluation only)
+            track_throughput: Enable cumulative throughput tracking (default: True)
+            auto_upload: Automatically upload evaluations to API when api_key is set (default: True)
+            max_concurrency: Evaluations running at once across all tasks (default: 16)
+            async_openai_client: `openai.AsyncOpenAI` instance for this instance's embedding
+                and judge calls; streamed evaluations also use a sync client built from its
+                settings (default: None, process-wide client)
+            embedder: Embedder backend for semantic drift (default: None, process-wide backend)
+            tiered: Skip the LLM judge when drift and uncertainty already decide the
+                verdict (default: False)
+            sampler: Sampling policy from agentops.sampling (default: None, evaluate everything)
+            upload_batch_size: Evaluations per `/evaluations/batch` upload, 1-100 (default: 100)
+            upload_interval_sec: Longest time a queued evaluation waits for its batch
+                to fill before it is sent (default: 1.0)
+            upload_queue_size: Maximum evaluations waiting for upload (default: 10000)
+            upload_overflow: What evaluate() does when the upload queue is full:
+                'drop' the evaluation's upload or 'block' until there is room
+                (default: 'drop')
+            http_pool: HttpPool to upload through, shareable with other clients
+                (default: None, own pool)
+            http2: Use HTTP/2 for this instance's own pool; needs the `h2` package
+                (default: False)
+            http_timeout_sec: Per-request timeout for this instance's own pool (default: 30.0)
+            http_max_connections: Connection limit for this instance's own pool (default: 10)
+            upload_compression: Compress upload bodies with 'gzip' or 'zstd'; the API
+                must accept Content-Encoding (default: None, uncompressed)
+            upload_compression_min_bytes: Smallest upload body worth compressing
+                (default: 1024)
+            dedupe_docs: Reference retrieved_docs by SHA-256 hash and send each chunk's
+                text only until the API has stored it. Needs an API that stores
+                documents; older ones drop the docs (default: False)
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.api_key = api_key
+        self.api_url = api_url.rstrip('/') if api_url else None
+        self.track_throughput = track_throughput
+        self.auto_upload = auto_upload and api_key is not None and api_url is not None
+        self.max_concurrency = max_concurrency
+        self.embedder = embedder
+        self.tiered = tiered
+        self.sampler = sampler
+        self._semaphore = None
+        self._tasks = set()
+        self._owns_http = http_pool is None
+        self._http = http_pool or HttpPool(
+            http2=http2,
+            timeout_sec=http_timeout_sec,
+            max_connections=http_max_connections,
+            max_keepalive_connections=http_max_connections
+        )
+        self._encoder = BodyEncoder(upload_compression, min_bytes=upload_compression_min_bytes)
+        self._known_docs = KnownDocuments() if dedupe_docs else None
+        self._uploader = AsyncBatchUploader(
+            self._upload_batch,
+            max_batch=max(1, min(upload_batch_size, 100)),
+            flush_interval_sec=upload_interval_sec,
+            max_queue=upload_queue_size,
+            overflow=upload_overflow
+        )
+
+        # Scoped to this instance's calls rather than installed process-wide
+        self._openai_clients = resolve_openai_clients(async_client=async_openai_client)
+
+        if self.auto_upload:
+            logger.enable("agentops")
+            logger.info(f"AgentOps API integration enabled: {self.api_url}")
+
+    # ---------- Sessions ----------
+
+    def _session(self) -> Optional[_Session]:
+        return _sessions.get().get(id(self))
+
+    def start_session(self, session_id: Optional[str] = None) -> str:
+        """
+        Start a session for the current task.
+
+        Evaluations awaited in this task, and in tasks it creates afterwards,
+        count toward the session and are uploaded with its session_id unless
+        they pass their own. Concurrent tasks each have their own session.
+
+        Returns:
+            str: The session id (generated if not given)
+        """
+        session = _Session(session_id or uuid.uuid4().hex)
+        _sessions.set({**_sessions.get(), id(self): session})
+        return session.session_id
+
+    def end_session(self) -> dict:
+        """
+        End the current task's session.
+
+        Returns:
+            dict: Session statistics (session_id, evaluations, hallucinations,
+                hallucination_rate, avg_latency_sec, duration_sec), empty if
+                no session was active
+        """
+        session = self._session()
+        if session is None:
+            return {}
+        sessions = dict(_sessions.get())
+        sessions.pop(id(self), None)
+        _sessions.set(sessions)
+        return session.stats()
+
+    # ---------- Evaluation ----------
+
+    def _get_semaphore(self):
+        if self._semaphore is None:
+            import asyncio
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _finish(self, result: dict, weight: float, agent_name, model_name, session: Optional[_Session]):
+        """Attach the sample weight, feed the sampler and count the result in the session."""
+        self._apply_sampling(result, weight, agent_name, model_name)
+        if session is not None:
+            session.record(result)
+
+    async def evaluate(
+        self,
+        prompt: str,
+        response: str,
+        retrieved_docs: Optional[list[str]] = None,
+        model_name: Optional[str] = None,
+        agent_name: Optional[str] = None,
+        session_id: Optional[str] = None,
+        upload: Optional[bool] = None
+    ):
+        """
+        Evaluate an agent's response, waiting for a concurrency slot first.
+
+        Takes the same arguments and returns the same dict as AgentOps.evaluate().
+        The upload is queued, never awaited on the network.
+        """
+        session = self._session()
+        weight = self._sample_weight(agent_name, model_name)
+        if weight is None:
+            return self._skipped_result()
+
+        async with self._get_semaphore():
+            with openai_clients(self._openai_clients):
+                result = await adetect_hallucination(
+                    prompt,
+                    response,
+                    retrieved_docs,
+                    track_throughput=self.track_throughput,
+                    embedder=self.embedder,
+                    tiered=self.tiered
+                )
+        self._finish(result, weight, agent_name, model_name, session)
+
+        should_upload = upload if upload is not None else self.auto_upload
+        if should_upload:
+            await self._queue_upload(result, self._build_payload(
+                result, prompt, response, retrieved_docs, model_name, agent_name,
+                session_id or (session.session_id if session else None)
+            ))
+        return result
+
+    def submit(self, prompt: str, response: str, **kwargs):
+        """
+        Run evaluate() as a background task and return the task.
+
+        The task inherits the caller's session. close() waits for submitted
+        tasks that have not finished.
+
+        Returns:
+            asyncio.Task: Resolves to the evaluate() result
+        """
+        return self._track(self.evaluate(prompt, response, **kwargs))
+
+    def _track(self, coro):
+        """Run a coroutine as a task that close() waits for."""
+        import asyncio
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def evaluate_stream(
+        self,
+        prompt: str,
+        retrieved_docs: Optional[list[str]] = None,
+        model_name: Optional[str] = None,
+        agent_name: Optional[str] = None,
+        session_id: Optional[str] = None,
+        upload: Optional[bool] = None
+    ) -> StreamingDetection:
+        """
+        Start evaluating a response while it is still streaming.
+
+        Feed chunks with `aconsume()` and finish with `await stream.afinish()`;
+        see AgentOps.evaluate_stream(). Streams do not take a concurrency slot,
+        since their work overlaps the response being generated. A stream
+        finished with the blocking `finish()` outside the event loop queues
+        its upload on the loop `evaluate_stream()` was called from; with no
+        such loop still running, the upload is skipped with a warning.
+        """
+        import asyncio
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        session = self._session()
+        weight = self._sample_weight(agent_name, model_name)
+        if weight is None:
+            return _SkippedStream(prompt, retrieved_docs)
+
+        should_upload = upload if upload is not None else self.auto_upload
+
+        def on_result(result, response):
+            self._finish(result, weight, agent_name, model_name, session)
+            if not should_upload:
+                return
+            payload = self._build_payload(
+                result, prompt, response, retrieved_docs, model_name, agent_name,
+                session_id or (session.session_id if session else None)
+            )
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                # finish() called from a thread without a running loop
+                if loop is None or not loop.is_running():
+                    logger.warning("Streamed evaluation finished without an event loop, not uploaded; "
+                                   "finish it with `await stream.afinish()`")
+                    return
+                loop.call_soon_threadsafe(self._track, self._queue_upload(result, payload))
+            else:
+                self._track(self._queue_upload(result, payload))
+
+        with openai_clients(self._openai_clients):
+            return StreamingDetection(
+                prompt,
+                retrieved_docs,
+                track_throughput=self.track_throughput,
+                embedder=self.embedder,
+                tiered=self.tiered,
+                on_result=on_result
+            )
+
+    # ---------- Uploads ----------
+
+    async def _queue_upload(self, result: dict, payload: dict):
+        """Hand a payload to the upload queue, reporting the time spent as 'upload_sec'."""
+        if not self.api_url or not self.api_key:
+            return
+        queue_start = time.perf_counter()
+        if not await self._uploader.submit(payload):
+            logger.warning("Upload queue full or closed, evaluation not uploaded")
+        result["stage_timings"]["upload_sec"] = round(time.perf_counter() - queue_start, 4)
+
+    async def _upload_batch(self, payloads: list) -> bool:
+        """Async counterpart of AgentOps._upload_batch()."""
+        if not self._can_upload(payloads):
+            return False
+        try:
+            upload = BatchUpload(payloads, self._known_docs)
+            resp = await self._post_batch(upload.body)
+            resend = upload.resend_body(resp)
+            if resend is not None:
+                resp = await self._post_batch(resend)
+            return self._batch_accepted(upload, resp)
+        except Exception as e:
+            return self._batch_failed(e, len(payloads))
+
+    async def _post_batch(self, body: dict):
+        """POST one compressed `/evaluations/batch` body."""
+        url, kwargs = self._batch_request(body)
+        return await self._http.apost(url, **kwargs)
+
+    async def flush(self):
+        """Wait for submitted evaluations, then send every queued upload."""
+        if self._tasks:
+            import asyncio
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        await self._uploader.flush()
+
+    async def close(self):
+        """Flush, stop the upload task and close the HTTP client (unless shared)."""
+        await self.flush()
+        await self._uploader.close()
+        if self._owns_http:
+            await self._http.aclose()
+
+    # ---------- Metrics ----------
+
+    def metrics(self):
+        """
+        Return process-wide throughput and cache statistics plus this client's
+        upload, HTTP, compression and document counters (see AgentOps.metrics()).
+        """
+        stats = self._base_metrics()
+        stats["uploads"] = self._uploader.stats()
+        return stats
+
+    async def __aenter__(self):
+        """Async context manager entry."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit - sends queued uploads and closes connections."""
+        await self.close()
+        return False
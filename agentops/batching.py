@@ -0,0 +1,152 @@
+"""
+Request coalescing for embedding calls.
+
+- EmbeddingBatcher: gathers texts from concurrent callers for a few
+  milliseconds (or until a size limit) and embeds them in one request
+"""
+
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Condition, Thread
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batcher that coalesces embedding requests across threads.
+
+    Callers block in `embed()` while a background thread collects pending
+    texts. A batch is dispatched when `max_batch` texts are waiting or the
+    oldest text has waited `max_wait_ms`, whichever comes first. Each batch
+    becomes a single call to `fetch(model, texts, client)` per model and
+    client, and the returned vectors are handed back to the callers that
+    asked for them.
+    """
+    def __init__(self, fetch, max_batch=64, max_wait_ms=5.0, max_inflight=4):
+        """
+        Args:
+            fetch: Callable (model, texts, client) -> list of vectors, in input order
+            max_batch: Maximum number of texts sent in one request
+            max_wait_ms: Longest time a text waits for companions before dispatch
+            max_inflight: Maximum number of batch requests running at once
+        """
+        self._fetch = fetch
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._pending = []  # (model, client, text, Future, enqueued_at)
+        self._cond = Condition()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_inflight,
+            thread_name_prefix="agentops-embed-batch"
+        )
+        self._thread = None
+        self._closed = False
+        self.batches_sent = 0
+        self.texts_sent = 0
+
+    def submit(self, model, texts, client=None):
+        """
+        Queue texts for embedding and return one Future per text.
+
+        Texts are only batched with others for the same model and client.
+        Once the batcher is closed they are fetched directly instead.
+        """
+        futures = [Future() for _ in texts]
+        now = time.monotonic()
+        with self._cond:
+            closed = self._closed
+            if not closed:
+                self._ensure_worker()
+                for text, future in zip(texts, futures):
+                    self._pending.append((model, client, text, future, now))
+                self._cond.notify()
+        if closed:
+            self._resolve(model, client, {text: [future] for text, future in zip(texts, futures)})
+        return futures
+
+    def embed(self, model, texts, client=None):
+        """Embed texts through the shared batch and block for the vectors."""
+        return [future.result() for future in self.submit(model, texts, client)]
+
+    def close(self, timeout=None):
+        """
+        Dispatch texts still pending and stop the collector thread.
+
+        Later `embed()` calls fetch directly instead of batching.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self._pool.shutdown(wait=False)
+
+    def stats(self):
+        """Return batch counters."""
+        with self._cond:
+            return {
+                "batches_sent": self.batches_sent,
+                "texts_sent": self.texts_sent,
+                "avg_batch_size": round(self.texts_sent / self.batches_sent, 3)
+                if self.batches_sent else 0.0,
+                "pending": len(self._pending)
+            }
+
+    def _ensure_worker(self):
+        """Start the collector thread on first use (caller holds the lock)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = Thread(
+                target=self._run,
+                name="agentops-embed-collector",
+                daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        """Collector loop: wait for a full or expired batch, then dispatch it."""
+        max_wait = self.max_wait_ms / 1000.0
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                deadline = self._pending[0][4] + max_wait
+                while len(self._pending) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                self.batches_sent += 1
+                self.texts_sent += len(batch)
+            try:
+                self._pool.submit(self._dispatch, batch)
+            except RuntimeError:
+                # close() gave up waiting and shut the pool down
+                self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        """Send one request per model and client in the batch and resolve the futures."""
+        groups = {}
+        for model, client, text, future, _ in batch:
+            groups.setdefault((model, client), {}).setdefault(text, []).append(future)
+        for (model, client), waiters in groups.items():
+            self._resolve(model, client, waiters)
+
+    def _resolve(self, model, client, waiters):
+        """Fetch the texts of a {text: [Future, ...]} map and resolve their futures."""
+        texts = list(waiters)
+        try:
+            vectors = self._fetch(model, texts, client)
+            if len(vectors) != len(texts):
+                raise ValueError(f"Expected {len(texts)} embeddings, got {len(vectors)}")
+        except Exception as e:
+            for futures in waiters.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+        for text, vector in zip(texts, vectors):
+            for future in waiters[text]:
+                future.set_result(vector)
@@ -0,0 +1,237 @@
+"""
+Caches for expensive detector calls.
+
+- EmbeddingCache: in-memory LRU cache with TTL expiry for embedding vectors
+- VerdictCache: persistent SQLite cache for judge scores, shared across processes
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+def content_key(*parts):
+    """
+    Build a content-addressed cache key from string parts.
+
+    Parts are joined with a NUL separator before hashing so that
+    ("ab", "c") and ("a", "bc") never collide.
+    """
+    joined = "\x00".join(parts)
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()
+
+
+# ---------- Embedding Cache ----------
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU cache for embedding vectors with TTL expiry.
+
+    Entries are keyed by a hash of (model, text), so identical inputs to the
+    same embedding model share one entry regardless of where they came from.
+    """
+    def __init__(self, max_size=10000, ttl_sec=3600.0):
+        """
+        Args:
+            max_size: Maximum number of cached vectors (0 disables caching)
+            ttl_sec: Seconds before an entry expires (None = never expires)
+        """
+        self.max_size = max_size
+        self.ttl_sec = ttl_sec
+        self._entries = OrderedDict()  # key -> (expires_at, vector)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = Lock()
+
+    def get(self, model, text):
+        """Return the cached vector for (model, text), or None on a miss."""
+        key = content_key(model, text)
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, vector = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, model, text, vector):
+        """Store a vector, evicting least recently used entries when full."""
+        if self.max_size <= 0:
+            return
+        key = content_key(model, text)
+        expires_at = time.monotonic() + self.ttl_sec if self.ttl_sec is not None else None
+        with self.lock:
+            self._entries[key] = (expires_at, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def configure(self, max_size=None, ttl_sec=None):
+        """Change size bound and/or TTL, evicting entries if the cache shrank."""
+        with self.lock:
+            if max_size is not None:
+                self.max_size = max_size
+            if ttl_sec is not None:
+                self.ttl_sec = ttl_sec
+            while len(self._entries) > max(self.max_size, 0):
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """Return a snapshot of cache size and hit/miss/eviction counters."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_sec": self.ttl_sec,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+    def reset(self):
+        """Drop all entries and zero the counters."""
+        with self.lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+
+
+# ---------- Verdict Cache ----------
+
+class VerdictCache:
+    """
+    Persistent cache of judge verdicts backed by a local SQLite file.
+
+    Judge calls run at temperature 0, so the same (model, prompt) always
+    yields the same score. Entries are keyed by a hash of the judge model
+    and the fully rendered judge prompt (template plus inputs), survive
+    restarts, and can be shared by several processes on one host.
+    Least recently used entries are evicted once `max_entries` is exceeded,
+    in batches of `evict_batch` so the table is not counted on every insert.
+    """
+    def __init__(self, path, max_entries=100000, evict_batch=None):
+        """
+        Args:
+            path: SQLite database file (parent directories are created)
+            max_entries: Maximum number of stored verdicts
+            evict_batch: Extra entries evicted below max_entries each time the
+                cache overflows (default: 1% of max_entries)
+        """
+        self.path = os.path.expanduser(path)
+        self.max_entries = max_entries
+        self.evict_batch = max_entries // 100 if evict_batch is None else evict_batch
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = Lock()
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                "key TEXT PRIMARY KEY, score REAL NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_verdicts_last_used ON verdicts(last_used)"
+            )
+        # Upper estimate of the row count; recounted only when it exceeds
+        # max_entries (other processes may insert or evict meanwhile)
+        self._size_estimate = self._count()
+
+    def _count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    def get(self, model, prompt):
+        """Return the cached score for (model, prompt), or None on a miss."""
+        key = content_key(model, prompt)
+        with self.lock, self._conn:
+            row = self._conn.execute(
+                "SELECT score FROM verdicts WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE verdicts SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self.hits += 1
+            return row[0]
+
+    def put(self, model, prompt, score):
+        """Store a score and evict the least recently used verdicts if over capacity."""
+        key = content_key(model, prompt)
+        now = time.time()
+        with self.lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, score, created_at, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, float(score), now, now)
+            )
+            self._size_estimate += 1
+            if self._size_estimate <= self.max_entries:
+                return
+            size = self._count()
+            excess = size - self.max_entries
+            if excess > 0:
+                excess += self.evict_batch
+                self._conn.execute(
+                    "DELETE FROM verdicts WHERE key IN "
+                    "(SELECT key FROM verdicts ORDER BY last_used ASC LIMIT ?)",
+                    (excess,)
+                )
+                self.evictions += excess
+                size -= excess
+            self._size_estimate = size
+
+    def stats(self):
+        """Return a snapshot of on-disk size and this process's counters."""
+        with self.lock:
+            size = self._count()
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "size": size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+    def clear(self):
+        """Delete every stored verdict and zero the counters."""
+        with self.lock, self._conn:
+            self._conn.execute("DELETE FROM verdicts")
+            self._size_estimate = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def close(self):
+        """Close the underlying SQLite connection."""
+        with self.lock:
+            self._conn.close()
@@ -5,21 +5,179 @@ Wrapper for easy integration with LLM agents and applications.
 Provides simple API for hallucination detection and reliability monitoring.
 """
 
-from typing import Optional
-import httpx
+import time
+from collections import deque
+from itertools import islice
+from threading import Lock
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, Optional, Tuple, Union
 from loguru import logger
 
 from .detector_flexible import (
     detect_hallucination,
+    adetect_hallucination,
+    judge_many,
+    StreamingDetection,
     get_throughput_stats,
+    get_embedding_cache_stats,
+    get_embedding_batching_stats,
+    get_verdict_cache_stats,
+    get_stage_policy_stats,
+    configure_embedding_batching,
+    openai_clients,
+    resolve_openai_clients,
+    record_skipped_evaluation,
+    current_throughput,
     reset_throughput_tracker
 )
+from .documents import BatchUpload, KnownDocuments
+from .spool import SpoolReplayer, UploadSpool
+from .transport import BodyEncoder, HttpPool
+from .uploader import BatchUploader, UploadRejected
 
 # Suppress loguru unless explicitly configured
 logger.disable("agentops")
 
 
-class AgentOps:
+class _SkippedStream(StreamingDetection):
+    """Stream handle for calls the sampler skipped: chunks pass through, nothing is evaluated."""
+    def _start_prompt(self):
+        return None
+    
+    def close(self):
+        self._mark_closed()
+    
+    def aclose(self):
+        self._mark_closed()
+    
+    def finish(self):
+        self.close()
+        self.result = AgentOps._skipped_result()
+        return self.result
+    
+    async def afinish(self):
+        return self.finish()
+
+
+class _ClientCore:
+    """
+    Behaviour AgentOps and AsyncAgentOps share: sampling, upload payloads,
+    the `/evaluations/batch` exchange and metrics. Subclasses only supply
+    the transport (`_post_batch`, sync or async) and their own queues.
+    """
+    
+    def _sample_weight(self, agent_name: Optional[str], model_name: Optional[str]):
+        """Ask the sampler about this call; returns its weight, or None to skip."""
+        if self.sampler is None:
+            return 1.0
+        weight = self.sampler.sample(agent_name=agent_name, model_name=model_name)
+        if weight is None:
+            record_skipped_evaluation()
+        return weight
+    
+    def _apply_sampling(self, result: dict, weight: float, agent_name, model_name):
+        """Attach the sample weight and feed the result back to the sampler."""
+        if self.sampler is None:
+            return
+        result["sampled"] = True
+        result["sample_weight"] = round(weight, 6)
+        self.sampler.observe(result, agent_name=agent_name, model_name=model_name)
+    
+    @staticmethod
+    def _skipped_result():
+        """Result returned immediately for calls the sampler skipped."""
+        return {
+            "semantic_drift": None,
+            "uncertainty": None,
+            "factual_support": None,
+            "mode": None,
+            "hallucination_probability": None,
+            "hallucinated": None,
+            "decision_tier": None,
+            "missed_deadlines": [],
+            "latency_sec": 0.0,
+            "stage_timings": {},
+            "throughput_qps": current_throughput(),
+            "sampled": False,
+            "sample_weight": 0.0
+        }
+    
+    @staticmethod
+    def _build_payload(
+        result: dict,
+        prompt: str,
+        response: str,
+        retrieved_docs: Optional[list[str]],
+        model_name: Optional[str],
+        agent_name: Optional[str],
+        session_id: Optional[str]
+    ):
+        """Build the API payload for one evaluation."""
+        return {
+            "prompt": prompt,
+            "response": response,
+            "retrieved_docs": retrieved_docs,
+            "semantic_drift": result["semantic_drift"],
+            "uncertainty": result["uncertainty"],
+            "factual_support": result["factual_support"],
+            "hallucination_probability": result["hallucination_probability"],
+            "hallucinated": result["hallucinated"],
+            "latency_sec": result["latency_sec"],
+            "throughput_qps": result.get("throughput_qps"),
+            "stage_timings": result.get("stage_timings"),
+            "mode": result["mode"],
+            "decision_tier": result.get("decision_tier"),
+            "sample_weight": result.get("sample_weight", 1.0),
+            "model_name": model_name,
+            "agent_name": agent_name,
+            "session_id": session_id
+        }
+    
+    def _can_upload(self, payloads: list) -> bool:
+        """Whether this client has an API to upload to and something to send."""
+        return bool(self.api_url and self.api_key and payloads)
+    
+    def _batch_request(self, body: dict):
+        """URL and keyword arguments for POSTing one compressed `/evaluations/batch` body."""
+        content, headers = self._encoder.encode(body)
+        return f"{self.api_url}/evaluations/batch", {
+            "content": content,
+            "headers": {**headers, "X-API-Key": self.api_key}
+        }
+    
+    @staticmethod
+    def _batch_accepted(upload: BatchUpload, resp) -> bool:
+        """Settle a batch on its final response (raises unless the API accepted it)."""
+        count = upload.finish(resp)
+        logger.info(f"✅ Uploaded batch of {count} evaluations")
+        return True
+    
+    @staticmethod
+    def _batch_failed(error: Exception, count: int) -> bool:
+        """Log a failed batch; re-raise a permanent rejection, otherwise report False."""
+        if isinstance(error, UploadRejected):
+            logger.warning(f"API rejected batch of {count} evaluations, not retrying: {error}")
+            raise error
+        logger.warning(f"Batch upload of {count} evaluations failed: {error}")
+        return False
+    
+    def _base_metrics(self) -> dict:
+        """Process-wide detector stats plus this client's HTTP, compression, document and sampling counters."""
+        stats = get_throughput_stats()
+        stats["embedding_cache"] = get_embedding_cache_stats()
+        stats["embedding_batching"] = get_embedding_batching_stats()
+        stats["verdict_cache"] = get_verdict_cache_stats()
+        stats["stage_policies"] = get_stage_policy_stats()
+        stats["http"] = self._http.stats()
+        stats["compression"] = self._encoder.stats()
+        if self._known_docs is not None:
+            stats["documents"] = self._known_docs.stats()
+        if self.sampler is not None:
+            stats["sampling"] = self.sampler.stats()
+        return stats
+
+
+class AgentOps(_ClientCore):
     """
     AgentOps SDK Client for AI Reliability Engineering.
     
@@ -50,7 +208,28 @@ class AgentOps:
         api_key: Optional[str] = None,
         api_url: Optional[str] = None,
         track_throughput: bool = True,
-        auto_upload: bool = True
+        auto_upload: bool = True,
+        parallel: bool = False,
+        embedding_batch_size: Optional[int] = None,
+        embedding_batch_wait_ms: float = 5.0,
+        openai_client=None,
+        async_openai_client=None,
+        embedder=None,
+        tiered: bool = False,
+        sampler=None,
+        upload_batch_size: int = 100,
+        upload_interval_sec: float = 1.0,
+        upload_queue_size: int = 10000,
+        upload_overflow: str = "drop",
+        http_pool: Optional[HttpPool] = None,
+        http2: bool = False,
+        http_timeout_sec: float = 30.0,
+        http_max_connections: int = 10,
+        spool_dir: Optional[str] = None,
+        spool_max_bytes: int = 256 * 1024 * 1024,
+        upload_compression: Optional[str] = None,
+        upload_compression_min_bytes: int = 1024,
+        dedupe_docs: bool = False
     ):
         """
         Initialize AgentOps client.
@@ -60,6 +239,51 @@ class AgentOps:
             api_url: AgentOps API base URL (default: None, local evaluation only)
             track_throughput: Enable cumulative throughput tracking (default: True)
             auto_upload: Automatically upload evaluations to API when api_key is set (default: True)
+            parallel: Run embedding and judge calls concurrently inside each evaluation (default: False)
+            embedding_batch_size: Coalesce embedding requests from concurrent evaluate() calls
+                into batches of up to this many texts. The batcher is shared by the
+                process; one already configured is kept (default: None, no coalescing)
+            embedding_batch_wait_ms: Longest time a text waits for a batch to fill (default: 5.0)
+            openai_client: `openai.OpenAI` instance for this instance's embedding and judge
+                calls. When either client is set, the SDK does not read .env or
+                OPENAI_API_KEY for this instance (default: None, process-wide client)
+            async_openai_client: `openai.AsyncOpenAI` instance used by aevaluate(). Built
+                from openai_client's settings when omitted, and vice versa; other client
+                objects must be passed in pairs (default: None)
+            embedder: Embedder backend for semantic drift, e.g. HashingEmbedder() for a
+                local, network-free drift signal (default: None, process-wide backend)
+            tiered: Skip the LLM judge when drift and uncertainty already decide the
+                verdict; results report which tier decided (default: False)
+            sampler: Sampling policy from agentops.sampling (RateSampler, ReservoirSampler,
+                StratifiedSampler, AdaptiveSampler) deciding which evaluate() calls run
+                (default: None, evaluate everything)
+            upload_batch_size: Evaluations per background `/evaluations/batch` upload,
+                1-100 (default: 100)
+            upload_interval_sec: Longest time a queued evaluation waits for its batch
+                to fill before it is sent (default: 1.0)
+            upload_queue_size: Maximum evaluations waiting for upload (default: 10000)
+            upload_overflow: What evaluate() does when the upload queue is full:
+                'drop' the evaluation's upload or 'block' until there is room
+                (default: 'drop')
+            http_pool: HttpPool to upload through; pass the same pool to several
+                instances to share keep-alive connections (default: None, own pool)
+            http2: Use HTTP/2 for this instance's own pool; needs the `h2` package
+                (default: False)
+            http_timeout_sec: Per-request timeout for this instance's own pool (default: 30.0)
+            http_max_connections: Connection limit for this instance's own pool (default: 10)
+            spool_dir: Directory for a durable upload spool. Uploads that fail, overflow
+                the queue or are still queued at close are written there and replayed
+                in the background, also after a restart (default: None, no spool)
+            spool_max_bytes: Disk budget for the spool; the oldest records are dropped
+                beyond it (default: 256 MiB)
+            upload_compression: Compress upload bodies with 'gzip' or 'zstd' (needs the
+                `zstandard` package); the API must accept Content-Encoding, so enable
+                it only against an API that does (default: None, uncompressed)
+            upload_compression_min_bytes: Smallest upload body worth compressing
+                (default: 1024)
+            dedupe_docs: Batch uploads reference retrieved_docs by SHA-256 hash and send
+                each chunk's text only until the API has stored it. Needs an API that
+                stores documents; older ones drop the docs (default: False)
         
         Examples:
             # Local only (no API)
@@ -75,7 +299,50 @@ class AgentOps:
         self.api_url = api_url.rstrip('/') if api_url else None
         self.track_throughput = track_throughput
         self.auto_upload = auto_upload and api_key is not None and api_url is not None
+        self.parallel = parallel
+        self.embedder = embedder
+        self.tiered = tiered
+        self.sampler = sampler
         self._session_active = False
+        self._owns_http = http_pool is None
+        self._http = http_pool or HttpPool(
+            http2=http2,
+            timeout_sec=http_timeout_sec,
+            max_connections=http_max_connections,
+            max_keepalive_connections=http_max_connections
+        )
+        self._encoder = BodyEncoder(upload_compression, min_bytes=upload_compression_min_bytes)
+        self._known_docs = KnownDocuments() if dedupe_docs else None
+        self._uploader = None
+        self._uploader_lock = Lock()
+        self._uploader_options = {
+            "max_batch": max(1, min(upload_batch_size, 100)),
+            "flush_interval_sec": upload_interval_sec,
+            "max_queue": upload_queue_size,
+            "overflow": upload_overflow
+        }
+        if upload_overflow not in ("drop", "block"):
+            raise ValueError("upload_overflow must be 'drop' or 'block'")
+        self._spool = None
+        self._replayer = None
+        if spool_dir and self.api_url and self.api_key:
+            self._spool = UploadSpool(spool_dir, max_bytes=spool_max_bytes)
+            self._replayer = SpoolReplayer(
+                self._spool, self._upload_batch, batch_size=self._uploader_options["max_batch"]
+            )
+            # Replays whatever an earlier process left behind
+            self._replayer.start()
+        
+        # Scoped to this instance's calls rather than installed process-wide
+        self._openai_clients = resolve_openai_clients(openai_client, async_openai_client)
+        
+        if embedding_batch_size:
+            # The batcher is process-wide: keep one other instances may be using
+            configure_embedding_batching(
+                max_batch=embedding_batch_size,
+                max_wait_ms=embedding_batch_wait_ms,
+                replace=False
+            )
         
         if self.auto_upload:
             logger.enable("agentops")
@@ -115,105 +382,496 @@ class AgentOps:
                 'hallucination_probability': float,
                 'hallucinated': bool,
                 'semantic_drift': float,
-                'factual_support': float,
+                'factual_support': float or None (None if the judge was skipped),
                 'uncertainty': float,
                 'mode': str,
+                'decision_tier': str ('judge', 'cheap' or 'partial'),
                 
                 # Reliability metrics
                 'latency_sec': float,
-                'throughput_qps': float
+                'throughput_qps': float,
+                'stage_timings': dict (seconds per stage: 'embedding_sec', 'judge_sec',
+                    'fusion_sec', plus 'upload_sec' spent queueing the upload),
+                
+                # Sampling (only when a sampler is configured)
+                'sampled': bool (False if the call was skipped; metrics are then None),
+                'sample_weight': float (1 / probability of being sampled)
             }
         """
         if not self._session_active:
             self._session_active = True
         
+        weight = self._sample_weight(agent_name, model_name)
+        if weight is None:
+            return self._skipped_result()
+        
         # Run local evaluation
-        result = detect_hallucination(
-            prompt,
-            response,
-            retrieved_docs,
-            track_throughput=self.track_throughput
-        )
+        with openai_clients(self._openai_clients):
+            result = detect_hallucination(
+                prompt,
+                response,
+                retrieved_docs,
+                track_throughput=self.track_throughput,
+                parallel=self.parallel,
+                embedder=self.embedder,
+                tiered=self.tiered
+            )
+        self._apply_sampling(result, weight, agent_name, model_name)
         
         # Upload to API if enabled
         should_upload = upload if upload is not None else self.auto_upload
         if should_upload:
-            try:
-                self._upload_evaluation(
-                    result=result,
-                    prompt=prompt,
-                    response=response,
-                    retrieved_docs=retrieved_docs,
-                    model_name=model_name,
-                    agent_name=agent_name,
-                    session_id=session_id
-                )
-            except Exception as e:
-                logger.warning(f"Failed to upload evaluation to API: {e}")
+            self._queue_upload(result, self._build_payload(
+                result, prompt, response, retrieved_docs, model_name, agent_name, session_id
+            ))
         
         return result
     
-    def _upload_evaluation(
+    def evaluate_stream(
         self,
-        result: dict,
         prompt: str,
-        response: str,
-        retrieved_docs: Optional[list[str]],
-        model_name: Optional[str],
-        agent_name: Optional[str],
-        session_id: Optional[str]
-    ):
+        retrieved_docs: Optional[list[str]] = None,
+        model_name: Optional[str] = None,
+        agent_name: Optional[str] = None,
+        session_id: Optional[str] = None,
+        upload: Optional[bool] = None
+    ) -> StreamingDetection:
+        """
+        Start evaluating a response while the agent is still streaming it.
+        
+        The prompt embedding starts immediately and uncertainty is scored per
+        chunk; the response embedding and judge calls start as soon as the
+        stream ends, so little evaluation latency remains after the final token.
+        The result is queued for upload when it is ready, the same way
+        whether the stream ends with finish() or `await stream.afinish()`.
+        
+        Args:
+            prompt: The original user question/prompt
+            retrieved_docs: Optional list of retrieved evidence chunks (RAG mode)
+            model_name: Name of the LLM model used
+            agent_name: Name of your agent
+            session_id: Optional session identifier for batch tracking
+            upload: Override auto_upload for this evaluation (default: use self.auto_upload)
+        
+        Returns:
+            StreamingDetection: Handle with feed()/consume()/aconsume() to pass chunks
+                in and finish()/afinish() to get the same dict as evaluate()
+        
+        Example:
+            ```python
+            stream = ops.evaluate_stream("What is AI?")
+            for chunk in stream.consume(agent.stream("What is AI?")):
+                print(chunk, end="")
+            result = stream.finish()
+            ```
+        """
+        if not self._session_active:
+            self._session_active = True
+        
+        weight = self._sample_weight(agent_name, model_name)
+        if weight is None:
+            return _SkippedStream(prompt, retrieved_docs)
+        
+        should_upload = upload if upload is not None else self.auto_upload
+        
+        def on_result(result, response):
+            self._apply_sampling(result, weight, agent_name, model_name)
+            if not should_upload:
+                return
+            self._queue_upload(result, self._build_payload(
+                result, prompt, response, retrieved_docs, model_name, agent_name, session_id
+            ))
+        
+        with openai_clients(self._openai_clients):
+            return StreamingDetection(
+                prompt,
+                retrieved_docs,
+                track_throughput=self.track_throughput,
+                embedder=self.embedder,
+                tiered=self.tiered,
+                on_result=on_result
+            )
+    
+    def evaluate_many(
+        self,
+        items: Iterable[Union[dict, tuple]],
+        concurrency: int = 8,
+        ordered: bool = False,
+        model_name: Optional[str] = None,
+        agent_name: Optional[str] = None,
+        session_id: Optional[str] = None,
+        upload: Optional[bool] = None,
+        upload_batch_size: int = 100,
+        judge_batch_size: int = 1
+    ) -> Iterator[Tuple[int, dict]]:
+        """
+        Evaluate a stream of responses on a bounded worker pool.
+        
+        Items are pulled from `items` lazily and at most a small, fixed number
+        are in flight at any time, so memory stays flat for generators of any
+        length. Uploads are grouped into `/evaluations/batch` requests.
+        The sampler does not apply here: every item is evaluated.
+        
+        Args:
+            items: Iterable of (prompt, response[, retrieved_docs]) tuples or dicts
+                with 'prompt', 'response' and optional 'retrieved_docs',
+                'model_name', 'agent_name', 'session_id' keys
+            concurrency: Number of evaluations (or judge groups, see judge_batch_size)
+                running at once (default: 8)
+            ordered: Yield results in input order instead of completion order (default: False)
+            model_name: Default model name for items that do not set one
+            agent_name: Default agent name for items that do not set one
+            session_id: Default session identifier for items that do not set one
+            upload: Override auto_upload for these evaluations (default: use self.auto_upload)
+            upload_batch_size: Evaluations per batch upload, 1-100 (default: 100)
+            judge_batch_size: Items scored per judge request. Above 1, consecutive items
+                are grouped and their factual checks share one chat completion
+                (see judge_many); the judge then always runs, so `tiered` has no
+                effect (default: 1, one judge request per item)
+        
+        Yields:
+            tuple: (index, result) where index is the item's position in `items`
+                and result is the dict returned by evaluate(). If an evaluation
+                raises, the error propagates and the remaining items are skipped.
+        
+        Example:
+            ```python
+            for index, result in ops.evaluate_many(rows, concurrency=16):
+                print(index, result["hallucinated"])
+            ```
+        """
+        if not self._session_active:
+            self._session_active = True
+        
+        should_upload = upload if upload is not None else self.auto_upload
+        upload_batch_size = max(1, min(upload_batch_size, 100))
+        judge_batch_size = max(1, judge_batch_size)
+        defaults = {"model_name": model_name, "agent_name": agent_name, "session_id": session_id}
+        pending_payloads = []
+        
+        def run(group):
+            with openai_clients(self._openai_clients):
+                return run_group(group)
+        
+        def run_group(group):
+            # group is a list of (index, item); with judge batching, one judge
+            # request scores the whole group before the per-item detectors run
+            entries = [(index, self._normalize_item(item, defaults)) for index, item in group]
+            judge_scores = [None] * len(entries)
+            judge_share = None
+            if judge_batch_size > 1:
+                judge_start = time.perf_counter()
+                verdicts = judge_many(
+                    [(f["prompt"], f["response"], f["retrieved_docs"]) for _, f in entries],
+                    batch_size=judge_batch_size
+                )
+                # Each item's latency and stage timings carry its share of the shared request
+                judge_share = (time.perf_counter() - judge_start) / len(entries)
+                judge_scores = [score for score, _ in verdicts]
+            results = []
+            for (index, fields), judge_score in zip(entries, judge_scores):
+                result = detect_hallucination(
+                    fields["prompt"],
+                    fields["response"],
+                    fields["retrieved_docs"],
+                    track_throughput=self.track_throughput,
+                    parallel=self.parallel,
+                    embedder=self.embedder,
+                    tiered=self.tiered,
+                    judge_score=judge_score,
+                    judge_sec=judge_share
+                )
+                results.append((index, fields, result))
+            return results
+        
+        def collect(future):
+            for index, fields, result in future.result():
+                if should_upload:
+                    pending_payloads.append(self._build_payload(result, **fields))
+                    if len(pending_payloads) >= upload_batch_size:
+                        self._upload_now(pending_payloads)
+                        pending_payloads.clear()
+                yield index, result
+        
+        # Ordered mode queues a little more work than there are workers so a
+        # slow head-of-line item does not leave the pool idle.
+        window = concurrency * 2 if ordered else concurrency
+        source = enumerate(items)
+        pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="agentops-bulk")
+        
+        def submit_next():
+            group = list(islice(source, judge_batch_size))
+            return pool.submit(run, group) if group else None
+        
+        try:
+            if ordered:
+                inflight = deque()
+                while True:
+                    while len(inflight) < window:
+                        future = submit_next()
+                        if future is None:
+                            break
+                        inflight.append(future)
+                    if not inflight:
+                        break
+                    yield from collect(inflight.popleft())
+            else:
+                inflight = set()
+                while True:
+                    while len(inflight) < window:
+                        future = submit_next()
+                        if future is None:
+                            break
+                        inflight.add(future)
+                    if not inflight:
+                        break
+                    done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from collect(future)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            if pending_payloads:
+                self._upload_now(pending_payloads)
+    
+    @staticmethod
+    def _normalize_item(item: Union[dict, tuple], defaults: dict) -> dict:
+        """Turn an evaluate_many() item into evaluate() keyword fields."""
+        if isinstance(item, dict):
+            fields = {
+                "prompt": item["prompt"],
+                "response": item["response"],
+                "retrieved_docs": item.get("retrieved_docs")
+            }
+            for key, value in defaults.items():
+                fields[key] = item.get(key, value)
+        else:
+            prompt, response, *rest = item
+            fields = {
+                "prompt": prompt,
+                "response": response,
+                "retrieved_docs": rest[0] if rest else None
+            }
+            fields.update(defaults)
+        return fields
+    
+    def _queue_upload(self, result: dict, payload: dict):
         """
-        Upload evaluation to AgentOps API.
+        Hand a payload to the background uploader.
         
-        Internal method - called automatically when auto_upload is enabled.
+        Only the time spent queueing is on the caller's path; it is reported
+        locally as 'upload_sec' (known only after the payload is built, so
+        not part of the upload itself).
         """
         if not self.api_url or not self.api_key:
             return
+        queue_start = time.perf_counter()
+        if not self._get_uploader().submit(payload):
+            logger.warning("Upload queue full or closed, evaluation not uploaded")
+        result["stage_timings"]["upload_sec"] = round(time.perf_counter() - queue_start, 4)
+    
+    def _get_uploader(self) -> BatchUploader:
+        """Background uploader, created on first upload (by one thread only)."""
+        uploader = self._uploader
+        if uploader is None:
+            with self._uploader_lock:
+                if self._uploader is None:
+                    spill = None
+                    if self._spool is not None:
+                        spill = self._spool.append
+                        self._replayer.start()
+                    self._uploader = BatchUploader(self._upload_batch, spill=spill, **self._uploader_options)
+                uploader = self._uploader
+        return uploader
+    
+    def _upload_now(self, payloads: list):
+        """
+        Upload a batch on the caller's thread. A failed batch goes to the
+        spool (when there is one); a rejected batch is dropped (already logged).
+        """
+        try:
+            delivered = self._upload_batch(payloads)
+        except UploadRejected:
+            return
+        if delivered or self._spool is None:
+            return
+        try:
+            self._spool.append(payloads)
+            self._replayer.start()
+        except Exception as e:
+            logger.warning(f"Could not spool {len(payloads)} evaluations: {e}")
+    
+    def _upload_batch(self, payloads: list) -> bool:
+        """
+        Upload several evaluation payloads with one `/evaluations/batch` request.
         
-        payload = {
-            "prompt": prompt,
-            "response": response,
-            "retrieved_docs": retrieved_docs,
-            "semantic_drift": result["semantic_drift"],
-            "uncertainty": result["uncertainty"],
-            "factual_support": result["factual_support"],
-            "hallucination_probability": result["hallucination_probability"],
-            "hallucinated": result["hallucinated"],
-            "latency_sec": result["latency_sec"],
-            "throughput_qps": result.get("throughput_qps"),
-            "mode": result["mode"],
-            "model_name": model_name,
-            "agent_name": agent_name,
-            "session_id": session_id
-        }
+        With dedupe_docs, retrieved docs travel as hashes plus the texts the
+        API has not acknowledged yet; if the API reports hashes it does not
+        have (409), those texts are added and the request is sent once more.
         
+        Internal method - failures are logged and reported as False, except
+        a permanent rejection (4xx other than 408/409/429), which raises
+        UploadRejected so callers drop the batch instead of retrying it.
+        
+        Returns:
+            bool: True if the API accepted the batch
+        """
+        if not self._can_upload(payloads):
+            return False
         try:
-            with httpx.Client(timeout=10.0) as client:
-                resp = client.post(
-                    f"{self.api_url}/metrics",
-                    json=payload,
-                    headers={"X-API-Key": self.api_key}
-                )
-                resp.raise_for_status()
-                result = resp.json()
-                logger.info(f"✅ Uploaded evaluation {result.get('eval_id')}")
-        except httpx.HTTPError as e:
-            logger.warning(f"API upload failed: {e}")
-            raise
+            upload = BatchUpload(payloads, self._known_docs)
+            resp = self._post_batch(upload.body)
+            resend = upload.resend_body(resp)
+            if resend is not None:
+                resp = self._post_batch(resend)
+            return self._batch_accepted(upload, resp)
+        except Exception as e:
+            return self._batch_failed(e, len(payloads))
+    
+    def _post_batch(self, body: dict):
+        """POST one compressed `/evaluations/batch` body."""
+        url, kwargs = self._batch_request(body)
+        return self._http.post(url, **kwargs)
+    
+    async def aevaluate(
+        self,
+        prompt: str,
+        response: str,
+        retrieved_docs: Optional[list[str]] = None,
+        model_name: Optional[str] = None,
+        agent_name: Optional[str] = None,
+        session_id: Optional[str] = None,
+        upload: Optional[bool] = None
+    ):
+        """
+        Async counterpart of evaluate() for asyncio applications.
+        
+        Embedding and judge calls are awaited concurrently. The upload goes
+        to the same background queue (and spool) as evaluate(); queued
+        uploads are sent by aflush() and on `async with` exit.
+        
+        Takes the same arguments and returns the same dict as evaluate().
+        """
+        if not self._session_active:
+            self._session_active = True
+        
+        weight = self._sample_weight(agent_name, model_name)
+        if weight is None:
+            return self._skipped_result()
+        
+        with openai_clients(self._openai_clients):
+            result = await adetect_hallucination(
+                prompt,
+                response,
+                retrieved_docs,
+                track_throughput=self.track_throughput,
+                embedder=self.embedder,
+                tiered=self.tiered
+            )
+        self._apply_sampling(result, weight, agent_name, model_name)
+        
+        should_upload = upload if upload is not None else self.auto_upload
+        if should_upload:
+            await self._aqueue_upload(result, self._build_payload(
+                result, prompt, response, retrieved_docs, model_name, agent_name, session_id
+            ))
+        
+        return result
+    
+    async def _aqueue_upload(self, result: dict, payload: dict):
+        """
+        _queue_upload() from the event loop. With the 'block' overflow policy
+        or a spool, queueing can wait or write to disk, so it runs in a
+        worker thread instead.
+        """
+        if self._uploader_options["overflow"] == "block" or self._spool is not None:
+            import asyncio
+            await asyncio.get_running_loop().run_in_executor(None, self._queue_upload, result, payload)
+        else:
+            self._queue_upload(result, payload)
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Send every queued evaluation now instead of waiting for its batch to fill.
+        
+        Args:
+            timeout: Longest time to wait in seconds (default: None, until done)
+        
+        Returns:
+            bool: True if the upload queue drained in time
+        """
+        uploader = self._uploader
+        if uploader is None:
+            return True
+        return uploader.flush(timeout)
+    
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """
+        Flush queued uploads, stop the background uploader and close this
+        instance's HTTP connections (a shared `http_pool` is left open).
+        With a spool, unsent uploads stay on disk for the next process.
+        
+        Evaluations queued after close() start a new uploader. Uploaders are
+        also flushed automatically at interpreter exit.
+        """
+        drained = True
+        with self._uploader_lock:
+            uploader, self._uploader = self._uploader, None
+        if uploader is not None:
+            drained = uploader.close(timeout)
+        if self._replayer is not None:
+            self._replayer.stop(timeout)
+            self._spool.close()
+        if self._owns_http:
+            self._http.close()
+        return drained
+    
+    async def aflush(self, timeout: Optional[float] = None) -> bool:
+        """flush() without blocking the event loop."""
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(None, self.flush, timeout)
+    
+    async def aclose(self, timeout: Optional[float] = None) -> bool:
+        """close() without blocking the event loop."""
+        import asyncio
+        drained = await asyncio.get_running_loop().run_in_executor(None, self.close, timeout)
+        if self._owns_http:
+            await self._http.aclose()
+        return drained
     
     def metrics(self):
         """
-        Return cumulative throughput statistics.
+        Return cumulative throughput and cache statistics.
         
         Returns:
             dict: {
                 'total_evaluations': int,
                 'total_time_sec': float,
-                'throughput_qps': float
+                'wall_time_sec': float,
+                'throughput_qps': float (completions per wall-clock second),
+                'in_flight': int, 'peak_in_flight': int,
+                'utilization': float, 'avg_concurrency': float,
+                'windowed_qps': dict (QPS over the last '1m', '5m', '15m'),
+                'latency_percentiles_sec': dict ('p50', 'p95', 'p99'),
+                'embedding_cache': dict (size, hits, misses, evictions, ...),
+                'embedding_batching': dict (enabled, batches_sent, texts_sent, ...),
+                'verdict_cache': dict (enabled, size, hits, misses, evictions, ...),
+                'skipped_evaluations': int, 'total_requests': int,
+                'sampling': dict (sampler policy and counters, if a sampler is set),
+                'stage_policies': dict (deadline/retry/hedge counters per stage),
+                'uploads': dict (queued, sent, failed, dropped, batches; once uploading),
+                'http': dict (HTTP/2 flag, pool limits, clients opened, requests sent),
+                'spool': dict (depth, bytes, replay_lag_sec, replayed, ...; with spool_dir),
+                'compression': dict (codec, bodies compressed, raw and sent bytes, ratio),
+                'documents': dict (known hashes, chunks not resent, bytes saved; with dedupe_docs)
             }
         """
-        return get_throughput_stats()
+        stats = self._base_metrics()
+        uploader = self._uploader
+        if uploader is not None:
+            stats["uploads"] = uploader.stats()
+        if self._spool is not None:
+            stats["spool"] = {**self._spool.stats(), **self._replayer.stats()}
+        return stats
     
     def reset_metrics(self):
         """
@@ -251,7 +909,18 @@ class AgentOps:
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """Context manager exit."""
+        """Context manager exit - sends queued uploads."""
+        self.flush()
+        self.end_session()
+        return False
+    
+    async def __aenter__(self):
+        """Async context manager entry."""
+        self.start_session()
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit - sends queued uploads."""
+        await self.aflush()
         self.end_session()
         return False
-
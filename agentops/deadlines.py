@@ -0,0 +1,292 @@
+"""
+Deadlines, retries and hedged requests for detector stages.
+
+- StagePolicy: runs one detector stage (embedding or judge) under a
+  deadline, retries retryable failures with jittered exponential backoff,
+  and optionally hedges: a duplicate request is sent once the first has
+  been outstanding longer than the stage's recent p95 latency
+- DeadlineExceeded: raised when a stage has no result by its deadline
+- remaining_time: time left before the running stage's deadline, for
+  bounding the timeout of the request it makes
+"""
+
+import random
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import ContextVar, copy_context
+from threading import Lock
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors
+RETRYABLE_STATUS = (408, 409, 429)
+RETRYABLE_ERROR_NAMES = ("APITimeoutError", "APIConnectionError")
+
+_pool = None
+_pool_lock = Lock()
+
+# Deadline (time.monotonic() value) of the stage running in this context;
+# copied into pool threads and tasks along with the rest of the context
+_stage_deadline = ContextVar("agentops_stage_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """A detector stage produced no result before its deadline."""
+
+
+def is_retryable(error):
+    """Whether a failed call is worth retrying (timeouts, 429s, 5xx, dropped connections)."""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return (
+        isinstance(error, (TimeoutError, ConnectionError))
+        or type(error).__name__ in RETRYABLE_ERROR_NAMES
+    )
+
+
+def remaining_time():
+    """Seconds left before the current stage's deadline, or None without one."""
+    deadline = _stage_deadline.get()
+    return deadline - time.monotonic() if deadline is not None else None
+
+
+def _get_pool():
+    """
+    Thread pool for deadline-bound and hedged calls, created on first use.
+
+    Kept apart from the detector executor so a stage running on that
+    executor can never wait on work queued behind itself.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="agentops-stage")
+        return _pool
+
+
+class StagePolicy:
+    """
+    Deadline, retry and hedging policy for one detector stage.
+
+    Sync calls that miss their deadline are abandoned rather than
+    interrupted; the stage's request is bounded by remaining_time(), so the
+    worker thread is freed soon after. Async calls are cancelled. Hedging needs `hedge_min_samples` successful
+    calls before it kicks in, since the p95 is estimated from the last
+    `history` latencies.
+    """
+    def __init__(self, deadline_sec=None, max_retries=2, backoff_base_sec=0.1,
+                 backoff_max_sec=2.0, hedge=False, hedge_quantile=0.95,
+                 hedge_min_samples=20, history=256, rng=None):
+        """
+        Args:
+            deadline_sec: Time budget for the whole stage, retries included (None = unbounded)
+            max_retries: Retries after the first attempt for retryable errors
+            backoff_base_sec: Backoff ceiling for the first retry; doubles per retry
+            backoff_max_sec: Upper bound for the backoff ceiling
+            hedge: Send a duplicate request once the first outlives the hedge quantile
+            hedge_quantile: Latency quantile that triggers the hedge (default: p95)
+            hedge_min_samples: Successful calls observed before hedging starts
+            history: Number of recent latencies kept for the quantile
+            rng: Optional random.Random instance (for reproducible jitter)
+        """
+        if max_retries < 0:
+            raise ValueError("max_retries must be non-negative")
+        self.deadline_sec = deadline_sec
+        self.max_retries = max_retries
+        self.backoff_base_sec = backoff_base_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies = deque(maxlen=history)
+        self._rng = rng or random.Random()
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadline_misses = 0
+        self.lock = Lock()
+
+    # ---------- Bookkeeping ----------
+
+    def record(self, latency):
+        """Remember the latency of a successful request."""
+        with self.lock:
+            self._latencies.append(latency)
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None while hedging is off or warming up."""
+        if not self.hedge:
+            return None
+        with self.lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))]
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff before retry number `attempt` (0-based)."""
+        ceiling = min(self.backoff_max_sec, self.backoff_base_sec * (2 ** attempt))
+        return self._rng.uniform(0, ceiling)
+
+    def _count(self, name, amount=1):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def stats(self):
+        """Return policy settings and counters."""
+        delay = self.hedge_delay()
+        with self.lock:
+            return {
+                "deadline_sec": self.deadline_sec,
+                "max_retries": self.max_retries,
+                "hedge": self.hedge,
+                "hedge_after_sec": round(delay, 4) if delay is not None else None,
+                "calls": self.calls,
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "deadline_misses": self.deadline_misses
+            }
+
+    # ---------- Sync ----------
+
+    def call(self, fn, *args):
+        """
+        Run `fn(*args)` under this policy.
+
+        Raises:
+            DeadlineExceeded: No attempt succeeded before the deadline
+            Exception: The last error, if it was not retryable or retries ran out
+        """
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline_sec if self.deadline_sec is not None else None
+        token = _stage_deadline.set(deadline)
+        try:
+            return self._call(fn, args, deadline)
+        finally:
+            _stage_deadline.reset(token)
+
+    def _call(self, fn, args, deadline):
+        """Attempts and retries of call()."""
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(fn, args, deadline)
+            except DeadlineExceeded:
+                self._count("deadline_misses")
+                raise
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.backoff(attempt)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    self._count("deadline_misses")
+                    raise DeadlineExceeded(f"deadline reached while retrying: {e}") from e
+                attempt += 1
+                self._count("retries")
+                time.sleep(delay)
+
+    def _attempt(self, fn, args, deadline):
+        """One attempt, possibly hedged, bounded by the deadline."""
+        hedge_delay = self.hedge_delay()
+        if deadline is None and hedge_delay is None:
+            start = time.monotonic()
+            value = fn(*args)
+            self.record(time.monotonic() - start)
+            return value
+
+        pool = _get_pool()
+        started = {pool.submit(copy_context().run, fn, *args): time.monotonic()}
+        first = next(iter(started))
+        hedge_at = time.monotonic() + hedge_delay if hedge_delay is not None else None
+        error = None
+        while started:
+            wake = min(t for t in (deadline, hedge_at) if t is not None) if (deadline or hedge_at) else None
+            timeout = max(0.0, wake - time.monotonic()) if wake is not None else None
+            done, _ = wait(started, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                submitted = started.pop(future)
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                self.record(time.monotonic() - submitted)
+                if future is not first:
+                    self._count("hedge_wins")
+                return future.result()
+            now = time.monotonic()
+            if hedge_at is not None and now >= hedge_at and started:
+                started[pool.submit(copy_context().run, fn, *args)] = now
+                hedge_at = None
+                self._count("hedges")
+            elif deadline is not None and now >= deadline and started:
+                raise DeadlineExceeded(f"no result within {self.deadline_sec}s")
+        raise error
+
+    # ---------- Async ----------
+
+    async def acall(self, fn, *args):
+        """Async counterpart of call() for a coroutine function `fn`."""
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline_sec if self.deadline_sec is not None else None
+        token = _stage_deadline.set(deadline)
+        try:
+            return await self._acall(fn, args, deadline)
+        finally:
+            _stage_deadline.reset(token)
+
+    async def _acall(self, fn, args, deadline):
+        """Attempts and retries of acall()."""
+        attempt = 0
+        while True:
+            try:
+                return await self._aattempt(fn, args, deadline)
+            except DeadlineExceeded:
+                self._count("deadline_misses")
+                raise
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.backoff(attempt)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    self._count("deadline_misses")
+                    raise DeadlineExceeded(f"deadline reached while retrying: {e}") from e
+                attempt += 1
+                self._count("retries")
+                import asyncio
+                await asyncio.sleep(delay)
+
+    async def _aattempt(self, fn, args, deadline):
+        """One async attempt, possibly hedged; losing requests are cancelled."""
+        import asyncio
+
+        hedge_delay = self.hedge_delay()
+        started = {asyncio.ensure_future(fn(*args)): time.monotonic()}
+        first = next(iter(started))
+        hedge_at = time.monotonic() + hedge_delay if hedge_delay is not None else None
+        error = None
+        try:
+            while started:
+                wake = min(t for t in (deadline, hedge_at) if t is not None) if (deadline or hedge_at) else None
+                timeout = max(0.0, wake - time.monotonic()) if wake is not None else None
+                done, _ = await asyncio.wait(started, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    submitted = started.pop(task)
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    self.record(time.monotonic() - submitted)
+                    if task is not first:
+                        self._count("hedge_wins")
+                    return task.result()
+                now = time.monotonic()
+                if hedge_at is not None and now >= hedge_at and started:
+                    started[asyncio.ensure_future(fn(*args))] = now
+                    hedge_at = None
+                    self._count("hedges")
+                elif deadline is not None and now >= deadline and started:
+                    raise DeadlineExceeded(f"no result within {self.deadline_sec}s")
+            raise error
+        finally:
+            for task in started:
+                task.cancel()
@@ -12,110 +12,690 @@ Returns explainable scores including:
 
 import os
 import re
+import sys
 import time
-import numpy as np
-from openai import OpenAI
-from dotenv import load_dotenv
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
 from threading import Lock
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from .batching import EmbeddingBatcher
+from .cache import EmbeddingCache, VerdictCache
+from .metrics import ThroughputTracker
+from .deadlines import DeadlineExceeded, StagePolicy, remaining_time
+from .uncertainty import UncertaintyScorer
 
+# numpy, openai, python-dotenv and asyncio are imported on first use to keep
+# `import agentops` cheap for serverless functions and CLI tools.
 
-# ---------- Throughput Tracker ----------
 
-class ThroughputTracker:
+# ---------- OpenAI Clients ----------
+
+_client = None
+_async_client = None
+_client_lock = Lock()
+
+# Per-request timeout of clients the SDK builds itself (the OpenAI default
+# is 10 minutes); stage deadlines shorten it further, see _bounded()
+OPENAI_TIMEOUT_SEC = 60.0
+
+# (client, async_client) injected into one AgentOps instance; set only while
+# that instance evaluates (see openai_clients) and preferred over the above
+_scoped_clients = ContextVar("agentops_openai_clients", default=None)
+
+
+def _api_key_from_env():
+    """Load .env (once) and return OPENAI_API_KEY."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    return os.getenv("OPENAI_API_KEY")
+
+
+def get_openai_client():
     """
-    Thread-safe throughput tracker for batch/concurrent evaluation scenarios.
-    Tracks cumulative evaluations and total time for throughput calculation.
+    Return the OpenAI client used by the detector.
+    
+    A client scoped to the current evaluation (see openai_clients) comes
+    first, then one injected process-wide (see set_openai_client).
+    Otherwise a client is built on first use from OPENAI_API_KEY, loading
+    .env first.
     """
-    def __init__(self):
-        self.total_evaluations = 0
-        self.total_time = 0.0
-        self.lock = Lock()
-    
-    def record(self, latency):
-        """Record an evaluation and its latency."""
-        with self.lock:
-            self.total_evaluations += 1
-            self.total_time += latency
-    
-    def get_throughput(self):
-        """Get current throughput (requests per second)."""
-        with self.lock:
-            if self.total_time == 0:
-                return 0.0
-            return round(self.total_evaluations / self.total_time, 3)
-    
-    def reset(self):
-        """Reset counters."""
-        with self.lock:
-            self.total_evaluations = 0
-            self.total_time = 0.0
+    global _client
+    scoped = _scoped_clients.get()
+    if scoped is not None:
+        return _require(scoped[0], "openai_client")
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=_api_key_from_env(), timeout=OPENAI_TIMEOUT_SEC)
+    return _client
+
+
+def get_async_openai_client():
+    """Async counterpart of get_openai_client(), returning an AsyncOpenAI client."""
+    global _async_client
+    scoped = _scoped_clients.get()
+    if scoped is not None:
+        return _require(scoped[1], "async_openai_client")
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                from openai import AsyncOpenAI
+                _async_client = AsyncOpenAI(api_key=_api_key_from_env(), timeout=OPENAI_TIMEOUT_SEC)
+    return _async_client
+
+
+def set_openai_client(client=None, async_client=None):
+    """
+    Inject the OpenAI clients used for embeddings and judge calls.
+    
+    Injected clients are never combined with environment lookups, so the SDK
+    does not read .env or OPENAI_API_KEY unless it has to build a client itself.
+    Passing None for either argument resets it to lazy construction.
+    
+    Args:
+        client: An `openai.OpenAI` instance (or compatible object)
+        async_client: An `openai.AsyncOpenAI` instance (or compatible object)
+    """
+    global _client, _async_client
+    with _client_lock:
+        _client = client
+        _async_client = async_client
+
+
+def _require(client, name):
+    if client is None:
+        raise RuntimeError(
+            f"this AgentOps instance has no {name}; pass both openai_client and "
+            "async_openai_client when injecting clients that are not openai.OpenAI/AsyncOpenAI"
+        )
+    return client
+
+
+def _counterpart(client):
+    """Build the async twin of an openai.OpenAI (or the sync twin of an AsyncOpenAI)."""
+    openai = sys.modules.get("openai")
+    if openai is None:
+        # Not imported yet, so the client cannot be an openai client
+        return None
+    if isinstance(client, openai.OpenAI):
+        cls = openai.AsyncOpenAI
+    elif isinstance(client, openai.AsyncOpenAI):
+        cls = openai.OpenAI
+    else:
+        return None
+    return cls(
+        api_key=client.api_key,
+        organization=client.organization,
+        base_url=client.base_url,
+        timeout=client.timeout,
+        max_retries=client.max_retries
+    )
+
+
+def resolve_openai_clients(client=None, async_client=None):
+    """
+    Pair injected clients for use with openai_clients().
+    
+    A missing half is built from the other one's settings when that is an
+    `openai.OpenAI` or `openai.AsyncOpenAI` instance, so injecting only one
+    client never falls back to reading the environment.
+    
+    Returns:
+        tuple or None: (client, async_client), or None if neither was given
+    """
+    if client is None and async_client is None:
+        return None
+    if client is None:
+        client = _counterpart(async_client)
+    elif async_client is None:
+        async_client = _counterpart(client)
+    return client, async_client
+
+
+@contextmanager
+def openai_clients(clients):
+    """
+    Use a (client, async_client) pair for detector calls made in this context.
+    
+    The pair applies to the current thread or task and to the detector's
+    own worker threads and tasks started from it, so AgentOps instances
+    with different injected clients do not interfere. None leaves the
+    surrounding clients in place.
+    """
+    if clients is None:
+        yield
+        return
+    token = _scoped_clients.set(clients)
+    try:
+        yield
+    finally:
+        _scoped_clients.reset(token)
+
+
+def _bounded(client):
+    """
+    The client, limited to the running stage's remaining deadline if it has one.
+    
+    A request that outlives its stage's deadline is abandoned by StagePolicy,
+    so it gets no more time than that and no SDK-level retries (the policy
+    retries itself). Client objects without `with_options` are used as-is.
+    """
+    remaining = remaining_time()
+    if remaining is None or not hasattr(client, "with_options"):
+        return client
+    return client.with_options(timeout=max(remaining, 0.001), max_retries=0)
+
+
+def _submit(executor, fn, *args, **kwargs):
+    """executor.submit() that carries the caller's context (injected clients) to the worker."""
+    return executor.submit(copy_context().run, fn, *args, **kwargs)
+
+
+def __getattr__(name):
+    # Backwards compatibility: `detector_flexible.client` used to be a
+    # module-level OpenAI instance created at import time.
+    if name == "client":
+        return get_openai_client()
+    if name == "async_client":
+        return get_async_openai_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
+# ---------- Throughput Tracker ----------
+
 # Global throughput tracker for batch mode
 _throughput_tracker = ThroughputTracker()
 
+# Global embedding cache shared by all evaluations in this process
+EMBEDDING_MODEL = "text-embedding-3-small"
+JUDGE_MODEL = "gpt-4o-mini"
+_embedding_cache = EmbeddingCache()
+
+# Score fusion weights and decision threshold
+FACTUAL_WEIGHT = 0.4
+DRIFT_WEIGHT = 0.4
+UNCERTAINTY_WEIGHT = 0.2
+HALLUCINATION_THRESHOLD = 0.45
+
+# Evidence shown to the entailment judge is packed into this many tokens
+EVIDENCE_TOKEN_BUDGET = 1000
+
+# Lexical uncertainty scorer (see set_uncertainty_scorer)
+_uncertainty_scorer = UncertaintyScorer()
+
+# Optional persistent judge verdict cache (see configure_verdict_cache)
+DEFAULT_VERDICT_CACHE_PATH = os.path.join("~", ".agentops", "verdicts.sqlite3")
+_verdict_cache = None
+
+# Optional cross-evaluation embedding coalescer (see configure_embedding_batching)
+_embedding_batcher = None
+_batcher_lock = Lock()
+
+# Optional deadline/retry/hedging policy per stage (see configure_stage_policy)
+STAGES = ("embedding", "judge")
+_stage_policies = {}
+
+# Shared worker pool for parallel mode, created on first use
+DETECTOR_MAX_WORKERS = 32
+_executor = None
+_executor_lock = Lock()
+
+
+def _get_executor():
+    """Return the shared detector thread pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=DETECTOR_MAX_WORKERS,
+                thread_name_prefix="agentops-detector"
+            )
+        return _executor
+
 
 # ---------- Helper Functions ----------
 
 def cosine(v1, v2):
-    """Calculate cosine similarity between two vectors."""
-    v1, v2 = np.array(v1), np.array(v2)
-    return float(np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2)))
+    """Calculate cosine similarity between two vectors (0.0 if either is all zeros)."""
+    import numpy as np
+    v1, v2 = np.asarray(v1), np.asarray(v2)
+    norm = np.linalg.norm(v1) * np.linalg.norm(v2)
+    if norm == 0:
+        # e.g. HashingEmbedder on text with no word characters
+        return 0.0
+    return float(np.dot(v1, v2) / norm)
+
+
+def normalize_rows(vectors):
+    """
+    Stack vectors into a contiguous float32 matrix with unit-length rows.
+    
+    Normalize once and pass the result to batch_cosine(normalized=True) to
+    skip norm computation on every later comparison. Zero vectors stay zero.
+    
+    Args:
+        vectors: A single vector, a list of vectors, or a 2-D array
+    
+    Returns:
+        numpy.ndarray: float32 matrix of shape (n, dim)
+    """
+    import numpy as np
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2, order="C")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def batch_cosine(a, b, normalized=False):
+    """
+    Row-wise cosine similarity between two stacks of vectors.
+    
+    Args:
+        a: n vectors, or a single vector compared against every row of `b`
+        b: n vectors
+        normalized: Inputs are already unit-length float32 rows (e.g. from
+            normalize_rows), so norms are not recomputed
+    
+    Returns:
+        numpy.ndarray: float32 array of n similarities
+    """
+    import numpy as np
+    if normalized:
+        a = np.asarray(a, dtype=np.float32)
+        b = np.asarray(b, dtype=np.float32)
+        a = a.reshape(1, -1) if a.ndim == 1 else a
+        b = b.reshape(1, -1) if b.ndim == 1 else b
+    else:
+        a, b = normalize_rows(a), normalize_rows(b)
+    if a.shape[0] == 1 and b.shape[0] != 1:
+        return b @ a[0]
+    if b.shape[0] == 1 and a.shape[0] != 1:
+        return a @ b[0]
+    return np.einsum("ij,ij->i", a, b)
+
+
+def semantic_drift_batch(prompt_vectors, response_vectors, normalized=False):
+    """
+    Compute semantic drift (1 - cosine, clipped to [0, 1]) for many pairs at once.
+    
+    Args:
+        prompt_vectors: n prompt embeddings, or one embedding shared by all responses
+        response_vectors: n response embeddings
+        normalized: Inputs are already unit-length float32 rows
+    
+    Returns:
+        numpy.ndarray: float32 array of n drift values
+    """
+    import numpy as np
+    return np.clip(1.0 - batch_cosine(prompt_vectors, response_vectors, normalized), 0.0, 1.0)
+
+
+def _fetch_embeddings(model, texts, client=None):
+    """Embed texts with a single embeddings request, returning vectors in input order."""
+    emb = (client or _bounded(get_openai_client())).embeddings.create(model=model, input=list(texts))
+    return [d.embedding for d in sorted(emb.data, key=lambda d: d.index)]
+
+
+def _lookup_cached(texts, model):
+    """Return (cached vectors or None per text, distinct texts still missing)."""
+    vectors = [_embedding_cache.get(model, text) for text in texts]
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    return vectors, missing
+
+
+def _fill_missing(texts, vectors, missing, fetched, model):
+    """Cache freshly fetched vectors and fill the gaps left by _lookup_cached."""
+    by_text = dict(zip(missing, fetched))
+    for text, vector in by_text.items():
+        _embedding_cache.put(model, text, vector)
+    return [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+
+
+def get_embeddings(texts, model=EMBEDDING_MODEL):
+    """
+    Get embedding vectors for several texts with at most one request.
+    
+    Cached vectors are reused; the remaining distinct texts are embedded in a
+    single call (or handed to the micro-batcher when batching is enabled and
+    no stage deadline is running: a shared batch request cannot honour each
+    caller's deadline, so deadline-bound calls fetch directly).
+    
+    Args:
+        texts: List of strings to embed
+        model: Embedding model name
+    
+    Returns:
+        list: One vector per input text, in input order
+    """
+    vectors, missing = _lookup_cached(texts, model)
+    if missing:
+        batcher = _embedding_batcher
+        if batcher is not None and remaining_time() is None:
+            fetched = batcher.embed(model, missing, get_openai_client())
+        else:
+            fetched = _fetch_embeddings(model, missing)
+        vectors = _fill_missing(texts, vectors, missing, fetched, model)
+    return vectors
+
+
+def get_embedding(text, model=EMBEDDING_MODEL):
+    """
+    Get embedding vector for text using OpenAI's embedding model.
+    
+    Vectors are served from the process-wide embedding cache when possible,
+    so repeated prompts and answers skip the network round trip.
+    """
+    return get_embeddings([text], model=model)[0]
+
+
+# ---------- Embedding Backends ----------
+
+class Embedder(ABC):
+    """
+    Interface for embedding backends used by semantic drift.
+    
+    Subclasses implement `embed(texts)` returning one vector per text.
+    `aembed` defaults to calling `embed` directly, which suits local CPU
+    backends; network backends should override it with a real coroutine.
+    """
+    name = "custom"
+    
+    @abstractmethod
+    def embed(self, texts):
+        """Return a list with one vector (list or 1-D array) per text."""
+    
+    async def aembed(self, texts):
+        """Async counterpart of embed()."""
+        return self.embed(texts)
+
+
+class OpenAIEmbedder(Embedder):
+    """
+    Remote embedder backed by the OpenAI embeddings endpoint (the default).
+    
+    Goes through the shared embedding cache and, when enabled, the
+    cross-evaluation micro-batcher.
+    """
+    name = "openai"
+    
+    def __init__(self, model=EMBEDDING_MODEL):
+        self.model = model
+    
+    def embed(self, texts):
+        return get_embeddings(texts, model=self.model)
+    
+    async def aembed(self, texts):
+        return await aget_embeddings(texts, model=self.model)
+
+
+class HashingEmbedder(Embedder):
+    """
+    Local CPU embedder using signed feature hashing (no network, no model files).
+    
+    Word unigrams, word bigrams and character n-grams are hashed into a fixed
+    number of dimensions and the vector is L2-normalized. This measures
+    lexical rather than semantic overlap, so drift values are calibrated
+    differently from OpenAI embeddings (unrelated texts sit close to 1.0).
+    Intended for local-only or low-latency tiers.
+    """
+    name = "hashing"
+    
+    _token_re = re.compile(r"\w+")
+    
+    def __init__(self, dim=1024, char_ngram=3):
+        """
+        Args:
+            dim: Number of hashed dimensions
+            char_ngram: Character n-gram length (0 disables character features)
+        """
+        self.dim = dim
+        self.char_ngram = char_ngram
+    
+    def _features(self, text):
+        words = self._token_re.findall(text.lower())
+        features = list(words)
+        features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+        n = self.char_ngram
+        if n:
+            for word in words:
+                padded = f"<{word}>"
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+    
+    def embed(self, texts):
+        import numpy as np
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                matrix[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return list(matrix / norms)
 
 
-def get_embedding(text):
-    """Get embedding vector for text using OpenAI's embedding model."""
-    emb = client.embeddings.create(model="text-embedding-3-small", input=text)
-    return emb.data[0].embedding
+# Default backend used when no embedder is passed explicitly
+_default_embedder = OpenAIEmbedder()
+
+
+# Local backend used to rank retrieved chunks for the judge
+_evidence_embedder = HashingEmbedder()
+
+
+def set_embedder(embedder):
+    """
+    Set the process-wide default embedding backend.
+    
+    Args:
+        embedder: An Embedder instance (None restores the OpenAI backend)
+    """
+    global _default_embedder
+    _default_embedder = embedder if embedder is not None else OpenAIEmbedder()
+
+
+def get_embedder():
+    """Return the process-wide default embedding backend."""
+    return _default_embedder
 
 
 # ---------- Core Checks ----------
 
-def uncertainty_score(text):
+def uncertainty_score(text, scorer=None):
     """
     Calculate uncertainty score based on lexical cues.
     
+    Cues are matched in a single pass with word boundaries (see
+    agentops.uncertainty.UncertaintyScorer for custom, weighted lexicons).
+    
+    Args:
+        text: Response text to scan
+        scorer: Optional UncertaintyScorer (default: the process-wide scorer)
+    
     Returns:
         float: Score from 0 to 1, where higher means more uncertain language
     """
-    cues = ["maybe", "probably", "unsure", "not sure", "might", "perhaps", "possibly"]
-    hits = sum(1 for w in cues if w in text.lower())
-    return min(1.0, hits * 0.2)
+    return (scorer or _uncertainty_scorer).score(text)
 
 
-def entailment_score(response, retrieved_docs):
+def set_uncertainty_scorer(scorer):
     """
-    Check how well retrieved documents support the response using LLM evaluation.
+    Replace the process-wide uncertainty scorer, e.g. with a custom lexicon.
+    
+    Args:
+        scorer: An UncertaintyScorer (None restores the default lexicon)
+    """
+    global _uncertainty_scorer
+    _uncertainty_scorer = scorer if scorer is not None else UncertaintyScorer()
+
+
+# ---------- Evidence Selection ----------
+
+_token_encoder = None
+
+
+def count_tokens(text):
+    """
+    Count judge tokens in text.
+    
+    Uses tiktoken's o200k_base encoding (gpt-4o family) when tiktoken is
+    installed, otherwise estimates roughly four characters per token.
+    """
+    global _token_encoder
+    if _token_encoder is None:
+        try:
+            import tiktoken
+            _token_encoder = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            _token_encoder = False
+    if _token_encoder:
+        return len(_token_encoder.encode(text))
+    return (len(text) + 3) // 4
+
+
+def _truncate_to_tokens(text, budget):
+    """Cut text so that it fits in `budget` tokens."""
+    if _token_encoder:
+        return _token_encoder.decode(_token_encoder.encode(text)[:budget])
+    return text[:budget * 4]
+
+
+def select_evidence(response, retrieved_docs, token_budget=EVIDENCE_TOKEN_BUDGET,
+                    dedup_threshold=0.9, embedder=None):
+    """
+    Pick the retrieved chunks most worth showing the judge.
+    
+    Chunks are ranked by similarity to the response, near-duplicates of an
+    already chosen chunk are dropped, and the best remaining chunks are
+    packed greedily into a token budget. If even the best chunk is larger
+    than the budget it is truncated rather than dropped.
     
     Args:
         response: The LLM's response text
         retrieved_docs: List of evidence text chunks
+        token_budget: Maximum evidence tokens sent to the judge
+        dedup_threshold: Cosine similarity at or above which a chunk counts
+            as a duplicate of one already selected
+        embedder: Embedder used for ranking (default: local HashingEmbedder,
+            so selection adds no network round trip)
     
     Returns:
-        float: Score from 0 to 1, where 1 = fully supported by evidence
+        list: Selected chunks, most relevant first
     """
-    evidence = "\n\n".join(retrieved_docs)
-    prompt = f"""
+    docs = [d for d in retrieved_docs if d and d.strip()]
+    if not docs:
+        return []
+    
+    embedder = embedder or _evidence_embedder
+    matrix = normalize_rows(embedder.embed([response] + docs))
+    relevance = batch_cosine(matrix[0], matrix[1:], normalized=True)
+    ranked = sorted(range(len(docs)), key=lambda i: -relevance[i])
+    
+    selected, selected_rows = [], []
+    remaining = token_budget
+    for i in ranked:
+        if selected_rows:
+            overlap = batch_cosine(matrix[1 + i], matrix[selected_rows], normalized=True)
+            if float(overlap.max()) >= dedup_threshold:
+                continue
+        # Chunks are joined with a blank line, which costs about one token
+        cost = count_tokens(docs[i]) + (1 if selected else 0)
+        if cost <= remaining:
+            selected.append(docs[i])
+        elif not selected:
+            selected.append(_truncate_to_tokens(docs[i], remaining))
+            cost = remaining
+        else:
+            continue
+        selected_rows.append(1 + i)
+        remaining -= cost
+        if remaining <= 0:
+            break
+    return selected
+
+
+def _entailment_prompt(response, retrieved_docs):
+    """Build the judge prompt for retrieved-doc entailment."""
+    evidence = "\n\n".join(select_evidence(response, retrieved_docs))
+    return f"""
 Given the EVIDENCE below, rate from 0 to 1 how well it supports the ANSWER.
 1 = fully supported, 0 = completely unsupported.
 
 EVIDENCE:
-{evidence[:4000]}
+{evidence}
 
 ANSWER:
 {response}
 """
-    comp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
+
+
+def _selfcheck_prompt(prompt, response):
+    """Build the judge prompt for the no-RAG factual self-check."""
+    return f"""
+Evaluate the factual accuracy of the following response relative to the question.
+Rate from 0 (hallucinated) to 1 (factually correct).
+
+Question: {prompt}
+Response: {response}
+"""
+
+
+def _parse_score(txt, default=0.5):
+    """Extract a 0-1 score from the judge's reply (`default` if none is found)."""
+    m = re.search(r"0\.\d+|1", txt or "")
+    return float(m.group()) if m else default
+
+
+def _cached_verdict(query):
+    """Look up a judge prompt in the verdict cache, if one is configured."""
+    if _verdict_cache is None:
+        return None
+    return _verdict_cache.get(JUDGE_MODEL, query)
+
+
+def _score_reply(query, txt):
+    """Parse a judge reply and remember it in the verdict cache."""
+    score = _parse_score(txt, default=None)
+    if score is None:
+        # Unparseable replies fall back to neutral and are not cached
+        return 0.5
+    if _verdict_cache is not None:
+        _verdict_cache.put(JUDGE_MODEL, query, score)
+    return score
+
+
+def _ask_judge(query):
+    """Send a judge prompt to the chat model and parse the score."""
+    cached = _cached_verdict(query)
+    if cached is not None:
+        return cached
+    comp = _bounded(get_openai_client()).chat.completions.create(
+        model=JUDGE_MODEL,
+        messages=[{"role": "user", "content": query}],
         temperature=0
     )
-    txt = comp.choices[0].message.content
-    m = re.search(r"0\.\d+|1", txt)
-    return float(m.group()) if m else 0.5
+    return _score_reply(query, comp.choices[0].message.content)
+
+
+def entailment_score(response, retrieved_docs):
+    """
+    Check how well retrieved documents support the response using LLM evaluation.
+    
+    Only the most relevant, non-duplicate chunks are sent to the judge,
+    packed into EVIDENCE_TOKEN_BUDGET tokens (see select_evidence).
+    
+    Args:
+        response: The LLM's response text
+        retrieved_docs: List of evidence text chunks
+    
+    Returns:
+        float: Score from 0 to 1, where 1 = fully supported by evidence
+    """
+    return _ask_judge(_entailment_prompt(response, retrieved_docs))
 
 
 def factual_selfcheck(prompt, response):
@@ -130,26 +710,308 @@ def factual_selfcheck(prompt, response):
     Returns:
         float: Score from 0 to 1, where 1 = factually correct
     """
-    query = f"""
-Evaluate the factual accuracy of the following response relative to the question.
-Rate from 0 (hallucinated) to 1 (factually correct).
+    return _ask_judge(_selfcheck_prompt(prompt, response))
 
-Question: {prompt}
-Response: {response}
+
+def _mode_for(retrieved_docs):
+    """Name of the factual check used for these inputs."""
+    return "retrieved-doc entailment" if retrieved_docs else "self-check"
+
+
+def _judge(prompt, response, retrieved_docs):
+    """Run the factual check for the current mode and return (score, mode)."""
+    if retrieved_docs:
+        return entailment_score(response, retrieved_docs), "retrieved-doc entailment"
+    return factual_selfcheck(prompt, response), "self-check"
+
+
+def _batch_judge_prompt(queries):
+    """Combine several single-item judge prompts into one numbered request."""
+    sections = "\n".join(
+        f"### Item {i}\n{query.strip()}\n" for i, query in enumerate(queries, 1)
+    )
+    return f"""
+You will grade {len(queries)} independent items. Grade each item on its own,
+following the instructions inside that item, with a score from 0 to 1.
+
+{sections}
+Reply with JSON only, in the form
+{{"scores": [{{"id": 1, "score": 0.0}}, ...]}}
+with exactly one entry per item id from 1 to {len(queries)}.
 """
-    comp = client.chat.completions.create(
-        model="gpt-4o-mini",
+
+
+def _parse_batch_scores(txt, count):
+    """
+    Validate a batched judge reply.
+    
+    Returns:
+        dict: Item id (1-based) -> score for every entry that is well formed;
+            ids that are missing, duplicated or out of range are left out
+    """
+    import json
+    
+    try:
+        data = json.loads(txt or "")
+    except ValueError:
+        # Models occasionally wrap the JSON in prose or a code fence
+        m = re.search(r"[\[{].*[\]}]", txt or "", re.DOTALL)
+        if not m:
+            return {}
+        try:
+            data = json.loads(m.group())
+        except ValueError:
+            return {}
+    entries = data.get("scores") if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        return {}
+    
+    scores, seen = {}, set()
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        item_id, score = entry.get("id"), entry.get("score")
+        if isinstance(item_id, bool) or not isinstance(item_id, int) or not 1 <= item_id <= count:
+            continue
+        if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 1:
+            continue
+        if item_id in seen:
+            scores.pop(item_id, None)
+            continue
+        seen.add(item_id)
+        scores[item_id] = float(score)
+    return scores
+
+
+def _ask_judge_many(queries):
+    """
+    Score several judge prompts with one chat completion.
+    
+    Cached verdicts are served without a request. Items the batched reply
+    does not score cleanly are retried one by one with _ask_judge.
+    """
+    scores = [_cached_verdict(query) for query in queries]
+    pending = [i for i, score in enumerate(scores) if score is None]
+    if len(pending) == 1:
+        scores[pending[0]] = _ask_judge(queries[pending[0]])
+        return scores
+    if pending:
+        comp = _bounded(get_openai_client()).chat.completions.create(
+            model=JUDGE_MODEL,
+            messages=[{"role": "user", "content": _batch_judge_prompt([queries[i] for i in pending])}],
+            temperature=0,
+            response_format={"type": "json_object"}
+        )
+        parsed = _parse_batch_scores(comp.choices[0].message.content, len(pending))
+        for item_id, i in enumerate(pending, 1):
+            score = parsed.get(item_id)
+            if score is None:
+                scores[i] = _ask_judge(queries[i])
+                continue
+            if _verdict_cache is not None:
+                _verdict_cache.put(JUDGE_MODEL, queries[i], score)
+            scores[i] = score
+    return scores
+
+
+def judge_many(items, batch_size=8):
+    """
+    Run the factual check for many items, several per chat completion.
+    
+    Each item gets the same entailment or self-check prompt a single
+    evaluation would send; up to `batch_size` of them are packed into one
+    request that asks for a JSON list of scores. Items whose score is
+    missing or malformed in the reply fall back to their own request, so
+    one bad entry never fails the batch.
+    
+    Args:
+        items: Iterable of (prompt, response, retrieved_docs) tuples
+            (retrieved_docs may be None for self-check)
+        batch_size: Maximum items per judge request (default: 8)
+    
+    Returns:
+        list: (score, mode) per item, in input order
+    """
+    items = [tuple(item) for item in items]
+    queries = [
+        _entailment_prompt(response, docs) if docs else _selfcheck_prompt(prompt, response)
+        for prompt, response, docs in items
+    ]
+    batch_size = max(1, batch_size)
+    scores = []
+    for start in range(0, len(queries), batch_size):
+        scores.extend(_ask_judge_many(queries[start:start + batch_size]))
+    return [(score, _mode_for(docs)) for score, (_, _, docs) in zip(scores, items)]
+
+
+def _decided_without_judge(drift, uncert):
+    """
+    Check whether drift and uncertainty alone settle the verdict.
+    
+    The judge can only move the fused score within
+    [cheap part, cheap part + FACTUAL_WEIGHT]. If that whole range lies on
+    one side of the threshold, the judge cannot change the outcome.
+    
+    Returns:
+        bool or None: The verdict if already decided, otherwise None
+    """
+    drift = min(max(drift, 0.0), 1.0)
+    cheap = DRIFT_WEIGHT * drift + UNCERTAINTY_WEIGHT * uncert
+    lowest = round(cheap, 3)
+    highest = round(cheap + FACTUAL_WEIGHT, 3)
+    if lowest > HALLUCINATION_THRESHOLD:
+        return True
+    if highest <= HALLUCINATION_THRESHOLD:
+        return False
+    return None
+
+
+# ---------- Async Checks ----------
+
+async def aget_embeddings(texts, model=EMBEDDING_MODEL):
+    """
+    Async counterpart of get_embeddings().
+    
+    Shares the embedding cache with the sync path; distinct misses are
+    embedded in a single awaited request.
+    """
+    vectors, missing = _lookup_cached(texts, model)
+    if missing:
+        emb = await _bounded(get_async_openai_client()).embeddings.create(model=model, input=missing)
+        fetched = [d.embedding for d in sorted(emb.data, key=lambda d: d.index)]
+        vectors = _fill_missing(texts, vectors, missing, fetched, model)
+    return vectors
+
+
+async def _aask_judge(query):
+    """
+    Async counterpart of _ask_judge().
+    
+    Verdict cache lookups and writes run in the default executor: SQLite
+    may wait up to its busy timeout on other processes' locks, which must
+    not stall the event loop.
+    """
+    import asyncio
+    
+    loop = asyncio.get_running_loop()
+    if _verdict_cache is not None:
+        cached = await loop.run_in_executor(None, _cached_verdict, query)
+        if cached is not None:
+            return cached
+    comp = await _bounded(get_async_openai_client()).chat.completions.create(
+        model=JUDGE_MODEL,
         messages=[{"role": "user", "content": query}],
         temperature=0
     )
     txt = comp.choices[0].message.content
-    m = re.search(r"0\.\d+|1", txt)
-    return float(m.group()) if m else 0.5
+    if _verdict_cache is None:
+        return _score_reply(query, txt)
+    return await loop.run_in_executor(None, _score_reply, query, txt)
+
+
+async def aentailment_score(response, retrieved_docs):
+    """Async counterpart of entailment_score()."""
+    return await _aask_judge(_entailment_prompt(response, retrieved_docs))
+
+
+async def afactual_selfcheck(prompt, response):
+    """Async counterpart of factual_selfcheck()."""
+    return await _aask_judge(_selfcheck_prompt(prompt, response))
+
+
+async def _ajudge(prompt, response, retrieved_docs):
+    """Async counterpart of _judge()."""
+    if retrieved_docs:
+        return await aentailment_score(response, retrieved_docs), "retrieved-doc entailment"
+    return await afactual_selfcheck(prompt, response), "self-check"
+
+
+# ---------- Stage Policies ----------
+
+class _StageTrace:
+    """
+    Per-evaluation record of stage durations and missed deadlines.
+    
+    Durations come from time.perf_counter(), so they are immune to
+    wall-clock adjustments. Stages running on different threads write
+    different keys, so no lock is needed.
+    """
+    __slots__ = ("timings", "missed")
+    
+    def __init__(self):
+        self.timings = {}
+        self.missed = []
+    
+    def add(self, label, seconds):
+        """Record how long a stage took."""
+        self.timings[f"{label}_sec"] = round(seconds, 4)
+
+
+def _run_stage(stage, trace, fn, *args, label=None):
+    """
+    Run a detector stage under its policy, if one is configured, and time it.
+    
+    The duration is recorded in `trace` under `label` (default: the stage
+    name). A stage that misses its deadline is added to `trace.missed` and
+    yields None.
+    """
+    policy = _stage_policies.get(stage)
+    start = time.perf_counter()
+    try:
+        if policy is None:
+            return fn(*args)
+        return policy.call(fn, *args)
+    except DeadlineExceeded:
+        trace.missed.append(stage)
+        return None
+    finally:
+        trace.add(label or stage, time.perf_counter() - start)
+
+
+async def _arun_stage(stage, trace, fn, *args, label=None):
+    """Async counterpart of _run_stage() for a coroutine function `fn`."""
+    policy = _stage_policies.get(stage)
+    start = time.perf_counter()
+    try:
+        if policy is None:
+            return await fn(*args)
+        return await policy.acall(fn, *args)
+    except DeadlineExceeded:
+        trace.missed.append(stage)
+        return None
+    finally:
+        trace.add(label or stage, time.perf_counter() - start)
+
+
+def _drift_stage(embedder, prompt, response, trace):
+    """Semantic drift from one embeddings request, or None past the deadline."""
+    vectors = _run_stage("embedding", trace, embedder.embed, [prompt, response])
+    return 1 - cosine(*vectors) if vectors is not None else None
+
+
+def _judge_stage(prompt, response, retrieved_docs, trace):
+    """(score, mode) from the judge; the score is None past the deadline."""
+    verdict = _run_stage("judge", trace, _judge, prompt, response, retrieved_docs)
+    return verdict if verdict is not None else (None, _mode_for(retrieved_docs))
+
+
+async def _adrift_stage(embedder, prompt, response, trace):
+    """Async counterpart of _drift_stage()."""
+    vectors = await _arun_stage("embedding", trace, embedder.aembed, [prompt, response])
+    return 1 - cosine(*vectors) if vectors is not None else None
+
+
+async def _ajudge_stage(prompt, response, retrieved_docs, trace):
+    """Async counterpart of _judge_stage()."""
+    verdict = await _arun_stage("judge", trace, _ajudge, prompt, response, retrieved_docs)
+    return verdict if verdict is not None else (None, _mode_for(retrieved_docs))
 
 
 # ---------- Unified Detector ----------
 
-def detect_hallucination(prompt, response, retrieved_docs=None, track_throughput=True):
+def detect_hallucination(prompt, response, retrieved_docs=None, track_throughput=True,
+                         parallel=False, embedder=None, tiered=False, judge_score=None,
+                         judge_sec=None):
     """
     Detect potential hallucinations in LLM responses with reliability metrics.
     
@@ -162,66 +1024,398 @@ def detect_hallucination(prompt, response, retrieved_docs=None, track_throughput
         response: The LLM's response text
         retrieved_docs: Optional list of retrieved evidence chunks
         track_throughput: Whether to update global throughput tracker (default: True)
+        parallel: Overlap the embeddings request and the judge call on a
+            shared thread pool, so latency is close to the slowest call
+            instead of their sum (default: False)
+        embedder: Embedder backend for semantic drift (default: the
+            process-wide backend, OpenAI unless changed with set_embedder)
+        tiered: Compute drift and uncertainty first and only call the LLM
+            judge when they leave the verdict undecided. Takes precedence
+            over overlapping the judge call in parallel mode (default: False)
+        judge_score: Factual score already obtained for these inputs, e.g.
+            from judge_many(); the judge call is skipped (default: None)
+        judge_sec: Time spent obtaining `judge_score` (e.g. this item's share
+            of a judge_many() request); reported as 'judge_sec' and included
+            in latency_sec (default: None)
+    
+    Stages with a policy from configure_stage_policy() run under its
+    deadline, retries and hedging. A stage that misses its deadline does
+    not fail the evaluation: its signal is reported as None and the
+    result is returned as partial.
     
     Returns:
         dict: {
             # Truth metrics
-            'semantic_drift': float (0-1, semantic distance from prompt),
+            'semantic_drift': float or None (0-1, semantic distance from prompt;
+                None when the embedding stage missed its deadline),
             'uncertainty': float (0-1, uncertainty language score),
-            'factual_support': float (0-1, factual grounding score),
+            'factual_support': float or None (0-1, factual grounding score;
+                None when the judge was skipped or missed its deadline),
             'mode': str ('retrieved-doc entailment' or 'self-check'),
-            'hallucination_probability': float (0-1, overall score),
+            'hallucination_probability': float (0-1, overall score; missing
+                drift or factual scores count as a neutral 0.5),
             'hallucinated': bool (True if probability > 0.45),
+            'decision_tier': str ('judge', 'cheap' when drift and
+                uncertainty decided the verdict on their own, or 'partial'
+                when a stage missed its deadline),
+            'missed_deadlines': list (stages that missed their deadline),
             
             # Reliability metrics
             'latency_sec': float (end-to-end evaluation time in seconds),
-            'throughput_qps': float (requests per second - cumulative if tracking enabled)
+            'throughput_qps': float (requests per second - cumulative if tracking enabled),
+            'stage_timings': dict (seconds per stage: 'embedding_sec' for the
+                shared prompt+response embeddings request, 'judge_sec',
+                'fusion_sec'; stages that did not run are absent)
         }
     """
-    # Start latency timer
-    start_time = time.time()
+    # Start latency timer (monotonic, unaffected by wall-clock changes)
+    start_time = time.perf_counter()
     
-    # Always compute drift and uncertainty
-    drift = 1 - cosine(get_embedding(prompt), get_embedding(response))
-    uncert = uncertainty_score(response)
+    with _throughput_tracker.tracking(track_throughput):
+        embedder = embedder or _default_embedder
+        trace = _StageTrace()
+        
+        if judge_score is not None:
+            if judge_sec is not None:
+                # The judge ran before this call; count it as if it had run inside
+                start_time -= judge_sec
+                trace.add("judge", judge_sec)
+            drift = _drift_stage(embedder, prompt, response, trace)
+            uncert = uncertainty_score(response)
+            factual, reason = judge_score, _mode_for(retrieved_docs)
+        elif tiered:
+            drift = _drift_stage(embedder, prompt, response, trace)
+            uncert = uncertainty_score(response)
+            if drift is not None and _decided_without_judge(drift, uncert) is not None:
+                return _build_result(drift, uncert, None, _mode_for(retrieved_docs),
+                                     start_time, track_throughput, trace)
+            factual, reason = _judge_stage(prompt, response, retrieved_docs, trace)
+        elif parallel:
+            # The embeddings request and the judge call are independent, so run them side by side
+            executor = _get_executor()
+            drift_future = _submit(executor, _drift_stage, embedder, prompt, response, trace)
+            judge_future = _submit(executor, _judge_stage, prompt, response, retrieved_docs, trace)
+            uncert = uncertainty_score(response)
+            drift = drift_future.result()
+            factual, reason = judge_future.result()
+        else:
+            # Always compute drift and uncertainty (both texts in one embeddings request)
+            drift = _drift_stage(embedder, prompt, response, trace)
+            uncert = uncertainty_score(response)
+            factual, reason = _judge_stage(prompt, response, retrieved_docs, trace)
 
-    if retrieved_docs:
-        factual = entailment_score(response, retrieved_docs)
-        reason = "retrieved-doc entailment"
-    else:
-        factual = factual_selfcheck(prompt, response)
-        reason = "self-check"
+        return _build_result(drift, uncert, factual, reason, start_time, track_throughput, trace)
 
+
+async def adetect_hallucination(prompt, response, retrieved_docs=None, track_throughput=True,
+                                embedder=None, tiered=False):
+    """
+    Async counterpart of detect_hallucination().
+    
+    The embeddings request and the judge call are awaited concurrently, so
+    the event loop stays free and latency is close to the slowest call.
+    Accepts the same arguments and returns the same dict.
+    """
+    start_time = time.perf_counter()
+    with _throughput_tracker.tracking(track_throughput):
+        embedder = embedder or _default_embedder
+        trace = _StageTrace()
+        
+        if tiered:
+            drift = await _adrift_stage(embedder, prompt, response, trace)
+            uncert = uncertainty_score(response)
+            if drift is not None and _decided_without_judge(drift, uncert) is not None:
+                return _build_result(drift, uncert, None, _mode_for(retrieved_docs),
+                                     start_time, track_throughput, trace)
+            factual, reason = await _ajudge_stage(prompt, response, retrieved_docs, trace)
+            return _build_result(drift, uncert, factual, reason, start_time, track_throughput, trace)
+        
+        import asyncio
+        drift, (factual, reason) = await asyncio.gather(
+            _adrift_stage(embedder, prompt, response, trace),
+            _ajudge_stage(prompt, response, retrieved_docs, trace)
+        )
+        uncert = uncertainty_score(response)
+        
+        return _build_result(drift, uncert, factual, reason, start_time, track_throughput, trace)
+
+
+def _build_result(drift, uncert, factual, reason, start_time, track_throughput, trace=None):
+    """
+    Fuse the individual signals and attach latency/throughput metrics.
+    
+    `factual` is None when the judge was skipped by tiered evaluation; the
+    fused score then uses a neutral 0.5, which lies on the same side of the
+    threshold as every possible judge outcome.
+    
+    `trace` carries stage timings and the stages that ran past their
+    deadline. Missed signals are None and also fuse as a neutral 0.5, but
+    unlike a tiered skip the verdict is then a best effort: the result is
+    marked 'partial'. `start_time` is a time.perf_counter() reading.
+    """
+    trace = trace or _StageTrace()
+    fusion_start = time.perf_counter()
+    if trace.missed:
+        tier = "partial"
+    else:
+        tier = "judge" if factual is not None else "cheap"
+    # Keep drift in [0, 1] for backends whose vectors can point in opposite directions
+    if drift is not None:
+        drift = min(max(drift, 0.0), 1.0)
+    fused_drift = drift if drift is not None else 0.5
+    fused_factual = factual if factual is not None else 0.5
+    
     # Weighted fusion: 40% factual, 40% drift, 20% uncertainty
-    halluc_prob = round(0.4 * (1 - factual) + 0.4 * drift + 0.2 * uncert, 3)
+    halluc_prob = round(
+        FACTUAL_WEIGHT * (1 - fused_factual) + DRIFT_WEIGHT * fused_drift + UNCERTAINTY_WEIGHT * uncert,
+        3
+    )
+    trace.add("fusion", time.perf_counter() - fusion_start)
     
     # Calculate latency
-    end_time = time.time()
-    latency = round(end_time - start_time, 3)
+    end_time = time.perf_counter()
+    elapsed = end_time - start_time
+    # Microseconds: cached and local-only evaluations finish well under 1 ms
+    latency = round(elapsed, 6)
     
     # Calculate throughput
     if track_throughput:
-        _throughput_tracker.record(latency)
+        _throughput_tracker.record(elapsed)
         throughput = _throughput_tracker.get_throughput()
     else:
         # Single-run mode: throughput = 1 / latency
-        throughput = round(1.0 / latency, 3) if latency > 0 else 0.0
+        throughput = round(1.0 / elapsed, 3) if elapsed > 0 else 0.0
     
     return {
         # Truth metrics
-        "semantic_drift": round(drift, 3),
+        "semantic_drift": round(drift, 3) if drift is not None else None,
         "uncertainty": round(uncert, 3),
-        "factual_support": round(factual, 3),
+        "factual_support": round(factual, 3) if factual is not None else None,
         "mode": reason,
         "hallucination_probability": halluc_prob,
-        "hallucinated": halluc_prob > 0.45,
+        "hallucinated": halluc_prob > HALLUCINATION_THRESHOLD,
+        "decision_tier": tier,
+        "missed_deadlines": list(trace.missed),
         
         # Reliability metrics
         "latency_sec": latency,
-        "throughput_qps": throughput
+        "throughput_qps": throughput,
+        "stage_timings": dict(trace.timings)
     }
 
 
+# ---------- Streaming Detection ----------
+
+class StreamingDetection:
+    """
+    Hallucination detection for a response that arrives as a token stream.
+    
+    The prompt embedding is requested as soon as the handle is created and
+    uncertainty is scored chunk by chunk, so only the calls that need the
+    full response (response embedding and judge) remain once the stream
+    closes; they start the moment it does.
+    
+    Example:
+        ```python
+        stream = StreamingDetection(prompt)
+        for chunk in stream.consume(llm_stream):
+            send_to_user(chunk)
+        result = stream.finish()
+        ```
+    """
+    def __init__(self, prompt, retrieved_docs=None, track_throughput=True,
+                 embedder=None, tiered=False, on_result=None):
+        """
+        Args:
+            prompt: The original user question/prompt
+            retrieved_docs: Optional list of retrieved evidence chunks
+            track_throughput: Whether to update the global throughput tracker
+            embedder: Embedder backend for semantic drift (default: process-wide backend)
+            tiered: Only call the judge when drift and uncertainty leave the verdict open
+            on_result: Optional callable (result, response) run once the result is ready
+        """
+        self.prompt = prompt
+        self.retrieved_docs = retrieved_docs
+        self.track_throughput = track_throughput
+        self.embedder = embedder or _default_embedder
+        self.tiered = tiered
+        self.on_result = on_result
+        self.response = None
+        self.result = None
+        self._chunks = []
+        self._uncertainty = _uncertainty_scorer.stream()
+        self._trace = _StageTrace()
+        self._closed_at = None
+        self._response_future = None
+        self._judge_future = None
+        self._lock = Lock()
+        # Clients injected by the AgentOps instance that started the stream;
+        # later calls may come from outside its evaluate_stream()
+        self._clients = _scoped_clients.get()
+        self._prompt_future = self._start_prompt()
+    
+    def _start_prompt(self):
+        """Request the prompt embedding in the background."""
+        return _submit(
+            _get_executor(), _run_stage, "embedding", self._trace, self.embedder.embed, [self.prompt],
+            label="prompt_embedding"
+        )
+    
+    @property
+    def closed(self):
+        """Whether the response stream has ended."""
+        return self._closed_at is not None
+    
+    @property
+    def uncertainty(self):
+        """Uncertainty score of the text received so far."""
+        return self._uncertainty.score()
+    
+    def feed(self, chunk):
+        """
+        Append the next chunk of the response.
+        
+        Returns:
+            float: Running uncertainty score
+        """
+        if self.closed:
+            raise RuntimeError("cannot feed a closed stream")
+        self._chunks.append(chunk)
+        return self._uncertainty.feed(chunk)
+    
+    def consume(self, chunks):
+        """
+        Feed chunks from an iterator and pass them through unchanged.
+        
+        The stream is closed, starting the response-dependent calls, as
+        soon as the iterator is exhausted.
+        """
+        for chunk in chunks:
+            self.feed(chunk)
+            yield chunk
+        self.close()
+    
+    async def aconsume(self, chunks):
+        """Async counterpart of consume() for an async iterator of chunks."""
+        async for chunk in chunks:
+            self.feed(chunk)
+            yield chunk
+        self.aclose()
+    
+    def close(self):
+        """End the response and start the response embedding and judge calls."""
+        if not self._mark_closed():
+            return
+        executor = _get_executor()
+        with openai_clients(self._clients):
+            self._response_future = _submit(
+                executor, _run_stage, "embedding", self._trace, self.embedder.embed, [self.response],
+                label="response_embedding"
+            )
+            if not self.tiered:
+                self._judge_future = _submit(
+                    executor, _judge_stage, self.prompt, self.response, self.retrieved_docs, self._trace
+                )
+    
+    def aclose(self):
+        """Like close(), but issue the calls as tasks on the running event loop."""
+        if not self._mark_closed():
+            return
+        import asyncio
+        # Tasks copy the current context when they are created
+        with openai_clients(self._clients):
+            self._response_future = asyncio.ensure_future(_arun_stage(
+                "embedding", self._trace, self.embedder.aembed, [self.response],
+                label="response_embedding"
+            ))
+            if not self.tiered:
+                self._judge_future = asyncio.ensure_future(_ajudge_stage(
+                    self.prompt, self.response, self.retrieved_docs, self._trace
+                ))
+    
+    def _mark_closed(self):
+        """Freeze the response text; returns False if the stream was already closed."""
+        with self._lock:
+            if self.closed:
+                return False
+            self._closed_at = time.perf_counter()
+            self.response = "".join(self._chunks)
+            return True
+    
+    def finish(self):
+        """
+        Close the stream if needed and wait for the result.
+        
+        `latency_sec` in the result is measured from the end of the stream,
+        i.e. the delay added after the user has seen the final token.
+        `stage_timings` reports the two embeddings separately, as
+        'prompt_embedding_sec' and 'response_embedding_sec'.
+        
+        Returns:
+            dict: Same keys as detect_hallucination()
+        """
+        if self.result is not None:
+            return self.result
+        self.close()
+        with _throughput_tracker.tracking(self.track_throughput):
+            drift = self._drift(self._prompt_future.result(), self._response_future.result())
+            if self._judge_future is not None:
+                verdict = self._judge_future.result()
+            elif self._decided(drift):
+                verdict = None
+            else:
+                with openai_clients(self._clients):
+                    verdict = _judge_stage(self.prompt, self.response, self.retrieved_docs, self._trace)
+            return self._complete(drift, verdict)
+    
+    async def afinish(self):
+        """Async counterpart of finish()."""
+        if self.result is not None:
+            return self.result
+        import asyncio
+        
+        def awaitable(future):
+            # Futures from a synchronous close() live on the thread pool
+            return future if asyncio.isfuture(future) else asyncio.wrap_future(future)
+        
+        self.aclose()
+        with _throughput_tracker.tracking(self.track_throughput):
+            drift = self._drift(
+                await awaitable(self._prompt_future),
+                await awaitable(self._response_future)
+            )
+            if self._judge_future is not None:
+                verdict = await awaitable(self._judge_future)
+            elif self._decided(drift):
+                verdict = None
+            else:
+                with openai_clients(self._clients):
+                    verdict = await _ajudge_stage(self.prompt, self.response, self.retrieved_docs, self._trace)
+            return self._complete(drift, verdict)
+    
+    @staticmethod
+    def _drift(prompt_vectors, response_vectors):
+        """Semantic drift, or None if either embedding missed its deadline."""
+        if prompt_vectors is None or response_vectors is None:
+            return None
+        return 1 - cosine(prompt_vectors[0], response_vectors[0])
+    
+    def _decided(self, drift):
+        """Tiered mode: whether drift and uncertainty settle the verdict without the judge."""
+        return drift is not None and _decided_without_judge(drift, self.uncertainty) is not None
+    
+    def _complete(self, drift, verdict):
+        """Fuse the signals into the result; `verdict` is None when the judge was skipped."""
+        factual, reason = verdict if verdict is not None else (None, _mode_for(self.retrieved_docs))
+        self.result = _build_result(drift, self.uncertainty, factual, reason, self._closed_at,
+                                    self.track_throughput, self._trace)
+        if self.on_result is not None:
+            self.on_result(self.result, self.response)
+        return self.result
+
+
+# ---------- Metrics & Configuration ----------
+
 def reset_throughput_tracker():
     """
     Reset the global throughput tracker.
@@ -234,16 +1428,261 @@ def get_throughput_stats():
     """
     Get current throughput statistics without running an evaluation.
     
+    Throughput is measured against the wall clock, so concurrent
+    evaluations are counted correctly: `throughput_qps` is completions per
+    second between the first evaluation's start and the last completion.
+    
     Returns:
         dict: {
             'total_evaluations': int,
-            'total_time_sec': float,
-            'throughput_qps': float
+            'total_time_sec': float (sum of evaluation latencies),
+            'wall_time_sec': float (first start to last completion, or to
+                now while evaluations are running),
+            'throughput_qps': float (total_evaluations / wall_time_sec),
+            'in_flight': int (evaluations running right now),
+            'peak_in_flight': int (highest concurrency since the last reset),
+            'utilization': float (0-1, share of wall time with at least one
+                evaluation running; summed over threads and capped at 1, so
+                an upper bound when threads overlap),
+            'avg_concurrency': float (total_time_sec / wall_time_sec),
+            'skipped_evaluations': int (requests dropped by sampling),
+            'total_requests': int (evaluated + skipped),
+            'windowed_qps': dict (completions per second over the last
+                '1m', '5m' and '15m'),
+            'latency_percentiles_sec': dict ('p50', 'p95', 'p99' latency,
+                within 1% relative error; None before any evaluation)
         }
     """
+    snapshot = _throughput_tracker.snapshot()
+    total_time = round(snapshot["total_time"], 3)
+    wall_time = round(snapshot["wall_time"], 3)
     return {
-        "total_evaluations": _throughput_tracker.total_evaluations,
-        "total_time_sec": round(_throughput_tracker.total_time, 3),
-        "throughput_qps": _throughput_tracker.get_throughput()
+        "total_evaluations": snapshot["total_evaluations"],
+        "total_time_sec": total_time,
+        "wall_time_sec": wall_time,
+        "throughput_qps": round(snapshot["total_evaluations"] / wall_time, 3) if wall_time else 0.0,
+        "in_flight": snapshot["in_flight"],
+        "peak_in_flight": snapshot["peak_in_flight"],
+        "utilization": round(min(snapshot["busy_time"] / wall_time, 1.0), 3) if wall_time else 0.0,
+        "avg_concurrency": round(total_time / wall_time, 3) if wall_time else 0.0,
+        "skipped_evaluations": snapshot["skipped"],
+        "total_requests": snapshot["total_evaluations"] + snapshot["skipped"],
+        "windowed_qps": snapshot["windowed_qps"],
+        "latency_percentiles_sec": snapshot["latency_percentiles_sec"]
     }
 
+
+def get_latency_sketch():
+    """
+    Get a copy of the merged latency sketch.
+    
+    Sketches from several processes can be combined with DDSketch.merge()
+    (or shipped with to_dict()/from_dict()) to compute fleet-wide percentiles.
+    
+    Returns:
+        DDSketch: Latency distribution of evaluations since the last reset
+    """
+    return _throughput_tracker.snapshot()["sketch"]
+
+
+def record_skipped_evaluation():
+    """
+    Count a request that was not evaluated because of sampling.
+    """
+    _throughput_tracker.record_skip()
+
+
+def current_throughput():
+    """
+    Lifetime throughput (QPS) from the tracker's running totals.
+    
+    Cheap enough for every call, unlike get_throughput_stats(), which
+    merges every thread's latency sketch and QPS windows.
+    """
+    return _throughput_tracker.get_throughput()
+
+
+def configure_embedding_cache(max_size=None, ttl_sec=None):
+    """
+    Resize the global embedding cache or change its TTL.
+    
+    Args:
+        max_size: Maximum number of cached vectors (0 disables caching)
+        ttl_sec: Seconds before a cached vector expires
+    """
+    _embedding_cache.configure(max_size=max_size, ttl_sec=ttl_sec)
+
+
+def reset_embedding_cache():
+    """
+    Clear the global embedding cache and zero its counters.
+    """
+    _embedding_cache.reset()
+
+
+def get_embedding_cache_stats():
+    """
+    Get embedding cache statistics.
+    
+    Returns:
+        dict: {
+            'size': int,
+            'max_size': int,
+            'ttl_sec': float,
+            'hits': int,
+            'misses': int,
+            'evictions': int (LRU evictions),
+            'expirations': int (TTL expirations),
+            'hit_rate': float
+        }
+    """
+    return _embedding_cache.stats()
+
+
+def configure_embedding_batching(enabled=True, max_batch=64, max_wait_ms=5.0, replace=True):
+    """
+    Coalesce embedding requests from concurrent evaluations.
+    
+    When enabled, cache misses from all threads are gathered for up to
+    `max_wait_ms` (or until `max_batch` texts are waiting) and sent as one
+    embeddings request. Useful under concurrent load to cut request rate.
+    A replaced batcher is closed; callers still using it fetch directly.
+    
+    Args:
+        enabled: Turn coalescing on (True) or off (False)
+        max_batch: Maximum texts per embeddings request
+        max_wait_ms: Longest time a text waits for others before dispatch
+        replace: With False, keep a batcher that is already configured
+    
+    Returns:
+        bool: True if the configuration changed
+    """
+    global _embedding_batcher
+    with _batcher_lock:
+        previous = _embedding_batcher
+        if previous is not None and enabled and not replace:
+            return False
+        if enabled:
+            _embedding_batcher = EmbeddingBatcher(
+                _fetch_embeddings,
+                max_batch=max_batch,
+                max_wait_ms=max_wait_ms
+            )
+        else:
+            _embedding_batcher = None
+    if previous is not None:
+        previous.close()
+    return True
+
+
+def get_embedding_batching_stats():
+    """
+    Get embedding coalescer statistics.
+    
+    Returns:
+        dict: {'enabled': bool, 'batches_sent': int, 'texts_sent': int,
+               'avg_batch_size': float, 'pending': int}
+    """
+    if _embedding_batcher is None:
+        return {"enabled": False}
+    stats = _embedding_batcher.stats()
+    stats["enabled"] = True
+    return stats
+
+
+def configure_verdict_cache(enabled=True, path=DEFAULT_VERDICT_CACHE_PATH, max_entries=100000):
+    """
+    Persist judge verdicts on local disk so identical judge calls are free.
+    
+    Scores from entailment_score() and factual_selfcheck() are stored in a
+    SQLite file keyed by judge model and rendered prompt. The file survives
+    restarts and can be shared by processes on the same host.
+    
+    Args:
+        enabled: Turn the verdict cache on (True) or off (False)
+        path: SQLite file location (default: ~/.agentops/verdicts.sqlite3)
+        max_entries: Maximum stored verdicts before LRU eviction
+    """
+    global _verdict_cache
+    if _verdict_cache is not None:
+        _verdict_cache.close()
+        _verdict_cache = None
+    if enabled:
+        _verdict_cache = VerdictCache(path, max_entries=max_entries)
+
+
+def clear_verdict_cache():
+    """
+    Delete all stored judge verdicts and zero the counters.
+    """
+    if _verdict_cache is not None:
+        _verdict_cache.clear()
+
+
+def get_verdict_cache_stats():
+    """
+    Get judge verdict cache statistics.
+    
+    Returns:
+        dict: {'enabled': bool, 'path': str, 'size': int, 'max_entries': int,
+               'hits': int, 'misses': int, 'evictions': int, 'hit_rate': float}
+    """
+    if _verdict_cache is None:
+        return {"enabled": False}
+    stats = _verdict_cache.stats()
+    stats["enabled"] = True
+    return stats
+
+
+def configure_stage_policy(stage, enabled=True, deadline_sec=None, max_retries=2,
+                           backoff_base_sec=0.1, backoff_max_sec=2.0, hedge=False,
+                           hedge_quantile=0.95):
+    """
+    Bound the latency of one detector stage.
+    
+    The stage ('embedding' or 'judge') gets a deadline covering all of its
+    attempts, retries of timeouts, rate limits, 5xx and connection errors
+    with full-jitter exponential backoff, and optionally a hedged duplicate
+    request once the first has been outstanding longer than the stage's
+    recent p95 latency. Evaluations whose stage misses the deadline come
+    back partial instead of waiting.
+    
+    The policy wraps the stage as a whole. Each attempt's request is sent
+    with the stage's remaining time as its timeout and without the OpenAI
+    client's own retries, so the policy alone decides when to retry.
+    
+    Args:
+        stage: 'embedding' or 'judge'
+        enabled: Install the policy (True) or remove it (False)
+        deadline_sec: Time budget for the stage in seconds (None = unbounded)
+        max_retries: Retries after the first attempt (default: 2)
+        backoff_base_sec: Backoff ceiling for the first retry, doubling per retry
+        backoff_max_sec: Upper bound for the backoff ceiling
+        hedge: Send a duplicate request after the hedge_quantile latency
+        hedge_quantile: Latency quantile that triggers the hedge (default: 0.95)
+    """
+    if stage not in STAGES:
+        raise ValueError(f"stage must be one of {STAGES}")
+    if not enabled:
+        _stage_policies.pop(stage, None)
+        return
+    _stage_policies[stage] = StagePolicy(
+        deadline_sec=deadline_sec,
+        max_retries=max_retries,
+        backoff_base_sec=backoff_base_sec,
+        backoff_max_sec=backoff_max_sec,
+        hedge=hedge,
+        hedge_quantile=hedge_quantile
+    )
+
+
+def get_stage_policy_stats():
+    """
+    Get deadline, retry and hedging counters per configured stage.
+    
+    Returns:
+        dict: Stage name -> {'deadline_sec', 'max_retries', 'hedge',
+              'hedge_after_sec', 'calls', 'retries', 'hedges',
+              'hedge_wins', 'deadline_misses'}
+    """
+    return {stage: policy.stats() for stage, policy in _stage_policies.items()}
@@ -0,0 +1,194 @@
+"""
+Content-addressed upload of retrieved documents.
+
+RAG evaluations keep retrieving the same knowledge-base chunks, so batch
+uploads reference chunks by SHA-256 hash and send a chunk's text only until
+the API has stored it.
+
+- doc_hash: hash used to address a chunk
+- address_documents: swap chunk texts in payloads for their hashes
+- batch_body / missing_hashes: the /evaluations/batch side of the protocol
+- BatchUpload: one batch request and its responses, without the I/O
+- KnownDocuments: bounded cache of hashes the API is known to store
+"""
+
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+from .uploader import UploadRejected, is_permanent_status
+
+
+def doc_hash(text):
+    """SHA-256 hex digest of a chunk's UTF-8 text (must match the API's)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def address_documents(payloads):
+    """
+    Replace `retrieved_docs` with `retrieved_doc_hashes` in upload payloads.
+
+    Returns:
+        tuple: (payloads, texts) - new payload dicts and a hash -> text mapping
+            for every chunk they reference
+    """
+    addressed, texts = [], {}
+    for payload in payloads:
+        docs = payload.get("retrieved_docs")
+        if not docs:
+            addressed.append(payload)
+            continue
+        hashes = [doc_hash(doc) for doc in docs]
+        texts.update(zip(hashes, docs))
+        addressed.append({**payload, "retrieved_docs": None, "retrieved_doc_hashes": hashes})
+    return addressed, texts
+
+
+def batch_body(payloads, known=None):
+    """
+    Build an `/evaluations/batch` request body.
+
+    Args:
+        payloads: Evaluation payloads
+        known: KnownDocuments cache, or None to send retrieved_docs as text
+
+    Returns:
+        tuple: (body, texts) where texts maps every referenced hash to its text
+            (empty without a cache), for resending after a 409
+    """
+    if known is None:
+        return {"evaluations": payloads}, {}
+    evaluations, texts = address_documents(payloads)
+    body = {"evaluations": evaluations}
+    unknown = known.unknown(texts)
+    if unknown:
+        body["documents"] = unknown
+    return body, texts
+
+
+def missing_hashes(resp):
+    """Document hashes a 409 response says the API does not have."""
+    if resp.status_code != 409:
+        return []
+    try:
+        detail = resp.json().get("detail")
+    except ValueError:
+        return []
+    return detail.get("missing_hashes", []) if isinstance(detail, dict) else []
+
+
+def add_missing(body, texts, missing):
+    """Add the texts of hashes the API reported missing to a batch body."""
+    body["documents"] = {**body.get("documents", {}), **{h: texts[h] for h in missing if h in texts}}
+    return body
+
+
+class BatchUpload:
+    """
+    One `/evaluations/batch` upload, minus the HTTP calls.
+
+    The sync and async clients POST `body`, pass the response to
+    `resend_body()` and POST what it returns (the body with the documents
+    the API reported missing) if anything, then settle the final response
+    with `finish()`. Keeping the exchange here means both clients follow
+    the same protocol.
+    """
+    def __init__(self, payloads, known=None):
+        """
+        Args:
+            payloads: Evaluation payloads
+            known: KnownDocuments cache, or None to send retrieved_docs as text
+        """
+        self.known = known
+        self.body, self.texts = batch_body(payloads, known)
+        self._resent = False
+
+    def resend_body(self, resp):
+        """Body to send once more after a 409 naming missing documents, else None."""
+        if self._resent or not self.texts:
+            return None
+        missing = missing_hashes(resp)
+        if not missing:
+            return None
+        self._resent = True
+        self.known.discard(missing)
+        return add_missing(self.body, self.texts, missing)
+
+    def finish(self, resp):
+        """
+        Settle the upload on its final response.
+
+        Raises:
+            UploadRejected: The API refused the batch for good (see is_permanent_status)
+            httpx.HTTPStatusError: Any other error status, worth retrying
+
+        Returns:
+            int: Evaluations the API reports storing
+        """
+        if is_permanent_status(resp.status_code):
+            raise UploadRejected(resp.status_code, resp.text[:200])
+        resp.raise_for_status()
+        if self.texts:
+            self.known.add(self.texts)
+        return resp.json().get("count")
+
+
+class KnownDocuments:
+    """
+    LRU set of chunk hashes the API has acknowledged storing.
+
+    Only a cache: if the API turns out not to have a hash (another API
+    deployment, a wiped database), it answers 409 with the missing hashes,
+    which are forgotten here and resent.
+    """
+    def __init__(self, max_size=100_000):
+        """
+        Args:
+            max_size: Maximum hashes remembered
+        """
+        self.max_size = max_size
+        self._hashes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.lock = Lock()
+
+    def unknown(self, texts):
+        """Return the subset of a hash -> text mapping the API may not have yet."""
+        missing = {}
+        with self.lock:
+            for hash_, text in texts.items():
+                if hash_ in self._hashes:
+                    self._hashes.move_to_end(hash_)
+                    self.hits += 1
+                    self.bytes_saved += len(text.encode("utf-8"))
+                else:
+                    self.misses += 1
+                    missing[hash_] = text
+        return missing
+
+    def add(self, hashes):
+        """Remember hashes the API has stored."""
+        with self.lock:
+            for hash_ in hashes:
+                self._hashes[hash_] = None
+                self._hashes.move_to_end(hash_)
+            while len(self._hashes) > self.max_size:
+                self._hashes.popitem(last=False)
+
+    def discard(self, hashes):
+        """Forget hashes the API reported missing."""
+        with self.lock:
+            for hash_ in hashes:
+                self._hashes.pop(hash_, None)
+
+    def stats(self):
+        """Return cache size and how many chunk uploads it avoided."""
+        with self.lock:
+            return {
+                "size": len(self._hashes),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes_saved": self.bytes_saved
+            }
@@ -0,0 +1,400 @@
+"""
+Low-overhead reliability metrics.
+
+- DDSketch: mergeable latency sketch with relative-error quantiles
+- ThroughputTracker: evaluation counters, wall-clock and sliding-window
+  QPS and latency percentiles, recorded through per-thread shards
+"""
+
+import math
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from threading import Lock
+
+# Sliding windows reported by ThroughputTracker, in seconds
+QPS_WINDOWS = {"1m": 60, "5m": 300, "15m": 900}
+LATENCY_QUANTILES = {"p50": 0.50, "p95": 0.95, "p99": 0.99}
+
+
+# ---------- Latency Sketch ----------
+
+class DDSketch:
+    """
+    Quantile sketch with a bounded relative error (DDSketch).
+
+    Values are counted in logarithmic buckets, so every quantile estimate
+    is within `relative_accuracy` of the true value and two sketches merge
+    exactly by adding bucket counts. That makes per-thread (or per-process)
+    sketches cheap to combine. Values at or below `min_value` share one
+    bucket and are reported as 0.
+    """
+    def __init__(self, relative_accuracy=0.01, min_value=1e-6):
+        """
+        Args:
+            relative_accuracy: Relative error bound for quantiles (default: 1%)
+            min_value: Smallest value tracked separately from zero
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value):
+        """Count one value."""
+        self.count += 1
+        self.sum += value
+        if value <= self.min_value:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other):
+        """Add another sketch's counts to this one (accuracies must match)."""
+        if other.gamma != self.gamma:
+            raise ValueError("cannot merge sketches with different relative accuracy")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q):
+        """Estimate the q-quantile (0 <= q <= 1), or None for an empty sketch."""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def copy(self):
+        """Return an independent copy."""
+        clone = DDSketch(self.relative_accuracy, self.min_value)
+        clone.merge(self)
+        return clone
+
+    def to_dict(self):
+        """Serialize for shipping to another process."""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "min_value": self.min_value,
+            "buckets": {str(index): count for index, count in self.buckets.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a sketch produced by to_dict()."""
+        sketch = cls(data["relative_accuracy"], data["min_value"])
+        sketch.buckets = {int(index): count for index, count in data["buckets"].items()}
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        return sketch
+
+
+# ---------- Throughput Tracker ----------
+
+class _Shard:
+    """
+    One thread's share of the tracker's counters.
+
+    Only the owning thread writes to a shard; the lock is taken by that
+    thread and by occasional readers, so it is effectively uncontended.
+    Completions are counted in a ring of one-second slots that spans the
+    longest QPS window. The thread's evaluations in flight and the time it
+    had at least one running feed the tracker's concurrency figures.
+    """
+    def __init__(self, thread, horizon, relative_accuracy):
+        self.thread = weakref.ref(thread)
+        self.horizon = horizon
+        self.relative_accuracy = relative_accuracy
+        self.lock = Lock()
+        self.in_flight = 0
+        self.reset()
+
+    def reset(self):
+        # Evaluations still running keep counting as in flight
+        self.peak = self.in_flight
+        self.busy_time = 0.0
+        self.busy_since = time.monotonic() if self.in_flight else None
+        self.evaluations = 0
+        self.total_time = 0.0
+        self.skipped = 0
+        self.first_start = None
+        self.last_end = None
+        self.sketch = DDSketch(self.relative_accuracy)
+        self.slot_seconds = [-1] * self.horizon
+        self.slot_counts = [0] * self.horizon
+
+    def record(self, latency, now):
+        second = int(now)
+        slot = second % self.horizon
+        with self.lock:
+            self.evaluations += 1
+            self.total_time += latency
+            start = now - latency
+            if self.first_start is None or start < self.first_start:
+                self.first_start = start
+            self.last_end = now
+            self.sketch.add(latency)
+            if self.slot_seconds[slot] != second:
+                self.slot_seconds[slot] = second
+                self.slot_counts[slot] = 0
+            self.slot_counts[slot] += 1
+
+    def record_skip(self):
+        with self.lock:
+            self.skipped += 1
+
+    def enter(self, shards):
+        """Count one more evaluation in flight; `shards` gives the process-wide peak."""
+        with self.lock:
+            if self.in_flight == 0:
+                self.busy_since = time.monotonic()
+            self.in_flight += 1
+            # Other shards' counts are read without their locks; a peak may be off by a beat
+            self.peak = max(self.peak, sum(shard.in_flight for shard in shards))
+
+    def exit(self):
+        with self.lock:
+            self.in_flight -= 1
+            if self.in_flight == 0 and self.busy_since is not None:
+                self.busy_time += time.monotonic() - self.busy_since
+                self.busy_since = None
+
+    def busy_until(self, now):
+        """Busy seconds up to `now` (caller holds the lock)."""
+        return self.busy_time + (now - self.busy_since if self.busy_since is not None else 0.0)
+
+    def completions_since(self, first_second):
+        """Completions in whole seconds >= first_second (caller holds the lock)."""
+        return sum(
+            count for second, count in zip(self.slot_seconds, self.slot_counts)
+            if second >= first_second
+        )
+
+
+class ThroughputTracker:
+    """
+    Thread-safe throughput tracker for batch/concurrent evaluation scenarios.
+
+    Each thread records into its own shard, so recording never waits on
+    another thread. Readers combine the shards into lifetime counters,
+    sliding-window QPS over QPS_WINDOWS, and latency percentiles from a
+    merged DDSketch. Shards of threads that have exited are folded into a
+    retired total so short-lived threads do not accumulate.
+
+    Throughput is completions per wall-clock second between the first
+    evaluation's start and the last completion, so it stays correct when
+    evaluations overlap. `tracking()` adds the in-flight count, its peak and
+    busy time, also kept per shard. Busy time sums each thread's busy time,
+    so it is exact for one thread (or one event loop) and an upper bound on
+    the process-wide busy time when threads overlap.
+    """
+    def __init__(self, relative_accuracy=0.01):
+        """
+        Args:
+            relative_accuracy: Relative error bound for latency percentiles (default: 1%)
+        """
+        self.relative_accuracy = relative_accuracy
+        self.horizon = max(QPS_WINDOWS.values())
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard(threading.current_thread(), self.horizon, relative_accuracy)
+        self._started = time.monotonic()
+        self.lock = Lock()  # guards the shard list, never taken on the hot path
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard(threading.current_thread(), self.horizon, self.relative_accuracy)
+            with self.lock:
+                # Registering is rare (once per thread), so retire exited threads' shards
+                # here; the shard list then never outgrows the live threads
+                self._fold_locked()
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def record(self, latency):
+        """Record an evaluation and its latency (seconds)."""
+        self._shard().record(latency, time.monotonic())
+
+    def record_skip(self):
+        """Record a request that sampling decided not to evaluate."""
+        self._shard().record_skip()
+
+    @contextmanager
+    def tracking(self, enabled=True):
+        """Count the enclosed block as one evaluation in flight (no-op if not enabled)."""
+        if not enabled:
+            yield
+            return
+        shard = self._shard()
+        shard.enter(self._all_shards())
+        try:
+            yield
+        finally:
+            shard.exit()
+
+    def _all_shards(self):
+        """Current shards without taking the tracker lock (for the hot path)."""
+        return self._shards + [self._retired]
+
+    def _fold_retired(self):
+        """Fold shards of exited threads into the retired shard; return all shards."""
+        with self.lock:
+            return self._fold_locked()
+
+    def _fold_locked(self):
+        """_fold_retired() for callers that hold the tracker lock."""
+        live = []
+        for shard in self._shards:
+            thread = shard.thread()
+            if thread is not None and thread.is_alive():
+                live.append(shard)
+                continue
+            with shard.lock, self._retired.lock:
+                self._retired.evaluations += shard.evaluations
+                self._retired.total_time += shard.total_time
+                self._retired.skipped += shard.skipped
+                if shard.first_start is not None:
+                    self._retired.first_start = min(
+                        t for t in (self._retired.first_start, shard.first_start) if t is not None
+                    )
+                    self._retired.last_end = max(
+                        t for t in (self._retired.last_end, shard.last_end) if t is not None
+                    )
+                self._retired.sketch.merge(shard.sketch)
+                self._retired.peak = max(self._retired.peak, shard.peak)
+                self._retired.busy_time += shard.busy_until(time.monotonic())
+                for slot, (second, count) in enumerate(zip(shard.slot_seconds, shard.slot_counts)):
+                    if second < 0:
+                        continue
+                    if self._retired.slot_seconds[slot] != second:
+                        if self._retired.slot_seconds[slot] > second:
+                            continue
+                        self._retired.slot_seconds[slot] = second
+                        self._retired.slot_counts[slot] = 0
+                    self._retired.slot_counts[slot] += count
+        self._shards = live
+        return live + [self._retired]
+
+    @property
+    def total_evaluations(self):
+        """Evaluations recorded since the last reset."""
+        return sum(shard.evaluations for shard in self._all_shards())
+
+    @property
+    def total_time(self):
+        """Sum of recorded latencies in seconds."""
+        return sum(shard.total_time for shard in self._all_shards())
+
+    @property
+    def skipped(self):
+        """Requests skipped by sampling since the last reset."""
+        return sum(shard.skipped for shard in self._all_shards())
+
+    @staticmethod
+    def _span(shards):
+        """(first start, last completion) across shards, or (None, None)."""
+        starts = [shard.first_start for shard in shards if shard.first_start is not None]
+        ends = [shard.last_end for shard in shards if shard.last_end is not None]
+        if not starts:
+            return None, None
+        return min(starts), max(ends)
+
+    def get_throughput(self):
+        """Get current throughput (completions per wall-clock second)."""
+        shards = self._all_shards()
+        first_start, last_end = self._span(shards)
+        if first_start is None or last_end <= first_start:
+            return 0.0
+        return round(sum(shard.evaluations for shard in shards) / (last_end - first_start), 3)
+
+    def snapshot(self):
+        """
+        Combine all shards into one consistent-enough view.
+
+        Returns:
+            dict: {
+                'total_evaluations', 'total_time', 'skipped',
+                'wall_time': seconds from the first start to the last completion
+                    (or to now while evaluations are in flight),
+                'in_flight', 'peak_in_flight', 'busy_time',
+                'windowed_qps': {'1m', '5m', '15m'},
+                'latency_percentiles_sec': {'p50', 'p95', 'p99'},
+                'sketch': DDSketch (merged latency distribution)
+            }
+        """
+        now = time.monotonic()
+        current = int(now)
+        # Young trackers divide by their age, so QPS is not diluted by time before the first record
+        age = max(now - self._started, 1.0)
+        evaluations = skipped = 0
+        total_time = 0.0
+        sketch = DDSketch(self.relative_accuracy)
+        window_counts = dict.fromkeys(QPS_WINDOWS, 0)
+        in_flight = peak = 0
+        busy_time = 0.0
+        shards = self._fold_retired()
+        for shard in shards:
+            with shard.lock:
+                in_flight += shard.in_flight
+                peak = max(peak, shard.peak)
+                busy_time += shard.busy_until(now)
+                evaluations += shard.evaluations
+                total_time += shard.total_time
+                skipped += shard.skipped
+                sketch.merge(shard.sketch)
+                for name, seconds in QPS_WINDOWS.items():
+                    window_counts[name] += shard.completions_since(current - seconds + 1)
+        windowed_qps = {
+            name: round(window_counts[name] / min(seconds, age), 3)
+            for name, seconds in QPS_WINDOWS.items()
+        }
+        percentiles = {}
+        for name, q in LATENCY_QUANTILES.items():
+            value = sketch.quantile(q)
+            percentiles[name] = round(value, 4) if value is not None else None
+        first_start, last_end = self._span(shards)
+        wall_time = 0.0
+        if first_start is not None:
+            wall_time = (now if in_flight > 0 else last_end) - first_start
+        return {
+            "total_evaluations": evaluations,
+            "total_time": total_time,
+            "skipped": skipped,
+            "wall_time": wall_time,
+            "in_flight": in_flight,
+            "peak_in_flight": peak,
+            "busy_time": busy_time,
+            "windowed_qps": windowed_qps,
+            "latency_percentiles_sec": percentiles,
+            "sketch": sketch
+        }
+
+    def reset(self):
+        """Reset counters."""
+        with self.lock:
+            for shard in self._shards + [self._retired]:
+                with shard.lock:
+                    shard.reset()
+            self._started = time.monotonic()
@@ -0,0 +1,220 @@
+"""
+Traffic sampling policies for AgentOps.evaluate.
+
+Every policy answers one question per request: evaluate it or not, and if
+so with what sample weight. Weights are the inverse of the probability the
+request had of being kept, so weighted server-side aggregates stay unbiased.
+
+- RateSampler: keep a fixed fraction of traffic
+- ReservoirSampler: keep about k requests per time window, whatever the load
+- StratifiedSampler: run an independent sampler per (agent_name, model_name)
+- AdaptiveSampler: raise the rate while the recent hallucination rate is high
+"""
+
+import random
+import time
+from abc import ABC, abstractmethod
+from threading import Lock
+
+
+class Sampler(ABC):
+    """
+    Base class for sampling policies.
+
+    Subclasses implement `sample()`; `observe()` is an optional feedback
+    hook that receives the result of every evaluation that was kept.
+    """
+    @abstractmethod
+    def sample(self, agent_name=None, model_name=None):
+        """
+        Decide whether to evaluate a request.
+
+        Returns:
+            float or None: Sample weight (1 / keep probability) if kept, None if skipped
+        """
+
+    def observe(self, result, agent_name=None, model_name=None):
+        """Receive the result of a kept evaluation (no-op by default)."""
+
+    def stats(self):
+        """Return policy-specific counters."""
+        return {}
+
+
+class RateSampler(Sampler):
+    """Keep each request independently with a fixed probability."""
+    def __init__(self, rate, rng=None):
+        """
+        Args:
+            rate: Fraction of requests to evaluate, in (0, 1]
+            rng: Optional random.Random instance (for reproducible sampling)
+        """
+        if not 0 < rate <= 1:
+            raise ValueError("rate must be in (0, 1]")
+        self.rate = rate
+        self._rng = rng or random.Random()
+
+    def sample(self, agent_name=None, model_name=None):
+        return 1.0 / self.rate if self._rng.random() < self.rate else None
+
+    def stats(self):
+        return {"policy": "rate", "rate": self.rate}
+
+
+class ReservoirSampler(Sampler):
+    """
+    Keep roughly `k` requests per time window regardless of traffic volume.
+
+    Decisions must be made as requests arrive, so instead of a classic
+    reservoir (which replaces items after the fact) each request is kept with
+    probability k / n, where n is the larger of the previous window's arrival
+    count and the arrivals so far in this window. The probability is fixed
+    before the draw and the weight is its inverse (Horvitz-Thompson), so the
+    weights of kept requests sum to the arrival count in expectation. There
+    is no hard cap: in steady state about `k` requests are kept per window,
+    and about k * (1 + ln(growth)) while traffic ramps up.
+    """
+    def __init__(self, k, window_sec=60.0, rng=None):
+        """
+        Args:
+            k: Target number of evaluations per window
+            window_sec: Window length in seconds
+            rng: Optional random.Random instance (for reproducible sampling)
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        self.k = k
+        self.window_sec = window_sec
+        self._rng = rng or random.Random()
+        self._window_start = time.monotonic()
+        self._seen = 0
+        self._kept = 0
+        self._seen_previous = 0
+        self.lock = Lock()
+
+    def sample(self, agent_name=None, model_name=None):
+        with self.lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.window_sec:
+                elapsed_windows = int((now - self._window_start) // self.window_sec)
+                self._seen_previous = self._seen if elapsed_windows == 1 else 0
+                self._window_start += elapsed_windows * self.window_sec
+                self._seen = 0
+                self._kept = 0
+            self._seen += 1
+            probability = min(1.0, self.k / max(self._seen_previous, self._seen))
+            if self._rng.random() >= probability:
+                return None
+            self._kept += 1
+            return 1.0 / probability
+
+    def stats(self):
+        with self.lock:
+            return {
+                "policy": "reservoir",
+                "k": self.k,
+                "window_sec": self.window_sec,
+                "seen_in_window": self._seen,
+                "kept_in_window": self._kept
+            }
+
+
+class StratifiedSampler(Sampler):
+    """
+    Sample each stratum independently so low-volume agents are not drowned out.
+
+    Strata are (agent_name, model_name) pairs by default; each gets its own
+    sampler built by `factory` on first sight.
+    """
+    def __init__(self, factory, by=("agent_name", "model_name")):
+        """
+        Args:
+            factory: Zero-argument callable returning a new Sampler for a stratum
+            by: Fields that define a stratum ('agent_name' and/or 'model_name')
+        """
+        self.factory = factory
+        self.by = tuple(by)
+        self._strata = {}
+        self.lock = Lock()
+
+    def _stratum(self, agent_name, model_name):
+        fields = {"agent_name": agent_name, "model_name": model_name}
+        key = tuple(fields[name] for name in self.by)
+        with self.lock:
+            sampler = self._strata.get(key)
+            if sampler is None:
+                sampler = self._strata[key] = self.factory()
+            return sampler
+
+    def sample(self, agent_name=None, model_name=None):
+        return self._stratum(agent_name, model_name).sample(agent_name, model_name)
+
+    def observe(self, result, agent_name=None, model_name=None):
+        self._stratum(agent_name, model_name).observe(result, agent_name, model_name)
+
+    def stats(self):
+        with self.lock:
+            strata = dict(self._strata)
+        return {
+            "policy": "stratified",
+            "by": list(self.by),
+            "strata": {"/".join(map(str, key)): s.stats() for key, s in strata.items()}
+        }
+
+
+class AdaptiveSampler(Sampler):
+    """
+    Fixed-rate sampling that up-samples while hallucinations are rising.
+
+    An exponentially weighted moving average of the `hallucinated` flag of
+    kept evaluations drives the rate: at or below `low_threshold` the rate is
+    `base_rate`, at or above `high_threshold` it is `max_rate`, and it is
+    interpolated linearly in between.
+    """
+    def __init__(self, base_rate, max_rate=1.0, low_threshold=0.05,
+                 high_threshold=0.25, alpha=0.05, rng=None):
+        """
+        Args:
+            base_rate: Sampling rate while the hallucination rate is normal
+            max_rate: Sampling rate once the hallucination rate is alarming
+            low_threshold: Hallucination rate at which up-sampling starts
+            high_threshold: Hallucination rate at which max_rate is reached
+            alpha: EWMA smoothing factor per observed evaluation
+            rng: Optional random.Random instance (for reproducible sampling)
+        """
+        if not 0 < base_rate <= max_rate <= 1:
+            raise ValueError("rates must satisfy 0 < base_rate <= max_rate <= 1")
+        self.base_rate = base_rate
+        self.max_rate = max_rate
+        self.low_threshold = low_threshold
+        self.high_threshold = high_threshold
+        self.alpha = alpha
+        self.hallucination_rate = 0.0
+        self._rng = rng or random.Random()
+        self.lock = Lock()
+
+    @property
+    def rate(self):
+        """Current sampling rate."""
+        span = self.high_threshold - self.low_threshold
+        level = (self.hallucination_rate - self.low_threshold) / span if span > 0 else 1.0
+        level = min(max(level, 0.0), 1.0)
+        return self.base_rate + (self.max_rate - self.base_rate) * level
+
+    def sample(self, agent_name=None, model_name=None):
+        with self.lock:
+            rate = self.rate
+        return 1.0 / rate if self._rng.random() < rate else None
+
+    def observe(self, result, agent_name=None, model_name=None):
+        hallucinated = 1.0 if result.get("hallucinated") else 0.0
+        with self.lock:
+            self.hallucination_rate += self.alpha * (hallucinated - self.hallucination_rate)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "policy": "adaptive",
+                "rate": round(self.rate, 4),
+                "recent_hallucination_rate": round(self.hallucination_rate, 4)
+            }
@@ -0,0 +1,438 @@
+"""
+Durable on-disk spool for uploads the API could not take.
+
+- UploadSpool: append-only segment files of CRC-framed JSON records with
+  size-bounded rotation and a persisted read cursor
+- SpoolReplayer: background thread that sends spooled records to the API
+  in batches, backing off while the API is unavailable
+"""
+
+import json
+import os
+import random
+import struct
+import time
+import zlib
+from threading import Condition, Event, Lock, Thread
+
+from .uploader import UploadRejected
+
+SEGMENT_SUFFIX = ".seg"
+CURSOR_FILE = "cursor.json"
+
+# Frame header: payload length, CRC32 of the payload
+_HEADER = struct.Struct("<II")
+
+
+def _read_frames(handle, limit=None):
+    """
+    Read frames from the handle's current position.
+
+    Returns:
+        tuple: (records, end_offsets, clean) where records are decoded JSON
+            objects, end_offsets[i] is the file offset after record i, and
+            clean is False if reading stopped at a torn or corrupt frame
+    """
+    records, offsets = [], []
+    while limit is None or len(records) < limit:
+        header = handle.read(_HEADER.size)
+        if not header:
+            return records, offsets, True
+        if len(header) < _HEADER.size:
+            return records, offsets, False
+        length, crc = _HEADER.unpack(header)
+        data = handle.read(length)
+        if len(data) < length or zlib.crc32(data) != crc:
+            return records, offsets, False
+        try:
+            records.append(json.loads(data))
+        except ValueError:
+            return records, offsets, False
+        offsets.append(handle.tell())
+    return records, offsets, True
+
+
+class UploadSpool:
+    """
+    Append-only, crash-tolerant queue of upload payloads on local disk.
+
+    Records are written to numbered segment files as
+    `<length><crc32><json>` frames; a new segment starts once the current
+    one reaches `segment_max_bytes`, and the oldest segments are deleted
+    (their records counted as dropped) when the spool exceeds `max_bytes`.
+    Consumers read from a cursor that is persisted on acknowledgement, so
+    records survive restarts and are delivered at least once. A torn frame
+    left by a crash mid-write is truncated when the spool is reopened.
+    """
+    def __init__(self, directory, segment_max_bytes=4 * 1024 * 1024,
+                 max_bytes=256 * 1024 * 1024, fsync=False):
+        """
+        Args:
+            directory: Directory holding the segment files (created if missing)
+            segment_max_bytes: Size at which the active segment is rotated
+            max_bytes: Disk budget; oldest segments are dropped beyond it
+            fsync: fsync after every append (survives power loss, not just crashes)
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.lock = Lock()
+        self._data_ready = Condition(self.lock)
+        self.appended = 0
+        self.acked = 0
+        self.dropped = 0
+        self.corrupt_segments = 0
+        self._writer = None
+        self._segments = self._list_segments()
+        self._cursor = self._load_cursor()
+        self._recover()
+        self._pending = self._count_pending()
+
+    # ---------- Files ----------
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"{segment:010d}{SEGMENT_SUFFIX}")
+
+    def _list_segments(self):
+        names = (n for n in os.listdir(self.directory) if n.endswith(SEGMENT_SUFFIX))
+        return sorted(int(n[:-len(SEGMENT_SUFFIX)]) for n in names if n[:-len(SEGMENT_SUFFIX)].isdigit())
+
+    def _size(self, segment):
+        try:
+            return os.path.getsize(self._path(segment))
+        except OSError:
+            return 0
+
+    def _load_cursor(self):
+        """Read the persisted (segment, offset) cursor, defaulting to the oldest segment."""
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE)) as f:
+                data = json.load(f)
+            cursor = (int(data["segment"]), int(data["offset"]))
+        except (OSError, ValueError, KeyError, TypeError):
+            cursor = None
+        if cursor is None or cursor[0] not in self._segments:
+            cursor = (self._segments[0], 0) if self._segments else (0, 0)
+        return cursor
+
+    def _save_cursor(self):
+        path = os.path.join(self.directory, CURSOR_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"segment": self._cursor[0], "offset": self._cursor[1]}, f)
+        os.replace(tmp, path)
+
+    def _recover(self):
+        """Truncate a torn frame at the end of the newest segment."""
+        if not self._segments:
+            return
+        path = self._path(self._segments[-1])
+        with open(path, "rb") as f:
+            _, offsets, clean = _read_frames(f)
+        if not clean:
+            with open(path, "r+b") as f:
+                f.truncate(offsets[-1] if offsets else 0)
+
+    def _count_pending(self):
+        """Count unacknowledged records by scanning from the cursor."""
+        count = 0
+        for segment in self._segments:
+            if segment < self._cursor[0]:
+                continue
+            with open(self._path(segment), "rb") as f:
+                f.seek(self._cursor[1] if segment == self._cursor[0] else 0)
+                records, _, _ = _read_frames(f)
+            count += len(records)
+        return count
+
+    def _open_writer(self):
+        """Open the newest segment for appending, rotating if it is full."""
+        if not self._segments or self._size(self._segments[-1]) >= self.segment_max_bytes:
+            self._segments.append(self._segments[-1] + 1 if self._segments else 0)
+        self._writer = open(self._path(self._segments[-1]), "ab")
+
+    # ---------- Writing ----------
+
+    def append(self, payloads):
+        """Append payloads to the spool; returns the number written."""
+        now = time.time()
+        frames = []
+        for payload in payloads:
+            data = json.dumps({"t": now, "p": payload}, default=str).encode("utf-8")
+            frames.append(_HEADER.pack(len(data), zlib.crc32(data)) + data)
+        if not frames:
+            return 0
+        with self.lock:
+            if self._writer is None:
+                self._open_writer()
+            self._writer.write(b"".join(frames))
+            self._writer.flush()
+            if self.fsync:
+                os.fsync(self._writer.fileno())
+            self.appended += len(frames)
+            self._pending += len(frames)
+            if self._writer.tell() >= self.segment_max_bytes:
+                self._writer.close()
+                self._writer = None
+            self._enforce_budget()
+            self._data_ready.notify_all()
+        return len(frames)
+
+    def _enforce_budget(self):
+        """Drop the oldest segments while over max_bytes (caller holds the lock)."""
+        total = sum(self._size(s) for s in self._segments)
+        while total > self.max_bytes and len(self._segments) > 1:
+            oldest = self._segments.pop(0)
+            size = self._size(oldest)
+            with open(self._path(oldest), "rb") as f:
+                f.seek(self._cursor[1] if oldest == self._cursor[0] else 0)
+                lost = len(_read_frames(f)[0]) if oldest >= self._cursor[0] else 0
+            os.remove(self._path(oldest))
+            self.dropped += lost
+            self._pending -= lost
+            total -= size
+            if self._cursor[0] <= oldest:
+                self._cursor = (self._segments[0], 0)
+                self._save_cursor()
+
+    # ---------- Reading ----------
+
+    def read(self, max_records):
+        """
+        Read up to `max_records` unacknowledged records without consuming them.
+
+        Returns:
+            tuple: (payloads, timestamps, cursor) - pass cursor to ack() once sent
+        """
+        with self.lock:
+            if self._segments and self._cursor[0] not in self._segments:
+                # The cursor's segment is gone: resume at the oldest one left
+                self._cursor = (self._segments[0], 0)
+                self._save_cursor()
+            segment, offset = self._cursor
+            payloads, stamps = [], []
+            while len(payloads) < max_records and segment in self._segments:
+                with open(self._path(segment), "rb") as f:
+                    f.seek(offset)
+                    records, offsets, clean = _read_frames(f, max_records - len(payloads))
+                for record in records:
+                    payloads.append(record.get("p"))
+                    stamps.append(record.get("t"))
+                if offsets:
+                    offset = offsets[-1]
+                if len(payloads) >= max_records:
+                    break
+                later = [s for s in self._segments if s > segment]
+                if not later:
+                    if not clean:
+                        # Corrupt frame in the active segment: start a fresh one past it
+                        self.corrupt_segments += 1
+                        if self._writer is not None:
+                            self._writer.close()
+                            self._writer = None
+                        self._segments.append(segment + 1)
+                        open(self._path(segment + 1), "ab").close()
+                        segment, offset = segment + 1, 0
+                    break
+                if not clean:
+                    self.corrupt_segments += 1
+                segment, offset = later[0], 0
+            return payloads, stamps, (segment, offset)
+
+    def _count_between(self, start, end, limit):
+        """Count records from cursor `start` up to cursor `end`, at most `limit` (caller holds the lock)."""
+        count = 0
+        for segment in self._segments:
+            if segment < start[0] or segment > end[0] or count >= limit:
+                continue
+            with open(self._path(segment), "rb") as f:
+                f.seek(start[1] if segment == start[0] else 0)
+                _, offsets, _ = _read_frames(f, limit - count)
+            if segment == end[0]:
+                offsets = [o for o in offsets if o <= end[1]]
+            count += len(offsets)
+        return count
+
+    def ack(self, cursor, count):
+        """
+        Mark records up to `cursor` as delivered and delete finished segments.
+
+        A cursor that is behind the current one or points at a deleted
+        segment is stale (the disk budget dropped the records it covered
+        while they were being sent) and is ignored.
+
+        Returns:
+            int: Number of records acknowledged, without any the budget dropped
+        """
+        with self.lock:
+            if cursor <= self._cursor or cursor[0] not in self._segments:
+                return 0
+            # The budget may have dropped part of the batch since it was read
+            count = self._count_between(self._cursor, cursor, count)
+            self._cursor = cursor
+            self._save_cursor()
+            self.acked += count
+            self._pending = max(0, self._pending - count)
+            active = self._segments[-1] if self._segments else None
+            for segment in [s for s in self._segments if s < cursor[0] and s != active]:
+                self._segments.remove(segment)
+                try:
+                    os.remove(self._path(segment))
+                except OSError:
+                    pass
+            return count
+
+    def wait(self, timeout):
+        """Wait until there are unacknowledged records; returns True if there are."""
+        with self.lock:
+            if self._pending <= 0:
+                self._data_ready.wait(timeout)
+            return self._pending > 0
+
+    def wake(self):
+        """Wake threads blocked in wait()."""
+        with self.lock:
+            self._data_ready.notify_all()
+
+    @property
+    def cursor(self):
+        """Position of the oldest unacknowledged record as (segment, offset)."""
+        with self.lock:
+            return self._cursor
+
+    @property
+    def depth(self):
+        """Number of unacknowledged records."""
+        with self.lock:
+            return self._pending
+
+    def stats(self):
+        """Return depth, size, replay lag and counters."""
+        _, stamps, _ = self.read(1)
+        with self.lock:
+            return {
+                "depth": self._pending,
+                "bytes": sum(self._size(s) for s in self._segments),
+                "segments": len(self._segments),
+                "replay_lag_sec": round(time.time() - stamps[0], 3) if stamps and stamps[0] else 0.0,
+                "appended": self.appended,
+                "acked": self.acked,
+                "dropped": self.dropped,
+                "corrupt_segments": self.corrupt_segments
+            }
+
+    def close(self):
+        """Close the active segment; a later append reopens it."""
+        with self.lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+class SpoolReplayer:
+    """
+    Background sender that drains an UploadSpool.
+
+    Reads up to `batch_size` records, hands them to `send(payloads)` and
+    acknowledges them once it returns True. After a failure it waits a
+    full-jitter exponential backoff (capped at `backoff_max_sec`) before
+    trying the same records again. Records `send` rejects with
+    UploadRejected are acknowledged without delivery and counted as
+    rejected, so one bad batch cannot stall the spool.
+    """
+    def __init__(self, spool, send, batch_size=100, backoff_base_sec=0.5,
+                 backoff_max_sec=60.0, idle_wait_sec=1.0, rng=None):
+        """
+        Args:
+            spool: UploadSpool to drain
+            send: Callable (list of payloads) -> bool, True if delivered;
+                raises UploadRejected if the records can never be delivered
+            batch_size: Records per send
+            backoff_base_sec: Backoff ceiling after the first failure; doubles per failure
+            backoff_max_sec: Upper bound for the backoff ceiling
+            idle_wait_sec: How often an idle replayer re-checks for shutdown
+            rng: Optional random.Random instance (for reproducible jitter)
+        """
+        self.spool = spool
+        self._send = send
+        self.batch_size = batch_size
+        self.backoff_base_sec = backoff_base_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.idle_wait_sec = idle_wait_sec
+        self._rng = rng or random.Random()
+        self._stop = Event()
+        self._thread = None
+        self.replayed = 0
+        self.rejected = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.lock = Lock()
+
+    def start(self):
+        """Start the replay thread if it is not running."""
+        with self.lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = Thread(target=self._run, name="agentops-spool-replay", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop replaying; unsent records stay on disk."""
+        self._stop.set()
+        self.spool.wake()
+        with self.lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def backoff(self, failures):
+        """Full-jitter backoff after `failures` consecutive failures."""
+        ceiling = min(self.backoff_max_sec, self.backoff_base_sec * (2 ** (failures - 1)))
+        return self._rng.uniform(0, ceiling)
+
+    def _run(self):
+        while not self._stop.is_set():
+            payloads, _, cursor = self.spool.read(self.batch_size)
+            if not payloads:
+                if cursor != self.spool.cursor:
+                    # Skipped past a corrupt segment
+                    self.spool.ack(cursor, 0)
+                    continue
+                self.spool.wait(self.idle_wait_sec)
+                continue
+            rejected = False
+            try:
+                delivered = bool(self._send(payloads))
+            except UploadRejected:
+                delivered, rejected = False, True
+            except Exception:
+                delivered = False
+            with self.lock:
+                # Acknowledged under the lock so stats never show a drained spool
+                # without the records counted
+                acked = self.spool.ack(cursor, len(payloads)) if delivered or rejected else 0
+                if delivered:
+                    self.replayed += acked
+                    self.consecutive_failures = 0
+                elif rejected:
+                    self.rejected += acked
+                    self.consecutive_failures = 0
+                else:
+                    self.failures += 1
+                    self.consecutive_failures += 1
+                failures = self.consecutive_failures
+            if not (delivered or rejected):
+                self._stop.wait(self.backoff(failures))
+
+    def stats(self):
+        """Return replay counters."""
+        with self.lock:
+            return {
+                "replayed": self.replayed,
+                "replay_rejected": self.rejected,
+                "replay_failures": self.failures,
+                "consecutive_failures": self.consecutive_failures
+            }
@@ -0,0 +1,217 @@
+"""
+Pooled HTTP connections to the AgentOps API.
+
+- HttpPool: long-lived httpx clients with keep-alive connection pooling and
+  optional HTTP/2, shareable by several AgentOps instances
+- BodyEncoder: JSON request bodies, gzip- or zstd-compressed above a size
+  threshold and labelled with Content-Encoding
+"""
+
+import gzip
+import json
+from threading import Lock
+from loguru import logger
+
+COMPRESSIONS = ("gzip", "zstd")
+
+
+def http2_available():
+    """Whether the optional `h2` package needed for HTTP/2 is installed."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def zstd_available():
+    """Whether the optional `zstandard` package needed for zstd bodies is installed."""
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class BodyEncoder:
+    """
+    Serialize request bodies to JSON and compress the large ones.
+
+    Bodies shorter than `min_bytes` are sent as-is, since compressing them
+    saves little and costs CPU on both ends. zstd needs the `zstandard`
+    package (`pip install agentops-client[zstd]`) and falls back to gzip
+    without it.
+    """
+    def __init__(self, compression="gzip", min_bytes=1024, level=None):
+        """
+        Args:
+            compression: 'gzip', 'zstd' or None (never compress)
+            min_bytes: Smallest JSON body that gets compressed
+            level: Compression level (default: 6 for gzip, 3 for zstd)
+        """
+        if compression not in COMPRESSIONS + (None,):
+            raise ValueError(f"compression must be one of {COMPRESSIONS} or None")
+        if compression == "zstd" and not zstd_available():
+            logger.warning("zstd requested but the 'zstandard' package is not installed; using gzip")
+            compression = "gzip"
+        self.compression = compression
+        self.min_bytes = min_bytes
+        self.level = level
+        self.bodies = 0
+        self.compressed = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.lock = Lock()
+
+    def _compress(self, data):
+        if self.compression == "gzip":
+            return gzip.compress(data, compresslevel=self.level or 6)
+        import zstandard
+        # A ZstdCompressor is not safe to share between threads; they are cheap to build
+        return zstandard.ZstdCompressor(level=self.level or 3).compress(data)
+
+    def encode(self, obj):
+        """
+        Encode a JSON-serializable object as a request body.
+
+        Returns:
+            tuple: (body bytes, headers dict with Content-Type and, when
+                compressed, Content-Encoding)
+        """
+        data = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        body = data
+        if self.compression and len(data) >= self.min_bytes:
+            body = self._compress(data)
+            headers["Content-Encoding"] = self.compression
+        with self.lock:
+            self.bodies += 1
+            self.compressed += body is not data
+            self.raw_bytes += len(data)
+            self.sent_bytes += len(body)
+        return body, headers
+
+    def stats(self):
+        """Return compression settings and byte counters."""
+        with self.lock:
+            return {
+                "compression": self.compression,
+                "min_bytes": self.min_bytes,
+                "bodies": self.bodies,
+                "compressed": self.compressed,
+                "raw_bytes": self.raw_bytes,
+                "sent_bytes": self.sent_bytes,
+                "ratio": round(self.sent_bytes / self.raw_bytes, 4) if self.raw_bytes else 1.0
+            }
+
+
+class HttpPool:
+    """
+    Keep-alive connection pool for API uploads.
+
+    Holds one `httpx.Client` (and one `httpx.AsyncClient` for async uploads),
+    created on first use and reused for every request, so uploads skip the
+    TCP and TLS handshakes after the first. Pass the same pool to several
+    AgentOps instances to share its connections. With `http2=True` requests
+    are multiplexed over a single connection; this needs the `h2` package
+    (`pip install agentops-client[http2]`) and falls back to HTTP/1.1 without it.
+    """
+    def __init__(self, http2=False, timeout_sec=30.0, connect_timeout_sec=5.0,
+                 max_connections=10, max_keepalive_connections=10,
+                 keepalive_expiry_sec=30.0, transport=None, async_transport=None):
+        """
+        Args:
+            http2: Negotiate HTTP/2 when the server supports it
+            timeout_sec: Read, write and pool timeout per request
+            connect_timeout_sec: Timeout for opening a connection
+            max_connections: Maximum open connections
+            max_keepalive_connections: Idle connections kept open for reuse
+            keepalive_expiry_sec: Seconds an idle connection stays open
+            transport: Optional httpx transport for the sync client (e.g. for tests)
+            async_transport: Optional httpx async transport for the async client
+        """
+        if http2 and not http2_available():
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.timeout_sec = timeout_sec
+        self.connect_timeout_sec = connect_timeout_sec
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry_sec = keepalive_expiry_sec
+        self._transport = transport
+        self._async_transport = async_transport
+        self._client = None
+        self._async_client = None
+        self.clients_opened = 0
+        self.requests = 0
+        self.lock = Lock()
+
+    def _options(self):
+        import httpx
+        return {
+            "http2": self.http2,
+            "timeout": httpx.Timeout(self.timeout_sec, connect=self.connect_timeout_sec),
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry_sec
+            )
+        }
+
+    @property
+    def client(self):
+        """Shared `httpx.Client`, created on first use."""
+        with self.lock:
+            if self._client is None:
+                import httpx
+                self._client = httpx.Client(transport=self._transport, **self._options())
+                self.clients_opened += 1
+            return self._client
+
+    @property
+    def async_client(self):
+        """Shared `httpx.AsyncClient`, created on first use (bound to one event loop)."""
+        with self.lock:
+            if self._async_client is None:
+                import httpx
+                self._async_client = httpx.AsyncClient(transport=self._async_transport, **self._options())
+                self.clients_opened += 1
+            return self._async_client
+
+    def post(self, url, **kwargs):
+        """POST with the pooled sync client."""
+        with self.lock:
+            self.requests += 1
+        return self.client.post(url, **kwargs)
+
+    async def apost(self, url, **kwargs):
+        """POST with the pooled async client."""
+        with self.lock:
+            self.requests += 1
+        return await self.async_client.post(url, **kwargs)
+
+    def close(self):
+        """Close the sync client's connections; the next request opens new ones."""
+        with self.lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self):
+        """Close the async client's connections."""
+        with self.lock:
+            client, self._async_client = self._async_client, None
+        if client is not None:
+            await client.aclose()
+
+    def stats(self):
+        """Return pool settings and counters."""
+        with self.lock:
+            return {
+                "http2": self.http2,
+                "max_connections": self.max_connections,
+                "max_keepalive_connections": self.max_keepalive_connections,
+                "clients_opened": self.clients_opened,
+                "requests": self.requests
+            }
@@ -0,0 +1,118 @@
+"""
+Lexical uncertainty scoring.
+
+- UncertaintyScorer: weighted cue lexicon compiled into a single regex that
+  scans a response once with word-boundary matching
+- UncertaintyStream: incremental scorer that accepts text chunk by chunk
+"""
+
+import re
+
+
+# Default hedging cues and their weights (each distinct cue adds its weight once)
+DEFAULT_CUES = {
+    "maybe": 0.2,
+    "probably": 0.2,
+    "unsure": 0.2,
+    "not sure": 0.2,
+    "might": 0.2,
+    "perhaps": 0.2,
+    "possibly": 0.2,
+}
+
+
+class UncertaintyScorer:
+    """
+    Single-pass uncertainty scorer over a weighted cue lexicon.
+
+    All cues are compiled into one case-insensitive alternation anchored on
+    word boundaries, so "might" does not match inside "mighty" and multi-word
+    cues tolerate any run of whitespace. The score is the sum of the weights
+    of the distinct cues found, capped at `max_score`.
+    """
+    def __init__(self, cues=None, max_score=1.0):
+        """
+        Args:
+            cues: Mapping of cue phrase -> weight (default: DEFAULT_CUES)
+            max_score: Upper bound for the score (default: 1.0)
+        """
+        cues = DEFAULT_CUES if cues is None else cues
+        self.cues = {self._canonical(cue): weight for cue, weight in cues.items()}
+        self.max_score = max_score
+
+        # Longest cues first so "not sure" wins over a shorter overlapping cue
+        alternatives = sorted(self.cues, key=len, reverse=True)
+        body = "|".join(r"\s+".join(map(re.escape, cue.split())) for cue in alternatives)
+        self.pattern = re.compile(rf"\b(?:{body})\b", re.IGNORECASE) if body else None
+
+        # Characters an incremental scan must keep around to catch a cue split
+        # across chunks (with slack for extra whitespace inside multi-word cues)
+        self.window = max((len(cue) for cue in self.cues), default=0) + 16
+
+    @staticmethod
+    def _canonical(phrase):
+        return " ".join(phrase.lower().split())
+
+    def find_cues(self, text):
+        """Return the set of distinct cues present in text."""
+        if self.pattern is None:
+            return set()
+        return {self._canonical(m.group()) for m in self.pattern.finditer(text)}
+
+    def weigh(self, found):
+        """Turn a set of distinct cues into a capped score."""
+        return min(self.max_score, sum(self.cues[cue] for cue in found))
+
+    def score(self, text):
+        """
+        Score text in a single pass.
+
+        Returns:
+            float: Score from 0 to max_score, where higher means more uncertain language
+        """
+        return self.weigh(self.find_cues(text))
+
+    def stream(self):
+        """Start an incremental scan (see UncertaintyStream)."""
+        return UncertaintyStream(self)
+
+
+class UncertaintyStream:
+    """
+    Incremental uncertainty scoring for text that arrives in chunks.
+
+    Only a short tail of previous input is retained, so memory is constant
+    regardless of response length. A cue that ends exactly at a chunk
+    boundary is held back until the next chunk shows whether the word
+    continues ("might" vs "mighty").
+    """
+    def __init__(self, scorer):
+        self.scorer = scorer
+        self.found = set()
+        self._tail = ""
+        self._truncated = False
+
+    def feed(self, chunk):
+        """Consume the next chunk of text and return the running score."""
+        if self.scorer.pattern is None or not chunk:
+            return self.score()
+        buffer = self._tail + chunk
+        for m in self.scorer.pattern.finditer(buffer):
+            if m.start() == 0 and self._truncated:
+                # The buffer starts mid-text; a match here may be a word suffix
+                continue
+            if m.end() < len(buffer):
+                self.found.add(self.scorer._canonical(m.group()))
+        keep = self.scorer.window + 1
+        self._truncated = self._truncated or len(buffer) > keep
+        self._tail = buffer[-keep:]
+        return self.score()
+
+    def score(self):
+        """Score everything fed so far, treating the current end as end of text."""
+        pending = set()
+        if self.scorer.pattern is not None:
+            for m in self.scorer.pattern.finditer(self._tail):
+                if not (m.start() == 0 and self._truncated):
+                    pending.add(self.scorer._canonical(m.group()))
+        return self.scorer.weigh(self.found | pending)
@@ -0,0 +1,406 @@
+"""
+Background delivery of evaluation uploads.
+
+- BatchUploader: bounded in-memory queue drained by a daemon thread that
+  sends payloads in batches, by size or after a short delay
+- AsyncBatchUploader: the same queue for asyncio, drained by a task
+- UploadRejected: raised by a sender when the API refuses a batch for good
+"""
+
+import atexit
+import time
+import weakref
+from collections import deque
+from threading import Condition, Thread
+
+OVERFLOW_POLICIES = ("drop", "block")
+
+# 4xx statuses that may succeed on a later attempt: timeout, conflict, rate limit
+RETRYABLE_CLIENT_STATUS = (408, 409, 429)
+
+# Uploaders still running at interpreter exit get a last flush
+_live_uploaders = weakref.WeakSet()
+
+
+class UploadRejected(Exception):
+    """The API refused a batch with a status that retrying cannot fix."""
+    def __init__(self, status_code, message=""):
+        super().__init__(f"HTTP {status_code}: {message}" if message else f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def is_permanent_status(status_code):
+    """Whether an HTTP status means the same request will never succeed (4xx but 408/409/429)."""
+    return 400 <= status_code < 500 and status_code not in RETRYABLE_CLIENT_STATUS
+
+
+@atexit.register
+def _close_live_uploaders():
+    for uploader in list(_live_uploaders):
+        uploader.close(timeout=5.0)
+
+
+class BatchUploader:
+    """
+    Bounded upload queue with a background sender.
+
+    `submit()` only appends to the queue, so callers never wait on the
+    network. A worker thread groups queued payloads into batches of up to
+    `max_batch` and hands each batch to `send(payloads)`; a batch goes out
+    as soon as it is full or once its oldest payload has waited
+    `flush_interval_sec`. When the queue holds `max_queue` payloads, the
+    overflow policy either drops the new payload ('drop') or makes the
+    caller wait for room ('block', up to `block_timeout_sec`). With a
+    `spill` callable (such as UploadSpool.append), payloads that would be
+    dropped, batches that fail to send and payloads still queued when the
+    uploader closes are handed to it instead of being lost. Batches `send`
+    rejects with UploadRejected are counted and discarded, never spilled.
+    The spill is always called without the queue lock held.
+    """
+    def __init__(self, send, max_batch=100, flush_interval_sec=1.0, max_queue=10000,
+                 overflow="drop", block_timeout_sec=None, spill=None):
+        """
+        Args:
+            send: Callable (list of payloads) -> bool, True if the batch was delivered;
+                raises UploadRejected if the batch can never be delivered
+            max_batch: Maximum payloads per batch
+            flush_interval_sec: Longest time a payload waits for its batch to fill
+            max_queue: Maximum queued payloads before the overflow policy applies
+            overflow: 'drop' (discard new payloads) or 'block' (wait for room)
+            block_timeout_sec: Longest wait under 'block' before dropping (None = no limit)
+            spill: Optional callable (list of payloads) taking payloads that could
+                not be queued or delivered
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+        self._send = send
+        self.max_batch = max_batch
+        self.flush_interval_sec = flush_interval_sec
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.block_timeout_sec = block_timeout_sec
+        self._spill = spill
+        self._items = deque()  # (enqueued_at, payload)
+        self._cond = Condition()
+        self._sending = 0
+        self._flush_requested = False
+        self._closed = False
+        self._thread = None
+        self.submitted = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.rejected = 0
+        self.batches = 0
+        _live_uploaders.add(self)
+
+    def submit(self, payload):
+        """
+        Queue one payload for upload.
+
+        Returns:
+            bool: False if the payload was dropped (queue full or uploader closed
+                and no spill configured)
+        """
+        with self._cond:
+            if not (self._closed or (len(self._items) >= self.max_queue
+                                     and (self.overflow == "drop" or not self._wait_for_room()))):
+                self._items.append((time.monotonic(), payload))
+                self.submitted += 1
+                self._ensure_worker()
+                self._cond.notify_all()
+                return True
+        return self._spill_or_drop([payload])
+
+    def _spill_or_drop(self, payloads):
+        """Hand undeliverable payloads to the spill (caller must not hold the lock)."""
+        spilled = False
+        if self._spill is not None:
+            try:
+                self._spill(payloads)
+                spilled = True
+            except Exception:
+                pass
+        with self._cond:
+            if spilled:
+                self.spilled += len(payloads)
+            else:
+                self.dropped += len(payloads)
+        return spilled
+
+    def _wait_for_room(self):
+        """Block until the queue has room (caller holds the lock)."""
+        deadline = time.monotonic() + self.block_timeout_sec if self.block_timeout_sec is not None else None
+        while len(self._items) >= self.max_queue and not self._closed:
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                return False
+            self._cond.wait(remaining)
+        return not self._closed
+
+    def flush(self, timeout=None):
+        """
+        Send everything queued so far without waiting for the flush interval.
+
+        Returns:
+            bool: True if the queue drained before the timeout
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            if not self._items and not self._sending:
+                return True
+            self._flush_requested = True
+            self._ensure_worker()
+            self._cond.notify_all()
+            while self._items or self._sending:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def close(self, timeout=None):
+        """
+        Flush pending payloads and stop the worker.
+
+        Payloads still queued after `timeout`, and any submitted later, are
+        spilled if a spill is configured and dropped otherwise.
+        """
+        drained = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        with self._cond:
+            leftover = [payload for _, payload in self._items]
+            self._items.clear()
+            self._cond.notify_all()
+        if leftover:
+            self._spill_or_drop(leftover)
+        _live_uploaders.discard(self)
+        return drained
+
+    def stats(self):
+        """Return queue depth and delivery counters."""
+        with self._cond:
+            return {
+                "queued": len(self._items),
+                "sending": self._sending,
+                "max_queue": self.max_queue,
+                "overflow": self.overflow,
+                "submitted": self.submitted,
+                "sent": self.sent,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "spilled": self.spilled,
+                "rejected": self.rejected,
+                "batches": self.batches
+            }
+
+    def _ensure_worker(self):
+        """Start the sender thread on first use (caller holds the lock)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = Thread(target=self._run, name="agentops-uploader", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """Sender loop: wait for a full batch, an expired payload or a flush."""
+        while True:
+            with self._cond:
+                while not self._items and not self._closed:
+                    self._flush_requested = False
+                    self._cond.wait()
+                if not self._items:
+                    return
+                deadline = self._items[0][0] + self.flush_interval_sec
+                while (len(self._items) < self.max_batch and not self._flush_requested
+                       and not self._closed):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                count = min(self.max_batch, len(self._items))
+                batch = [self._items.popleft()[1] for _ in range(count)]
+                self._sending = count
+                # Room was freed for blocked submitters
+                self._cond.notify_all()
+            rejected = False
+            try:
+                delivered = bool(self._send(batch))
+            except UploadRejected:
+                delivered, rejected = False, True
+            except Exception:
+                delivered = False
+            # Still counted as sending, so flush() also waits for the spill
+            if not delivered and not rejected and self._spill is not None:
+                self._spill_or_drop(batch)
+            with self._cond:
+                self.batches += 1
+                if delivered:
+                    self.sent += count
+                elif rejected:
+                    self.rejected += count
+                else:
+                    self.failed += count
+                self._sending = 0
+                if not self._items:
+                    self._flush_requested = False
+                self._cond.notify_all()
+
+
+class AsyncBatchUploader:
+    """
+    asyncio counterpart of BatchUploader.
+
+    A worker task on the running event loop sends batches with the
+    coroutine function `send(payloads)`, by size or after
+    `flush_interval_sec`. Under the 'block' overflow policy `submit()`
+    awaits room in the queue instead of blocking a thread. Bound to the
+    event loop it is first used on.
+    """
+    def __init__(self, send, max_batch=100, flush_interval_sec=1.0, max_queue=10000,
+                 overflow="drop"):
+        """
+        Args:
+            send: Coroutine function (list of payloads) -> bool, True if delivered;
+                raises UploadRejected if the batch can never be delivered
+            max_batch: Maximum payloads per batch
+            flush_interval_sec: Longest time a payload waits for its batch to fill
+            max_queue: Maximum queued payloads before the overflow policy applies
+            overflow: 'drop' (discard new payloads) or 'block' (await room)
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+        self._send = send
+        self.max_batch = max_batch
+        self.flush_interval_sec = flush_interval_sec
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self._items = deque()  # (enqueued_at, payload)
+        self._cond = None
+        self._sending = 0
+        self._flush_requested = False
+        self._closed = False
+        self._worker = None
+        self.submitted = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.batches = 0
+
+    def _condition(self):
+        # Created lazily so it binds to the loop that uses it (Python < 3.10)
+        if self._cond is None:
+            import asyncio
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def submit(self, payload):
+        """
+        Queue one payload for upload.
+
+        Returns:
+            bool: False if the payload was dropped (queue full or uploader closed)
+        """
+        cond = self._condition()
+        async with cond:
+            if not self._closed and len(self._items) >= self.max_queue and self.overflow == "block":
+                await cond.wait_for(lambda: len(self._items) < self.max_queue or self._closed)
+            if self._closed or len(self._items) >= self.max_queue:
+                self.dropped += 1
+                return False
+            self._items.append((time.monotonic(), payload))
+            self.submitted += 1
+            self._ensure_worker()
+            cond.notify_all()
+            return True
+
+    async def flush(self):
+        """Send everything queued so far without waiting for the flush interval."""
+        cond = self._condition()
+        async with cond:
+            if not self._items and not self._sending:
+                return
+            self._flush_requested = True
+            self._ensure_worker()
+            cond.notify_all()
+            await cond.wait_for(lambda: not self._items and not self._sending)
+
+    async def close(self):
+        """Flush pending payloads and stop the worker task; later submits are dropped."""
+        await self.flush()
+        cond = self._condition()
+        async with cond:
+            self._closed = True
+            cond.notify_all()
+        if self._worker is not None:
+            await self._worker
+
+    def stats(self):
+        """Return queue depth and delivery counters."""
+        return {
+            "queued": len(self._items),
+            "sending": self._sending,
+            "max_queue": self.max_queue,
+            "overflow": self.overflow,
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "batches": self.batches
+        }
+
+    def _ensure_worker(self):
+        """Start the sender task on first use."""
+        if self._worker is None or self._worker.done():
+            import asyncio
+            self._worker = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        """Sender loop: wait for a full batch, an expired payload or a flush."""
+        import asyncio
+
+        cond = self._condition()
+        while True:
+            async with cond:
+                await cond.wait_for(lambda: self._items or self._closed)
+                if not self._items:
+                    return
+                deadline = self._items[0][0] + self.flush_interval_sec
+                while (len(self._items) < self.max_batch and not self._flush_requested
+                       and not self._closed):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        await asyncio.wait_for(cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                count = min(self.max_batch, len(self._items))
+                batch = [self._items.popleft()[1] for _ in range(count)]
+                self._sending = count
+                cond.notify_all()
+            rejected = False
+            try:
+                delivered = bool(await self._send(batch))
+            except UploadRejected:
+                delivered, rejected = False, True
+            except Exception:
+                delivered = False
+            async with cond:
+                self.batches += 1
+                if delivered:
+                    self.sent += count
+                elif rejected:
+                    self.rejected += count
+                else:
+                    self.failed += count
+                self._sending = 0
+                if not self._items:
+                    self._flush_requested = False
+                cond.notify_all()
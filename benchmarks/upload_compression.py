@@ -0,0 +1,115 @@
+"""
+Upload body compression benchmark.
+
+Builds `/evaluations/batch` bodies shaped like RAG evaluations (a prompt, a
+multi-paragraph response and several retrieved chunks of ~1 KB each) and
+reports the bytes sent and the encode time per codec and batch size.
+
+Usage:
+    python benchmarks/upload_compression.py [--docs 5] [--chunk-words 180] [--seed 7]
+
+zstd rows appear only when the `zstandard` package is installed.
+No network or OpenAI access is needed.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agentops.transport import BodyEncoder, zstd_available
+
+VOCABULARY = """
+the a of to and in for on with by from as at is are was were be has have had
+not this that these those which who will would can could may should must also
+revenue growth quarter annual report fiscal year company customers product
+market share operating margin cost expenses income net gross profit cash flow
+policy coverage claim premium deductible insured benefit exclusion limit term
+patient dose treatment adverse event clinical trial study results efficacy
+safety label indication contraindication risk warning reaction symptom
+contract party agreement clause liability termination notice obligation right
+service level availability latency request response timeout retry error
+deployment region cluster node instance storage database replica backup
+increase decrease compared previous period percent million billion total
+according section table figure appendix document page paragraph note see
+""".split()
+
+
+def make_text(rng, words):
+    """Sentence-shaped filler text drawn from a domain vocabulary."""
+    sentences, remaining = [], words
+    while remaining > 0:
+        length = min(remaining, rng.randint(8, 24))
+        sentence = " ".join(rng.choice(VOCABULARY) for _ in range(length))
+        if rng.random() < 0.3:
+            sentence += f" {rng.randint(1, 9999)}.{rng.randint(0, 99):02d}"
+        sentences.append(sentence.capitalize() + ".")
+        remaining -= length
+    return " ".join(sentences)
+
+
+def make_evaluation(rng, docs, chunk_words):
+    """One evaluation payload with the same fields AgentOps uploads."""
+    return {
+        "prompt": make_text(rng, 25),
+        "response": make_text(rng, 150),
+        "retrieved_docs": [make_text(rng, chunk_words) for _ in range(docs)],
+        "semantic_drift": round(rng.random(), 4),
+        "uncertainty": round(rng.random(), 4),
+        "factual_support": round(rng.random(), 4),
+        "hallucination_probability": round(rng.random(), 4),
+        "hallucinated": rng.random() < 0.2,
+        "latency_sec": round(rng.uniform(0.3, 2.5), 3),
+        "throughput_qps": round(rng.uniform(1, 20), 3),
+        "stage_timings": {"embedding_sec": 0.21, "judge_sec": 0.84, "fusion_sec": 0.0001},
+        "mode": "retrieval-augmented",
+        "decision_tier": "judge",
+        "sample_weight": 1.0,
+        "model_name": "gpt-4o-mini",
+        "agent_name": "support_bot",
+        "session_id": "bench-session"
+    }
+
+
+def measure(encoder, body, repeats):
+    """Return (sent bytes, milliseconds per encode)."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        data, _ = encoder.encode(body)
+    return len(data), (time.perf_counter() - start) * 1000 / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=5, help="retrieved chunks per evaluation")
+    parser.add_argument("--chunk-words", type=int, default=180, help="words per retrieved chunk")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    evaluations = [make_evaluation(rng, args.docs, args.chunk_words) for _ in range(100)]
+
+    codecs = [("none", None), ("gzip", "gzip")]
+    if zstd_available():
+        codecs.append(("zstd", "zstd"))
+
+    print(f"RAG payloads: {args.docs} chunks x {args.chunk_words} words per evaluation\n")
+    print(f"{'batch':>5}  {'codec':<5}  {'bytes':>10}  {'saved':>7}  {'ms/encode':>9}")
+    for batch_size in (1, 10, 100):
+        body = {"evaluations": evaluations[:batch_size]}
+        repeats = max(3, 300 // batch_size)
+        raw_bytes = None
+        for label, codec in codecs:
+            encoder = BodyEncoder(codec, min_bytes=0)
+            size, ms = measure(encoder, body, repeats)
+            raw_bytes = raw_bytes or size
+            saved = 1 - size / raw_bytes
+            print(f"{batch_size:>5}  {label:<5}  {size:>10,}  {saved:>6.1%}  {ms:>9.2f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -48,6 +48,15 @@ setup(
         "loguru>=0.7.2",
     ],
     extras_require={
+        "tokens": [
+            "tiktoken>=0.7.0",
+        ],
+        "http2": [
+            "h2>=4.0.0",
+        ],
+        "zstd": [
+            "zstandard>=0.22.0",
+        ],
         "dev": [
             "pytest>=7.4.0",
             "black>=23.0.0",
@@ -0,0 +1,82 @@
+"""
+Pytest configuration and fixtures
+"""
+import asyncio
+import sys
+import os
+import time
+from types import SimpleNamespace
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from agentops import detector_flexible
+
+
+class FakeOpenAI:
+    """
+    Offline stand-in for the OpenAI client.
+    
+    Embeddings are deterministic per text and the judge answers with
+    `judge_score`, or with `judge_score(prompt)` when it is callable. `delay` adds a fixed sleep to every call so tests
+    can reason about latency.
+    """
+    def __init__(self, judge_score="0.9", delay=0.0):
+        self.judge_score = judge_score
+        self.delay = delay
+        self.embedding_calls = []
+        self.chat_calls = []
+        self.embeddings = SimpleNamespace(create=self._create_embedding)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_chat))
+    
+    @staticmethod
+    def vector_for(text):
+        return [float(len(text) % 7 + 1), float(sum(map(ord, text)) % 11 + 1), 1.0]
+    
+    def embedding_reply(self, input):
+        self.embedding_calls.append(input)
+        texts = input if isinstance(input, list) else [input]
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=i, embedding=self.vector_for(t)) for i, t in enumerate(texts)
+        ])
+    
+    def chat_reply(self, messages):
+        content = messages[-1]["content"]
+        self.chat_calls.append(content)
+        reply = self.judge_score(content) if callable(self.judge_score) else self.judge_score
+        message = SimpleNamespace(content=reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+    
+    def _create_embedding(self, model, input, **kwargs):
+        time.sleep(self.delay)
+        return self.embedding_reply(input)
+    
+    def _create_chat(self, model, messages, **kwargs):
+        time.sleep(self.delay)
+        return self.chat_reply(messages)
+
+
+class FakeAsyncOpenAI:
+    """Async view of a FakeOpenAI that shares its settings and call log."""
+    def __init__(self, fake):
+        self._fake = fake
+        self.embeddings = SimpleNamespace(create=self._create_embedding)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_chat))
+    
+    async def _create_embedding(self, model, input, **kwargs):
+        await asyncio.sleep(self._fake.delay)
+        return self._fake.embedding_reply(input)
+    
+    async def _create_chat(self, model, messages, **kwargs):
+        await asyncio.sleep(self._fake.delay)
+        return self._fake.chat_reply(messages)
+
+
+@pytest.fixture
+def fake_openai():
+    """Route detector OpenAI calls to an offline fake with a clean cache."""
+    fake = FakeOpenAI()
+    detector_flexible.set_openai_client(fake, FakeAsyncOpenAI(fake))
+    detector_flexible.reset_embedding_cache()
+    yield fake
+    detector_flexible.set_openai_client(None, None)
+    detector_flexible.reset_embedding_cache()
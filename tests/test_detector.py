@@ -10,14 +10,47 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import asyncio
+import json
+import random
+import threading
+import time
 import pytest
+from agentops import detector_flexible
+from agentops.batching import EmbeddingBatcher
+from agentops.cache import EmbeddingCache, VerdictCache
+from agentops.deadlines import StagePolicy, remaining_time
+from agentops.metrics import DDSketch, ThroughputTracker
+from agentops.uncertainty import UncertaintyScorer
 from agentops.detector_flexible import (
+    EMBEDDING_MODEL,
     detect_hallucination,
+    adetect_hallucination,
+    StreamingDetection,
     uncertainty_score,
     cosine,
     get_embedding,
     reset_throughput_tracker,
-    get_throughput_stats
+    get_throughput_stats,
+    get_embeddings,
+    reset_embedding_cache,
+    get_embedding_cache_stats,
+    configure_embedding_batching,
+    get_embedding_batching_stats,
+    configure_verdict_cache,
+    get_verdict_cache_stats,
+    factual_selfcheck,
+    HashingEmbedder,
+    Embedder,
+    normalize_rows,
+    batch_cosine,
+    semantic_drift_batch,
+    select_evidence,
+    count_tokens,
+    entailment_score,
+    judge_many,
+    configure_stage_policy,
+    get_stage_policy_stats
 )
 
 
@@ -43,6 +76,32 @@ class TestUncertaintyScore:
         text = "maybe probably unsure not sure might perhaps possibly"
         score = uncertainty_score(text)
         assert score == 1.0  # Capped at 1.0
+    
+    def test_word_boundaries(self):
+        assert uncertainty_score("A mighty river flows here.") == 0.0
+        assert uncertainty_score("It MIGHT rain.") == 0.2
+    
+    def test_multiword_cue_with_extra_whitespace(self):
+        assert uncertainty_score("I am not\n  sure about that.") == 0.2
+    
+    def test_weighted_lexicon(self):
+        scorer = UncertaintyScorer({"i think": 0.1, "no idea": 0.7})
+        assert scorer.score("I think so, but I have no idea.") == pytest.approx(0.8)
+        assert uncertainty_score("I think so.", scorer=scorer) == pytest.approx(0.1)
+    
+    def test_incremental_matches_one_shot(self):
+        text = "Well, it might be mighty, or perhaps not   sure, possibly."
+        scorer = UncertaintyScorer()
+        for size in (1, 2, 3, 7):
+            stream = scorer.stream()
+            for i in range(0, len(text), size):
+                stream.feed(text[i:i + size])
+            assert stream.score() == pytest.approx(scorer.score(text))
+    
+    def test_incremental_holds_back_boundary_match(self):
+        stream = UncertaintyScorer().stream()
+        assert stream.feed("a might") == 0.2  # provisional at end of text
+        assert stream.feed("y river") == 0.0
 
 
 class TestCosineHelper:
@@ -62,6 +121,732 @@ class TestCosineHelper:
         v1 = [1, 0, 0]
         v2 = [-1, 0, 0]
         assert cosine(v1, v2) == pytest.approx(-1.0)
+    
+    def test_zero_vector(self):
+        assert cosine([0, 0, 0], [1, 0, 0]) == 0.0
+        assert cosine([0, 0], [0, 0]) == 0.0
+
+
+class TestBatchCosine:
+    """Test vectorized cosine and drift over matrices."""
+    
+    def test_matches_pairwise_cosine(self):
+        a = [[1, 0, 0], [1, 1, 0], [3, 4, 0]]
+        b = [[1, 0, 0], [0, 1, 0], [-3, -4, 0]]
+        sims = batch_cosine(a, b)
+        for i in range(3):
+            assert sims[i] == pytest.approx(cosine(a[i], b[i]), abs=1e-6)
+    
+    def test_normalized_rows_are_unit_float32(self):
+        matrix = normalize_rows([[3, 4], [0, 0]])
+        assert matrix.dtype.name == "float32"
+        assert matrix.flags["C_CONTIGUOUS"]
+        assert list(matrix[0]) == pytest.approx([0.6, 0.8])
+        assert list(matrix[1]) == [0.0, 0.0]
+    
+    def test_shared_prompt_vector(self):
+        prompt = normalize_rows([1, 0])
+        responses = normalize_rows([[1, 0], [0, 1], [-1, 0]])
+        drift = semantic_drift_batch(prompt, responses, normalized=True)
+        assert list(drift) == pytest.approx([0.0, 1.0, 1.0])
+
+
+class TestEvidenceSelection:
+    """Test relevance-ranked evidence packing for the entailment judge."""
+    
+    def test_most_relevant_chunk_first(self):
+        docs = [
+            "The company was founded in a small garage.",
+            "Aspirin commonly causes stomach upset and nausea.",
+        ]
+        selected = select_evidence("Aspirin causes nausea and stomach upset.", docs)
+        assert selected[0] == docs[1]
+    
+    def test_drops_near_duplicates(self):
+        doc = "Aspirin commonly causes stomach upset and nausea."
+        selected = select_evidence("Aspirin causes nausea.", [doc, doc + " ", "Unrelated text."])
+        assert selected.count(doc) == 1
+        assert len(selected) == 2
+    
+    def test_respects_token_budget(self):
+        docs = [f"chunk {i} about aspirin side effects " * 20 for i in range(10)]
+        selected = select_evidence("aspirin side effects", docs, token_budget=200, dedup_threshold=1.1)
+        assert sum(count_tokens(d) for d in selected) <= 200
+        assert selected
+    
+    def test_truncates_oversized_best_chunk(self):
+        selected = select_evidence("aspirin", ["aspirin " * 1000], token_budget=50)
+        assert len(selected) == 1
+        assert count_tokens(selected[0]) <= 50
+    
+    def test_relevant_late_chunk_reaches_judge(self, fake_openai):
+        filler = ["Unrelated filler paragraph about gardening. " * 30 for _ in range(5)]
+        relevant = "Penicillin was discovered by Alexander Fleming in 1928."
+        entailment_score("Fleming discovered penicillin in 1928.", filler + [relevant])
+        assert relevant in fake_openai.chat_calls[-1]
+
+
+class TestEmbeddingCache:
+    """Test the content-addressed embedding cache."""
+    
+    def test_hit_and_miss_counters(self):
+        cache = EmbeddingCache(max_size=10)
+        assert cache.get("m", "hello") is None
+        cache.put("m", "hello", [1.0, 2.0])
+        assert cache.get("m", "hello") == [1.0, 2.0]
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+    
+    def test_key_includes_model(self):
+        cache = EmbeddingCache(max_size=10)
+        cache.put("model-a", "hello", [1.0])
+        assert cache.get("model-b", "hello") is None
+    
+    def test_lru_eviction(self):
+        cache = EmbeddingCache(max_size=2)
+        cache.put("m", "a", [1.0])
+        cache.put("m", "b", [2.0])
+        cache.get("m", "a")  # 'a' becomes most recently used
+        cache.put("m", "c", [3.0])
+        assert cache.get("m", "b") is None
+        assert cache.get("m", "a") == [1.0]
+        assert cache.stats()["evictions"] == 1
+    
+    def test_ttl_expiry(self):
+        cache = EmbeddingCache(max_size=10, ttl_sec=0.0)
+        cache.put("m", "a", [1.0])
+        assert cache.get("m", "a") is None
+        assert cache.stats()["expirations"] == 1
+    
+    def test_get_embedding_uses_cache(self, fake_openai):
+        vector = fake_openai.vector_for("cached text")
+        assert get_embedding("cached text") == vector
+        assert get_embedding("cached text") == vector
+        assert fake_openai.embedding_calls == [["cached text"]]
+        
+        stats = get_embedding_cache_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+
+class TestEmbeddingBatching:
+    """Test batched embedding requests."""
+    
+    def test_one_request_per_evaluation(self, fake_openai):
+        detect_hallucination("Prompt text", "Response text", track_throughput=False)
+        assert fake_openai.embedding_calls == [["Prompt text", "Response text"]]
+    
+    def test_get_embeddings_fetches_only_misses(self, fake_openai):
+        get_embedding("a")
+        vectors = get_embeddings(["a", "b", "b"])
+        assert fake_openai.embedding_calls == [["a"], ["b"]]
+        assert vectors[1] == vectors[2] == fake_openai.vector_for("b")
+    
+    def test_coalesces_concurrent_callers(self, fake_openai):
+        from concurrent.futures import ThreadPoolExecutor
+        configure_embedding_batching(max_batch=8, max_wait_ms=50)
+        try:
+            texts = [f"text {i}" for i in range(8)]
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                vectors = list(pool.map(get_embedding, texts))
+            assert vectors == [fake_openai.vector_for(t) for t in texts]
+            assert len(fake_openai.embedding_calls) < len(texts)
+            assert get_embedding_batching_stats()["texts_sent"] == 8
+        finally:
+            configure_embedding_batching(enabled=False)
+    
+    def test_short_response_fails_waiters(self):
+        batcher = EmbeddingBatcher(lambda model, texts, client: [[1.0]], max_wait_ms=1)
+        futures = batcher.submit("m", ["a", "b"])
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result(timeout=5)
+        batcher.close()
+    
+    def test_reconfigure_stops_previous_collector(self, fake_openai):
+        configure_embedding_batching(max_batch=8, max_wait_ms=1)
+        try:
+            get_embedding("warm up")
+            first = detector_flexible._embedding_batcher
+            configure_embedding_batching(max_batch=8, max_wait_ms=1)
+            assert not first._thread.is_alive()
+            assert first.embed(EMBEDDING_MODEL, ["late"]) == [fake_openai.vector_for("late")]
+        finally:
+            configure_embedding_batching(enabled=False)
+
+    
+    def test_submit_after_close_fetches_directly(self):
+        batcher = EmbeddingBatcher(lambda model, texts, client: [[float(len(t))] for t in texts])
+        batcher.close()
+        futures = batcher.submit("m", ["ab", "abc"])
+        assert [f.result(timeout=2) for f in futures] == [[2.0], [3.0]]
+        assert batcher._thread is None
+        assert batcher.stats()["batches_sent"] == 0
+
+
+class TestLocalEmbedder:
+    """Test the local hashing embedding backend."""
+    
+    def test_identical_texts_have_no_drift(self):
+        a, b = HashingEmbedder().embed(["The cat sat.", "The cat sat."])
+        assert cosine(a, b) == pytest.approx(1.0)
+    
+    def test_related_closer_than_unrelated(self):
+        base, related, unrelated = HashingEmbedder().embed([
+            "aspirin side effects include nausea",
+            "nausea is a side effect of aspirin",
+            "the stock market closed higher today"
+        ])
+        assert cosine(base, related) > cosine(base, unrelated)
+    
+    def test_text_without_words_is_not_nan(self):
+        result = detect_hallucination("?", "?", track_throughput=False,
+                                      embedder=HashingEmbedder(), judge_score=1.0)
+        assert result["semantic_drift"] == 1.0
+        assert 0.0 <= result["hallucination_probability"] <= 1.0
+    
+    def test_embedder_is_abstract(self):
+        with pytest.raises(TypeError):
+            Embedder()
+    
+    def test_detect_without_embedding_calls(self, fake_openai):
+        result = detect_hallucination(
+            "What is Python?", "Python is a language.",
+            track_throughput=False, embedder=HashingEmbedder()
+        )
+        assert fake_openai.embedding_calls == []
+        assert 0.0 <= result["semantic_drift"] <= 1.0
+
+
+class FixedEmbedder(Embedder):
+    """Embedder returning preset prompt/response vectors."""
+    def __init__(self, prompt_vec, response_vec):
+        self.vectors = [prompt_vec, response_vec]
+    
+    def embed(self, texts):
+        return list(self.vectors)
+
+
+class TestTieredEvaluation:
+    """Test early exit before the LLM judge."""
+    
+    def test_low_risk_skips_judge(self, fake_openai):
+        result = detect_hallucination(
+            "Q?", "A.", track_throughput=False, tiered=True,
+            embedder=FixedEmbedder([1, 0], [1, 0])
+        )
+        assert fake_openai.chat_calls == []
+        assert result["decision_tier"] == "cheap"
+        assert result["factual_support"] is None
+        assert result["hallucinated"] is False
+    
+    def test_high_risk_skips_judge(self, fake_openai):
+        result = detect_hallucination(
+            "Q?", "Maybe, probably A.", track_throughput=False, tiered=True,
+            embedder=FixedEmbedder([1, 0], [0, 1])
+        )
+        assert fake_openai.chat_calls == []
+        assert result["decision_tier"] == "cheap"
+        assert result["hallucinated"] is True
+    
+    def test_undecided_calls_judge(self, fake_openai):
+        result = detect_hallucination(
+            "Q?", "A.", track_throughput=False, tiered=True,
+            embedder=FixedEmbedder([1, 0], [0.5, 0.5 * 3 ** 0.5])
+        )
+        assert len(fake_openai.chat_calls) == 1
+        assert result["decision_tier"] == "judge"
+        assert result["factual_support"] == 0.9
+    
+    def test_async_tiered(self, fake_openai):
+        result = asyncio.run(adetect_hallucination(
+            "Q?", "A.", track_throughput=False, tiered=True,
+            embedder=FixedEmbedder([1, 0], [1, 0])
+        ))
+        assert result["decision_tier"] == "cheap"
+        assert fake_openai.chat_calls == []
+
+
+class TestParallelMode:
+    """Test overlapping embedding and judge calls."""
+    
+    def test_parallel_matches_sequential(self, fake_openai):
+        sequential = detect_hallucination("Q?", "A.", track_throughput=False)
+        reset_embedding_cache()
+        parallel = detect_hallucination("Q?", "A.", track_throughput=False, parallel=True)
+        for key in ("semantic_drift", "uncertainty", "factual_support", "hallucination_probability"):
+            assert parallel[key] == sequential[key]
+    
+    def test_parallel_latency_is_slowest_call(self, fake_openai):
+        fake_openai.delay = 0.2
+        result = detect_hallucination("Q?", "A.", track_throughput=False, parallel=True)
+        # Three 0.2s calls overlap instead of adding up to 0.6s
+        assert 0.2 <= result["latency_sec"] < 0.45
+
+
+class TestVerdictCache:
+    """Test the persistent judge verdict cache."""
+    
+    def test_survives_reopen(self, tmp_path):
+        path = str(tmp_path / "verdicts.sqlite3")
+        cache = VerdictCache(path)
+        cache.put("judge", "prompt", 0.8)
+        cache.close()
+        
+        reopened = VerdictCache(path)
+        assert reopened.get("judge", "prompt") == 0.8
+        assert reopened.get("other-judge", "prompt") is None
+        reopened.close()
+    
+    def test_size_eviction(self, tmp_path):
+        cache = VerdictCache(str(tmp_path / "v.sqlite3"), max_entries=2)
+        cache.put("judge", "a", 0.1)
+        cache.put("judge", "b", 0.2)
+        cache.put("judge", "c", 0.3)
+        stats = cache.stats()
+        assert stats["size"] == 2
+        assert stats["evictions"] == 1
+        cache.close()
+    
+    def test_evicts_in_batches(self, tmp_path):
+        cache = VerdictCache(str(tmp_path / "v.sqlite3"), max_entries=100, evict_batch=10)
+        counts = []
+        count = cache._count
+        cache._count = lambda: counts.append(1) or count()
+        for i in range(101):
+            cache.put("judge", str(i), 0.5)
+        assert len(counts) == 1
+        assert cache.get("judge", "0") is None
+        for i in range(101, 111):
+            cache.put("judge", str(i), 0.5)
+        assert len(counts) == 1
+        assert cache.stats()["size"] == 100
+        assert cache.stats()["evictions"] == 11
+        cache.close()
+    
+    def test_async_lookups_run_off_the_event_loop(self, fake_openai, tmp_path, monkeypatch):
+        threads = []
+        get = VerdictCache.get
+        
+        def recording_get(self, model, prompt):
+            threads.append(threading.current_thread())
+            return get(self, model, prompt)
+        
+        monkeypatch.setattr(VerdictCache, "get", recording_get)
+        configure_verdict_cache(path=str(tmp_path / "v.sqlite3"))
+        try:
+            asyncio.run(adetect_hallucination("Q?", "A.", track_throughput=False))
+            assert threads and threading.main_thread() not in threads
+            assert get_verdict_cache_stats()["size"] == 1
+        finally:
+            configure_verdict_cache(enabled=False)
+    
+    def test_judge_calls_are_cached(self, fake_openai, tmp_path):
+        configure_verdict_cache(path=str(tmp_path / "v.sqlite3"))
+        try:
+            assert factual_selfcheck("Q?", "A.") == 0.9
+            assert factual_selfcheck("Q?", "A.") == 0.9
+            assert len(fake_openai.chat_calls) == 1
+            stats = get_verdict_cache_stats()
+            assert stats["hits"] == 1
+            assert stats["size"] == 1
+        finally:
+            configure_verdict_cache(enabled=False)
+    
+    def test_unparseable_verdict_not_cached(self, fake_openai, tmp_path):
+        fake_openai.judge_score = "no idea"
+        configure_verdict_cache(path=str(tmp_path / "v.sqlite3"))
+        try:
+            assert factual_selfcheck("Q?", "A.") == 0.5
+            assert get_verdict_cache_stats()["size"] == 0
+        finally:
+            configure_verdict_cache(enabled=False)
+
+
+class TestBatchedJudge:
+    """Test scoring several items with one judge request."""
+    
+    @staticmethod
+    def batch_reply(scores):
+        def reply(content):
+            if "### Item" not in content:
+                return "0.9"
+            return json.dumps({"scores": [{"id": i, "score": s} for i, s in scores.items()]})
+        return reply
+    
+    def test_one_request_per_batch(self, fake_openai):
+        fake_openai.judge_score = self.batch_reply({1: 0.2, 2: 0.7, 3: 1})
+        verdicts = judge_many([("Q1", "A1", None), ("Q2", "A2", ["doc"]), ("Q3", "A3", None)])
+        assert verdicts == [(0.2, "self-check"), (0.7, "retrieved-doc entailment"), (1.0, "self-check")]
+        assert len(fake_openai.chat_calls) == 1
+    
+    def test_splits_into_batch_size_requests(self, fake_openai):
+        fake_openai.judge_score = self.batch_reply({1: 0.5, 2: 0.5})
+        verdicts = judge_many([(f"Q{i}", f"A{i}", None) for i in range(4)], batch_size=2)
+        assert [score for score, _ in verdicts] == [0.5] * 4
+        assert len(fake_openai.chat_calls) == 2
+    
+    def test_invalid_entries_fall_back_to_single_calls(self, fake_openai):
+        # Item 2 is out of range and item 3 is missing
+        fake_openai.judge_score = self.batch_reply({1: 0.3, 2: 1.7})
+        verdicts = judge_many([("Q1", "A1", None), ("Q2", "A2", None), ("Q3", "A3", None)])
+        assert [score for score, _ in verdicts] == [0.3, 0.9, 0.9]
+        assert len(fake_openai.chat_calls) == 3
+    
+    def test_unparseable_reply_falls_back(self, fake_openai):
+        fake_openai.judge_score = lambda content: "scores: good" if "### Item" in content else "0.4"
+        verdicts = judge_many([("Q1", "A1", None), ("Q2", "A2", None)])
+        assert [score for score, _ in verdicts] == [0.4, 0.4]
+    
+    def test_cached_items_are_not_resent(self, fake_openai, tmp_path):
+        configure_verdict_cache(path=str(tmp_path / "v.sqlite3"))
+        try:
+            factual_selfcheck("Q1", "A1")
+            fake_openai.judge_score = self.batch_reply({1: 0.6, 2: 0.8})
+            verdicts = judge_many([("Q1", "A1", None), ("Q2", "A2", None), ("Q3", "A3", None)])
+            assert [score for score, _ in verdicts] == [0.9, 0.6, 0.8]
+            assert "Q1" not in fake_openai.chat_calls[-1]
+        finally:
+            configure_verdict_cache(enabled=False)
+    
+    def test_precomputed_judge_score(self, fake_openai):
+        result = detect_hallucination("Q?", "A.", judge_score=0.25, track_throughput=False)
+        assert result["factual_support"] == 0.25
+        assert result["mode"] == "self-check"
+        assert fake_openai.chat_calls == []
+
+
+class TestStagePolicies:
+    """Test deadlines, retries and hedged requests for detector stages."""
+    
+    def test_retries_retryable_errors(self):
+        calls = []
+        
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise TimeoutError("slow upstream")
+            return "ok"
+        
+        policy = StagePolicy(max_retries=2, backoff_base_sec=0.001, rng=random.Random(0))
+        assert policy.call(flaky) == "ok"
+        assert policy.stats()["retries"] == 2
+    
+    def test_does_not_retry_other_errors(self):
+        policy = StagePolicy(max_retries=3, backoff_base_sec=0.001)
+        with pytest.raises(ValueError):
+            policy.call(lambda: (_ for _ in ()).throw(ValueError("bad input")))
+        assert policy.stats()["retries"] == 0
+    
+    def test_backoff_is_jittered_and_capped(self):
+        policy = StagePolicy(backoff_base_sec=0.1, backoff_max_sec=0.3, rng=random.Random(1))
+        delays = [policy.backoff(attempt) for attempt in range(6)]
+        assert all(0 <= d <= 0.3 for d in delays)
+        assert len(set(delays)) == len(delays)
+    
+    def test_hedged_request_wins(self):
+        calls = []
+        
+        def sometimes_slow():
+            calls.append(1)
+            time.sleep(0.5 if len(calls) == 1 else 0.01)
+            return len(calls)
+        
+        policy = StagePolicy(hedge=True, hedge_min_samples=3)
+        for _ in range(3):
+            policy.record(0.02)
+        start = time.perf_counter()
+        policy.call(sometimes_slow)
+        assert time.perf_counter() - start < 0.3
+        stats = policy.stats()
+        assert stats["hedges"] == 1
+        assert stats["hedge_wins"] == 1
+    
+    def test_missed_deadline_returns_partial_result(self, fake_openai):
+        fake_openai.delay = 0.3
+        configure_stage_policy("judge", deadline_sec=0.1)
+        try:
+            start = time.perf_counter()
+            result = detect_hallucination("Q?", "A.", track_throughput=False, parallel=True)
+            assert time.perf_counter() - start < 0.5
+            assert result["decision_tier"] == "partial"
+            assert result["missed_deadlines"] == ["judge"]
+            assert result["factual_support"] is None
+            assert result["semantic_drift"] is not None
+            assert get_stage_policy_stats()["judge"]["deadline_misses"] == 1
+        finally:
+            configure_stage_policy("judge", enabled=False)
+    
+    def test_async_missed_deadline(self, fake_openai):
+        fake_openai.delay = 0.3
+        configure_stage_policy("embedding", deadline_sec=0.1)
+        try:
+            result = asyncio.run(adetect_hallucination("Q?", "A.", track_throughput=False))
+            assert result["missed_deadlines"] == ["embedding"]
+            assert result["semantic_drift"] is None
+            assert result["factual_support"] == 0.9
+        finally:
+            configure_stage_policy("embedding", enabled=False)
+    
+    def test_remaining_time_reaches_worker_threads(self):
+        policy = StagePolicy(deadline_sec=5.0)
+        remaining = policy.call(remaining_time)
+        assert 4.0 < remaining <= 5.0
+        assert remaining_time() is None
+    
+    def test_request_timeout_bounded_by_deadline(self, fake_openai):
+        options = []
+        fake_openai.with_options = lambda **kwargs: options.append(kwargs) or fake_openai
+        configure_stage_policy("judge", deadline_sec=2.0)
+        try:
+            detect_hallucination("Q?", "A.", track_throughput=False)
+        finally:
+            configure_stage_policy("judge", enabled=False)
+        assert len(options) == 1
+        assert 0 < options[0]["timeout"] <= 2.0
+        assert options[0]["max_retries"] == 0
+    
+    def test_deadline_bound_embeddings_skip_the_batcher(self, fake_openai):
+        options = []
+        fake_openai.with_options = lambda **kwargs: options.append(kwargs) or fake_openai
+        configure_embedding_batching(max_batch=8, max_wait_ms=1)
+        configure_stage_policy("embedding", deadline_sec=2.0)
+        try:
+            detect_hallucination("Q?", "A.", track_throughput=False)
+            assert get_embedding_batching_stats()["texts_sent"] == 0
+        finally:
+            configure_stage_policy("embedding", enabled=False)
+            configure_embedding_batching(enabled=False)
+        assert options and all(0 < o["timeout"] <= 2.0 and o["max_retries"] == 0 for o in options)
+    
+    def test_unknown_stage(self):
+        with pytest.raises(ValueError):
+            configure_stage_policy("upload", deadline_sec=1.0)
+
+
+class TestStreamingDetection:
+    """Test evaluation of responses that arrive as a token stream."""
+    
+    def test_matches_buffered_result(self, fake_openai):
+        expected = detect_hallucination("Q?", "Maybe the answer is 42.", track_throughput=False)
+        stream = StreamingDetection("Q?", track_throughput=False)
+        chunks = list(stream.consume(iter(["May", "be the ans", "wer is 42."])))
+        assert chunks == ["May", "be the ans", "wer is 42."]
+        result = stream.finish()
+        for key in ("semantic_drift", "uncertainty", "factual_support", "mode",
+                    "hallucination_probability", "hallucinated"):
+            assert result[key] == expected[key]
+        assert stream.finish() is result
+    
+    def test_prompt_embedded_before_stream_ends(self, fake_openai):
+        stream = StreamingDetection("Q?", track_throughput=False)
+        assert stream.feed("Perhaps") == pytest.approx(0.2)
+        stream._prompt_future.result()
+        assert fake_openai.embedding_calls == [["Q?"]]
+        stream.finish()
+        assert fake_openai.embedding_calls[-1] == ["Perhaps"]
+    
+    def test_latency_measured_from_stream_end(self, fake_openai):
+        fake_openai.delay = 0.2
+        stream = StreamingDetection("Q?", track_throughput=False)
+        stream.feed("A.")
+        time.sleep(0.3)
+        result = stream.finish()
+        # Response embedding and judge overlap; the prompt embedding is already done
+        assert result["latency_sec"] < 0.35
+    
+    def test_feed_after_close(self, fake_openai):
+        stream = StreamingDetection("Q?", track_throughput=False)
+        stream.feed("A.")
+        stream.close()
+        with pytest.raises(RuntimeError):
+            stream.feed("more")
+    
+    def test_async_stream(self, fake_openai):
+        async def chunks():
+            for chunk in ["Paris is ", "the capital."]:
+                yield chunk
+        
+        async def run():
+            stream = StreamingDetection("Capital of France?", ["doc"], track_throughput=False)
+            passed = [chunk async for chunk in stream.aconsume(chunks())]
+            return passed, await stream.afinish()
+        
+        passed, result = asyncio.run(run())
+        assert passed == ["Paris is ", "the capital."]
+        assert result["mode"] == "retrieved-doc entailment"
+        assert result["factual_support"] == 0.9
+
+
+class TestStageTimings:
+    """Test the per-stage latency breakdown."""
+    
+    def test_sequential_stages_reported(self, fake_openai):
+        fake_openai.delay = 0.05
+        result = detect_hallucination("Q?", "A.", track_throughput=False)
+        timings = result["stage_timings"]
+        assert set(timings) == {"embedding_sec", "judge_sec", "fusion_sec"}
+        assert timings["embedding_sec"] >= 0.05
+        assert timings["judge_sec"] >= 0.05
+        assert timings["embedding_sec"] + timings["judge_sec"] <= result["latency_sec"] + 0.002
+    
+    def test_precomputed_judge_has_no_judge_timing(self, fake_openai):
+        result = detect_hallucination("Q?", "A.", judge_score=0.5, track_throughput=False)
+        assert "judge_sec" not in result["stage_timings"]
+    
+    def test_stream_reports_each_embedding(self, fake_openai):
+        stream = StreamingDetection("Q?", track_throughput=False)
+        stream.feed("A.")
+        timings = stream.finish()["stage_timings"]
+        assert {"prompt_embedding_sec", "response_embedding_sec", "judge_sec"} <= set(timings)
+
+
+class TestThroughputMetrics:
+    """Test sharded throughput tracking, windowed QPS and latency sketches."""
+    
+    def test_sketch_quantiles_within_relative_error(self):
+        sketch = DDSketch(relative_accuracy=0.01)
+        values = [i / 1000 for i in range(1, 1001)]
+        for v in values:
+            sketch.add(v)
+        for q in (0.5, 0.95, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            assert sketch.quantile(q) == pytest.approx(exact, rel=0.011)
+    
+    def test_sketches_merge_exactly(self):
+        a, b, combined = DDSketch(), DDSketch(), DDSketch()
+        for i in range(1, 200):
+            (a if i % 2 else b).add(i / 100)
+            combined.add(i / 100)
+        a.merge(DDSketch.from_dict(b.to_dict()))
+        assert a.buckets == combined.buckets
+        assert a.quantile(0.99) == combined.quantile(0.99)
+    
+    def test_threads_record_into_shards(self):
+        tracker = ThroughputTracker()
+        threads = [threading.Thread(target=lambda: [tracker.record(0.01) for _ in range(100)])
+                   for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        snapshot = tracker.snapshot()
+        assert snapshot["total_evaluations"] == 400
+        # Exited threads are folded into the retired shard
+        assert tracker._shards == []
+        assert snapshot["windowed_qps"]["1m"] > 0
+        assert snapshot["latency_percentiles_sec"]["p99"] == pytest.approx(0.01, rel=0.011)
+    
+    def test_new_threads_retire_exited_shards(self):
+        tracker = ThroughputTracker()
+        for _ in range(50):
+            thread = threading.Thread(target=tracker.record, args=(0.01,))
+            thread.start()
+            thread.join()
+        # No reader has called snapshot(); registration alone keeps the list short
+        assert len(tracker._shards) <= 1
+        assert tracker.total_evaluations == 50
+    
+    def test_in_flight_counts_live_in_shards(self):
+        tracker = ThroughputTracker()
+        inside, release = threading.Barrier(3), threading.Event()
+        
+        def evaluate():
+            with tracker.tracking():
+                inside.wait(2)
+                release.wait(2)
+        
+        threads = [threading.Thread(target=evaluate) for _ in range(2)]
+        for t in threads:
+            t.start()
+        inside.wait(2)
+        assert [shard.in_flight for shard in tracker._shards] == [1, 1]
+        assert tracker.snapshot()["in_flight"] == 2
+        release.set()
+        for t in threads:
+            t.join()
+        snapshot = tracker.snapshot()
+        assert snapshot["in_flight"] == 0
+        assert snapshot["peak_in_flight"] == 2
+        assert snapshot["busy_time"] > 0
+    
+    def test_stats_expose_windows_and_percentiles(self, fake_openai):
+        reset_throughput_tracker()
+        for i in range(5):
+            detect_hallucination(f"Q{i}", f"A{i}", track_throughput=True)
+        stats = get_throughput_stats()
+        assert stats["total_evaluations"] == 5
+        assert set(stats["windowed_qps"]) == {"1m", "5m", "15m"}
+        assert stats["windowed_qps"]["1m"] > 0
+        assert set(stats["latency_percentiles_sec"]) == {"p50", "p95", "p99"}
+        reset_throughput_tracker()
+        assert get_throughput_stats()["latency_percentiles_sec"]["p50"] is None
+    
+    def test_concurrent_throughput_uses_wall_clock(self, fake_openai):
+        fake_openai.delay = 0.1
+        reset_throughput_tracker()
+        threads = [threading.Thread(target=detect_hallucination, args=(f"Q{i}", f"A{i}"))
+                   for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = get_throughput_stats()
+        assert stats["total_evaluations"] == 8
+        # Eight overlapping ~0.2s evaluations finish in well under 8 * 0.2s
+        assert stats["throughput_qps"] > 2 * stats["total_evaluations"] / stats["total_time_sec"]
+        assert stats["peak_in_flight"] >= 2
+        assert stats["avg_concurrency"] > 2
+        assert 0.9 <= stats["utilization"] <= 1.0
+        assert stats["in_flight"] == 0
+        reset_throughput_tracker()
+    
+    def test_in_flight_gauge(self, fake_openai):
+        fake_openai.delay = 0.2
+        reset_throughput_tracker()
+        worker = threading.Thread(target=detect_hallucination, args=("Q?", "A."))
+        worker.start()
+        time.sleep(0.1)
+        assert get_throughput_stats()["in_flight"] == 1
+        worker.join()
+        assert get_throughput_stats()["in_flight"] == 0
+        reset_throughput_tracker()
+    
+    def test_failed_evaluation_leaves_gauge(self, fake_openai):
+        reset_throughput_tracker()
+        fake_openai.chat.completions.create = lambda **kwargs: 1 / 0
+        with pytest.raises(ZeroDivisionError):
+            detect_hallucination("Q?", "A.")
+        assert get_throughput_stats()["in_flight"] == 0
+
+
+class TestAsyncDetector:
+    """Test the asyncio detector API."""
+    
+    def test_matches_sync_result(self, fake_openai):
+        sync_result = detect_hallucination("Q?", "Maybe A.", ["doc"], track_throughput=False)
+        async_result = asyncio.run(
+            adetect_hallucination("Q?", "Maybe A.", ["doc"], track_throughput=False)
+        )
+        for key in ("semantic_drift", "uncertainty", "factual_support", "mode",
+                    "hallucination_probability", "hallucinated"):
+            assert async_result[key] == sync_result[key]
+    
+    def test_does_not_block_event_loop(self, fake_openai):
+        fake_openai.delay = 0.2
+        
+        async def run_many():
+            return await asyncio.gather(*[
+                adetect_hallucination(f"Q{i}", f"A{i}", track_throughput=False)
+                for i in range(5)
+            ])
+        
+        start = time.perf_counter()
+        results = asyncio.run(run_many())
+        assert len(results) == 5
+        # Five evaluations with two 0.2s calls each run concurrently
+        assert time.perf_counter() - start < 1.0
 
 
 class TestRAGMode:
@@ -200,8 +985,8 @@ class TestReliabilityMetrics:
         assert stats["total_evaluations"] == 3
         assert stats["total_time_sec"] > 0
         assert stats["throughput_qps"] > 0
-        # Throughput should be total_evals / total_time
-        expected = 3 / stats["total_time_sec"]
+        # Throughput is completions per wall-clock second
+        expected = 3 / stats["wall_time_sec"]
         assert abs(stats["throughput_qps"] - expected) < 0.01
     
     def test_throughput_reset(self):
@@ -8,8 +8,28 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import asyncio
+import gzip
+import json
+import subprocess
 import pytest
-from agentops import AgentOps
+import random
+import threading
+import time
+from types import SimpleNamespace
+from agentops import AgentOps, AsyncAgentOps
+from agentops import detector_flexible, sampling
+from agentops.uploader import AsyncBatchUploader, BatchUploader, UploadRejected
+from agentops.transport import BodyEncoder, HttpPool
+from agentops.spool import SpoolReplayer, UploadSpool
+from agentops.documents import doc_hash
+from conftest import FakeAsyncOpenAI, FakeOpenAI
+from agentops.sampling import (
+    RateSampler,
+    ReservoirSampler,
+    StratifiedSampler,
+    AdaptiveSampler
+)
 
 
 class TestAgentOpsClient:
@@ -65,6 +85,66 @@ class TestAgentOpsClient:
         assert "latency_sec" in result
 
 
+class TestLazyInitialization:
+    """Test that importing the SDK does no client or network setup."""
+    
+    # Import-time budget for `import agentops` in a fresh interpreter
+    IMPORT_TIME_BUDGET_SEC = 0.5
+    
+    def _run(self, code):
+        env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.abspath(os.path.join(os.path.dirname(__file__), '..')),
+            env=env, capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    
+    def test_import_skips_heavy_dependencies(self):
+        loaded = self._run(
+            "import sys, agentops; "
+            "print(','.join(m for m in ('openai', 'numpy', 'httpx', 'dotenv') if m in sys.modules))"
+        )
+        assert loaded == ""
+    
+    def test_import_time_budget(self):
+        elapsed = float(self._run(
+            "import time; start = time.perf_counter(); import agentops; "
+            "print(time.perf_counter() - start)"
+        ))
+        assert elapsed < self.IMPORT_TIME_BUDGET_SEC
+    
+    def test_injected_openai_client(self, fake_openai):
+        ops = AgentOps(openai_client=fake_openai)
+        assert detector_flexible.get_openai_client() is fake_openai
+        ops.evaluate("Q?", "A.")
+        assert fake_openai.chat_calls
+    
+    def test_injected_clients_are_per_instance(self, fake_openai):
+        first, second = FakeOpenAI(), FakeOpenAI()
+        ops_a = AgentOps(openai_client=first, async_openai_client=FakeAsyncOpenAI(first), parallel=True)
+        ops_b = AgentOps(openai_client=second, async_openai_client=FakeAsyncOpenAI(second))
+        ops_a.evaluate("Q a?", "A.")
+        ops_b.evaluate("Q b?", "A.")
+        asyncio.run(ops_b.aevaluate("Q c?", "A."))
+        assert first.chat_calls and all("Q a?" in c for c in first.chat_calls)
+        assert second.chat_calls and all("Q a?" not in c for c in second.chat_calls)
+        assert len(second.chat_calls) == 2
+        assert fake_openai.chat_calls == []
+        assert detector_flexible.get_openai_client() is fake_openai
+    
+    def test_missing_half_is_built_from_openai_client(self, monkeypatch):
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        from openai import AsyncOpenAI, OpenAI
+        client, async_client = detector_flexible.resolve_openai_clients(OpenAI(api_key="sk-test"))
+        assert isinstance(async_client, AsyncOpenAI)
+        assert async_client.api_key == "sk-test"
+    
+    def test_async_instance_keeps_process_client(self, fake_openai):
+        AsyncAgentOps(async_openai_client=FakeAsyncOpenAI(FakeOpenAI()))
+        assert detector_flexible.get_openai_client() is fake_openai
+
+
 class TestSessionManagement:
     """Test session management features."""
     
@@ -127,6 +207,822 @@ class TestSessionManagement:
         # (Note: ops is still accessible but session is ended)
 
 
+class TestAsyncClient:
+    """Test the asyncio client API."""
+    
+    def test_aevaluate_in_async_context(self, fake_openai):
+        async def run():
+            async with AgentOps() as ops:
+                assert ops._session_active is True
+                result = await ops.aevaluate("What is 2+2?", "4")
+                stats = ops.metrics()
+            return ops, result, stats
+        
+        ops, result, stats = asyncio.run(run())
+        assert result["mode"] == "self-check"
+        assert stats["total_evaluations"] == 1
+        assert ops._session_active is False
+    
+    def test_instance_keeps_shared_embedding_batcher(self, fake_openai):
+        detector_flexible.configure_embedding_batching(max_batch=8, max_wait_ms=1)
+        try:
+            shared = detector_flexible._embedding_batcher
+            AgentOps(embedding_batch_size=32)
+            assert detector_flexible._embedding_batcher is shared
+            assert shared.max_batch == 8
+            assert not shared._closed
+        finally:
+            detector_flexible.configure_embedding_batching(enabled=False)
+    
+    def test_aevaluate_queues_upload(self, fake_openai, monkeypatch):
+        uploaded = []
+        monkeypatch.setattr(AgentOps, "_upload_batch", lambda self, batch: uploaded.extend(batch) or True)
+        
+        async def run():
+            async with AgentOps(api_key="k", api_url="http://api.test",
+                                upload_interval_sec=60.0) as ops:
+                await ops.aevaluate("Q?", "A.", agent_name="bot")
+                await ops.aevaluate("Q?", "A.", agent_name="bot")
+                assert uploaded == []
+            return ops
+        
+        ops = asyncio.run(run())
+        assert [p["agent_name"] for p in uploaded] == ["bot", "bot"]
+        assert ops.metrics()["uploads"]["batches"] == 1
+        ops.close()
+    
+    def test_async_and_bulk_failures_are_spooled(self, fake_openai, monkeypatch, tmp_path):
+        monkeypatch.setattr(AgentOps, "_upload_batch", lambda self, batch: False)
+        
+        async def run():
+            async with AgentOps(api_key="k", api_url="http://api.test",
+                                spool_dir=str(tmp_path)) as ops:
+                await ops.aevaluate("Q?", "A.", agent_name="async")
+                stream = ops.evaluate_stream("Q?", agent_name="stream")
+                stream.feed("A.")
+                await stream.afinish()
+            return ops
+        
+        ops = asyncio.run(run())
+        list(ops.evaluate_many([("Q?", "A.")], agent_name="bulk"))
+        ops.close()
+        names = sorted(p["agent_name"] for p in UploadSpool(str(tmp_path)).read(10)[0])
+        assert names == ["async", "bulk", "stream"]
+
+
+class TestAsyncAgentOps:
+    """Test the dedicated asyncio client."""
+    
+    @staticmethod
+    def _recording_pool(requests):
+        import httpx
+        
+        async def handler(request):
+            content = request.content
+            if request.headers.get("content-encoding") == "gzip":
+                content = gzip.decompress(content)
+            body = json.loads(content)
+            requests.append(body)
+            return httpx.Response(201, json={"count": len(body["evaluations"])})
+        
+        return HttpPool(async_transport=httpx.MockTransport(handler))
+    
+    def test_exit_flushes_queued_uploads(self, fake_openai):
+        requests = []
+        
+        async def run():
+            async with AsyncAgentOps(api_key="k", api_url="http://api.test", track_throughput=False,
+                                     upload_interval_sec=60.0,
+                                     http_pool=self._recording_pool(requests)) as ops:
+                for i in range(5):
+                    await ops.evaluate(f"Q{i}?", "A.", agent_name="bot")
+                assert requests == []
+            return ops.metrics()["uploads"]
+        
+        uploads = asyncio.run(run())
+        assert [len(r["evaluations"]) for r in requests] == [5]
+        assert uploads["sent"] == 5
+    
+    def test_concurrency_is_bounded(self, fake_openai, monkeypatch):
+        from agentops import async_client
+        fake_openai.delay = 0.01
+        active, peak = 0, 0
+        original = detector_flexible.adetect_hallucination
+        
+        async def counting(*args, **kwargs):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                active -= 1
+        
+        monkeypatch.setattr(async_client, "adetect_hallucination", counting)
+        
+        async def run():
+            async with AsyncAgentOps(track_throughput=False, max_concurrency=3) as ops:
+                tasks = [ops.submit(f"Q{i}?", "A.") for i in range(12)]
+                return await asyncio.gather(*tasks)
+        
+        results = asyncio.run(run())
+        assert len(results) == 12
+        assert peak == 3
+    
+    def test_sessions_are_per_task(self, fake_openai):
+        requests = []
+        
+        async def handle(ops, name, count):
+            session_id = ops.start_session(name)
+            for i in range(count):
+                await ops.evaluate(f"{name} Q{i}?", "A.")
+                await asyncio.sleep(0)
+            return session_id, ops.end_session()
+        
+        async def run():
+            async with AsyncAgentOps(api_key="k", api_url="http://api.test", track_throughput=False,
+                                     http_pool=self._recording_pool(requests)) as ops:
+                outcomes = await asyncio.gather(handle(ops, "a", 2), handle(ops, "b", 3))
+                assert ops.end_session() == {}
+            return outcomes
+        
+        (id_a, stats_a), (id_b, stats_b) = asyncio.run(run())
+        assert (id_a, stats_a["evaluations"]) == ("a", 2)
+        assert (id_b, stats_b["evaluations"]) == ("b", 3)
+        sessions = [e["session_id"] for r in requests for e in r["evaluations"]]
+        assert sorted(sessions) == ["a", "a", "b", "b", "b"]
+    
+    def test_sync_finish_outside_loop(self, fake_openai):
+        async def start():
+            ops = AsyncAgentOps(api_key="k", api_url="http://api.test", track_throughput=False)
+            return ops, ops.evaluate_stream("Q?")
+        
+        ops, stream = asyncio.run(start())
+        list(stream.consume(["An ", "answer."]))
+        assert stream.finish()["hallucinated"] is not None
+        assert ops.metrics()["uploads"]["submitted"] == 0
+    
+    def test_async_uploader_overflow(self):
+        async def run():
+            sent = []
+            
+            async def send(batch):
+                await asyncio.sleep(0.001)
+                sent.extend(batch)
+                return True
+            
+            dropping = AsyncBatchUploader(send, max_batch=1, max_queue=2)
+            accepted = [await dropping.submit(i) for i in range(5)]
+            await dropping.close()
+            blocking = AsyncBatchUploader(send, max_batch=1, max_queue=1, overflow="block")
+            blocked = [await blocking.submit(i) for i in range(5)]
+            await blocking.close()
+            return accepted, blocked, dropping.stats(), sent
+        
+        accepted, blocked, stats, sent = asyncio.run(run())
+        assert accepted == [True, True, False, False, False]
+        assert stats["dropped"] == 3
+        assert all(blocked)
+        assert sent[-5:] == list(range(5))
+
+
+class TestEvaluateMany:
+    """Test bounded-concurrency bulk evaluation."""
+    
+    def test_ordered_results(self, fake_openai):
+        ops = AgentOps(track_throughput=False)
+        items = [(f"Q{i}", f"A{i}") for i in range(20)]
+        indices = [index for index, _ in ops.evaluate_many(items, concurrency=4, ordered=True)]
+        assert indices == list(range(20))
+    
+    def test_unordered_results_cover_all_items(self, fake_openai):
+        ops = AgentOps(track_throughput=False)
+        items = ({"prompt": f"Q{i}", "response": f"A{i}", "retrieved_docs": ["doc"]} for i in range(20))
+        results = dict(ops.evaluate_many(items, concurrency=4))
+        assert sorted(results) == list(range(20))
+        assert all(r["mode"] == "retrieved-doc entailment" for r in results.values())
+    
+    def test_consumes_input_lazily(self, fake_openai):
+        ops = AgentOps(track_throughput=False)
+        pulled = []
+        
+        def items():
+            for i in range(1000):
+                pulled.append(i)
+                yield (f"Q{i}", f"A{i}")
+        
+        results = ops.evaluate_many(items(), concurrency=2)
+        next(results)
+        results.close()
+        assert len(pulled) <= 4
+    
+    def test_uploads_in_batches(self, fake_openai, monkeypatch):
+        batches = []
+        monkeypatch.setattr(AgentOps, "_upload_batch", lambda self, payloads: batches.append(list(payloads)))
+        ops = AgentOps(api_key="k", api_url="http://api.test", track_throughput=False)
+        items = [(f"Q{i}", f"A{i}") for i in range(25)]
+        list(ops.evaluate_many(items, concurrency=4, upload_batch_size=10, agent_name="bot"))
+        assert [len(b) for b in batches] == [10, 10, 5]
+        assert all(p["agent_name"] == "bot" for b in batches for p in b)
+    
+    def test_judge_batching(self, fake_openai):
+        fake_openai.judge_score = lambda content: json.dumps(
+            {"scores": [{"id": i, "score": 0.8} for i in range(1, 5)]}
+        )
+        ops = AgentOps(track_throughput=False)
+        items = [(f"Q{i}", f"A{i}") for i in range(10)]
+        results = list(ops.evaluate_many(items, concurrency=2, ordered=True, judge_batch_size=4))
+        assert [index for index, _ in results] == list(range(10))
+        assert all(r["factual_support"] == 0.8 for _, r in results)
+        assert len(fake_openai.chat_calls) == 3
+    
+    def test_batched_judge_time_is_shared_out(self, fake_openai):
+        fake_openai.judge_score = lambda content: json.dumps(
+            {"scores": [{"id": i, "score": 0.8} for i in range(1, 5)]}
+        )
+        fake_openai.delay = 0.04
+        ops = AgentOps(track_throughput=False)
+        items = [(f"Q{i}", f"A{i}") for i in range(4)]
+        results = [r for _, r in ops.evaluate_many(items, concurrency=1, judge_batch_size=4)]
+        for result in results:
+            timings = result["stage_timings"]
+            assert timings["judge_sec"] == pytest.approx(0.01, abs=0.005)
+            assert result["latency_sec"] >= timings["judge_sec"] + timings["embedding_sec"]
+
+
+class TestStageTimingUpload:
+    """Test that stage timings travel with uploaded evaluations."""
+    
+    def test_timings_in_payload_and_upload_time_in_result(self, fake_openai, monkeypatch):
+        payloads = []
+        monkeypatch.setattr(AgentOps, "_upload_batch", lambda self, batch: payloads.extend(batch) or True)
+        ops = AgentOps(api_key="k", api_url="http://api.test", track_throughput=False)
+        result = ops.evaluate("Q?", "A.")
+        ops.close()
+        assert "judge_sec" in payloads[0]["stage_timings"]
+        assert "upload_sec" in result["stage_timings"]
+    
+    def test_cached_result_passes_api_validation(self, fake_openai, monkeypatch):
+        pytest.importorskip("pydantic")
+        monkeypatch.syspath_prepend(os.path.join(os.path.dirname(__file__), '..', 'agentops-api'))
+        from app.models.evaluation import EvaluationCreate
+        payloads = []
+        monkeypatch.setattr(AgentOps, "_upload_batch", lambda self, batch: payloads.extend(batch) or True)
+        ops = AgentOps(api_key="k", api_url="http://api.test", track_throughput=False)
+        for _ in range(5):
+            ops.evaluate("Q?", "A.")
+        ops.close()
+        assert payloads[-1]["latency_sec"] > 0
+        for payload in payloads:
+            EvaluationCreate(**payload)
+
+
+class TestBackgroundUploads:
+    """Test the background upload queue."""
+    
+    def test_evaluate_does_not_wait_for_upload(self, fake_openai, monkeypatch):
+        release = threading.Event()
+        batches = []
+        
+        def slow_upload(self, batch):
+            release.wait(5)
+            batches.append(list(batch))
+            return True
+        
+        monkeypatch.setattr(AgentOps, "_upload_batch", slow_upload)
+        with AgentOps(api_key="k", api_url="http://api.test", track_throughput=False,
+                      upload_interval_sec=60.0) as ops:
+            for i in range(3):
+                ops.evaluate(f"Q{i}?", "A.")
+            assert batches == []
+            release.set()
+        # Leaving the block flushed the queue without waiting for the interval
+        assert sum(len(b) for b in batches) == 3
+        assert ops.metrics()["uploads"]["sent"] == 3
+    
+    def test_batches_by_size(self, fake_openai, monkeypatch):
+        batches = []
+        monkeypatch.setattr(AgentOps, "_upload_batch", lambda self, batch: batches.append(list(batch)) or True)
+        ops = AgentOps(api_key="k", api_url="http://api.test", track_throughput=False,
+                       upload_batch_size=2, upload_interval_sec=60.0)
+        for i in range(5):
+            ops.evaluate(f"Q{i}?", "A.")
+        ops.close()
+        assert [len(b) for b in batches] == [2, 2, 1]
+    
+    def test_batches_by_time(self, fake_openai, monkeypatch):
+        sent = threading.Event()
+        monkeypatch.setattr(AgentOps, "_upload_batch", lambda self, batch: sent.set() or True)
+        ops = AgentOps(api_key="k", api_url="http://api.test", track_throughput=False,
+                       upload_interval_sec=0.05)
+        ops.evaluate("Q?", "A.")
+        assert sent.wait(2)
+        ops.close()
+    
+    def test_concurrent_first_uploads_share_one_uploader(self, fake_openai, monkeypatch):
+        monkeypatch.setattr(AgentOps, "_upload_batch", lambda self, batch: True)
+        ops = AgentOps(api_key="k", api_url="http://api.test", track_throughput=False)
+        start = threading.Barrier(8)
+        
+        def first_upload():
+            start.wait(2)
+            return ops._get_uploader()
+        
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            uploaders = list(pool.map(lambda _: first_upload(), range(8)))
+        assert all(uploader is uploaders[0] for uploader in uploaders)
+        ops.close()
+    
+    def test_drop_overflow(self):
+        release = threading.Event()
+        uploader = BatchUploader(lambda batch: release.wait(5), max_batch=1, max_queue=2)
+        results = [uploader.submit(i) for i in range(10)]
+        release.set()
+        uploader.close()
+        stats = uploader.stats()
+        assert results.count(False) == stats["dropped"] > 0
+        assert stats["sent"] + stats["dropped"] == 10
+    
+    def test_block_overflow(self):
+        sent = []
+        uploader = BatchUploader(lambda batch: sent.extend(batch) or True, max_batch=1,
+                                 max_queue=1, overflow="block")
+        assert all(uploader.submit(i) for i in range(20))
+        uploader.close()
+        assert sent == list(range(20))
+        assert uploader.stats()["dropped"] == 0
+    
+    def test_failed_batches_are_counted(self):
+        uploader = BatchUploader(lambda batch: False)
+        uploader.submit({"a": 1})
+        assert uploader.flush(timeout=2)
+        assert uploader.stats()["failed"] == 1
+        uploader.close()
+        assert uploader.submit({"a": 2}) is False
+    
+    def test_rejected_batches_are_not_spilled(self):
+        def send(batch):
+            raise UploadRejected(422, "bad payload")
+        
+        spilled = []
+        uploader = BatchUploader(send, spill=spilled.extend)
+        uploader.submit({"a": 1})
+        assert uploader.flush(timeout=2)
+        uploader.close()
+        stats = uploader.stats()
+        assert stats["rejected"] == 1
+        assert stats["failed"] == 0
+        assert spilled == []
+    
+    def test_spill_runs_without_the_queue_lock(self):
+        lock_free = []
+        
+        def probe():
+            acquired = uploader._cond.acquire(timeout=1)
+            if acquired:
+                uploader._cond.release()
+            lock_free.append(acquired)
+        
+        def spill(payloads):
+            # The lock is reentrant, so probe it from another thread
+            thread = threading.Thread(target=probe)
+            thread.start()
+            thread.join()
+        
+        uploader = BatchUploader(lambda batch: False, max_queue=1, spill=spill, flush_interval_sec=60.0)
+        uploader.submit({"a": 1})
+        uploader.submit({"a": 2})  # queue full: spilled from submit()
+        assert uploader.flush(timeout=2)  # failed send: spilled from the sender
+        uploader.submit({"a": 3})
+        uploader.close()  # still queued: spilled from close()
+        assert lock_free == [True, True, True]
+
+
+class TestHttpPool:
+    """Test pooled HTTP connections for uploads."""
+    
+    @staticmethod
+    def _recording_pool(requests):
+        import httpx
+        
+        def handler(request):
+            content = request.content
+            if request.headers.get("content-encoding") == "gzip":
+                content = gzip.decompress(content)
+            body = json.loads(content)
+            requests.append(body)
+            return httpx.Response(201, json={"count": len(body["evaluations"])})
+        
+        return HttpPool(transport=httpx.MockTransport(handler))
+    
+    def test_uploads_reuse_one_client(self, fake_openai):
+        requests = []
+        pool = self._recording_pool(requests)
+        ops = AgentOps(api_key="k", api_url="http://api.test", track_throughput=False,
+                       http_pool=pool, upload_batch_size=1)
+        for i in range(3):
+            ops.evaluate(f"Q{i}?", "A.")
+        ops.flush()
+        assert len(requests) == 3
+        stats = ops.metrics()["http"]
+        assert stats["clients_opened"] == 1
+        assert stats["requests"] == 3
+        assert ops.metrics()["uploads"]["sent"] == 3
+    
+    def test_shared_pool_survives_instance_close(self, fake_openai):
+        requests = []
+        pool = self._recording_pool(requests)
+        first = AgentOps(api_key="k", api_url="http://api.test", http_pool=pool)
+        second = AgentOps(api_key="k", api_url="http://api.test", http_pool=pool)
+        first.evaluate("Q1?", "A.")
+        first.close()
+        second.evaluate("Q2?", "A.")
+        second.close()
+        assert len(requests) == 2
+        assert pool.stats()["clients_opened"] == 1
+        pool.close()
+    
+    def test_http2_falls_back_without_h2(self, monkeypatch):
+        from agentops import transport
+        monkeypatch.setattr(transport, "http2_available", lambda: False)
+        assert HttpPool(http2=True).http2 is False
+    
+    def test_large_batches_are_gzipped(self, fake_openai):
+        requests = []
+        ops = AgentOps(api_key="k", api_url="http://api.test", track_throughput=False,
+                       http_pool=self._recording_pool(requests), upload_compression="gzip")
+        docs = [f"Document {i} about the quarterly revenue report and its footnotes." for i in range(20)]
+        ops.evaluate("Q?", "A.", retrieved_docs=docs)
+        ops.flush()
+        sent = requests[0]
+        assert sent["evaluations"][0]["retrieved_docs"] == docs
+        stats = ops.metrics()["compression"]
+        assert stats["compressed"] == 1
+        assert stats["sent_bytes"] < stats["raw_bytes"]
+        ops.close()
+    
+    def test_client_errors_are_permanent(self, fake_openai):
+        import httpx
+        
+        statuses = iter([422, 429, 201])
+        
+        def handler(request):
+            status = next(statuses)
+            return httpx.Response(status, json={"count": 1} if status == 201 else {"detail": "no"})
+        
+        ops = AgentOps(api_key="k", api_url="http://api.test", track_throughput=False,
+                       http_pool=HttpPool(transport=httpx.MockTransport(handler)))
+        payloads = [{"prompt": "Q?"}]
+        with pytest.raises(UploadRejected) as excinfo:
+            ops._upload_batch(payloads)
+        assert excinfo.value.status_code == 422
+        assert ops._upload_batch(payloads) is False
+        assert ops._upload_batch(payloads) is True
+        ops.close()
+
+
+class TestDocumentDedupe:
+    """Test content-addressed upload of retrieved docs."""
+    
+    @staticmethod
+    def _server(requests, stored):
+        """Mock API that stores documents and rejects unknown hashes with 409."""
+        import httpx
+        
+        def handler(request):
+            content = request.content
+            if request.headers.get("content-encoding") == "gzip":
+                content = gzip.decompress(content)
+            body = json.loads(content)
+            requests.append(body)
+            documents = body.get("documents") or {}
+            assert all(doc_hash(text) == h for h, text in documents.items())
+            referenced = {h for e in body["evaluations"] for h in e.get("retrieved_doc_hashes") or []}
+            missing = sorted(referenced - stored - documents.keys())
+            if missing:
+                return httpx.Response(409, json={"detail": {"missing_hashes": missing}})
+            stored.update(documents)
+            return httpx.Response(201, json={"count": len(body["evaluations"])})
+        
+        return HttpPool(transport=httpx.MockTransport(handler))
+    
+    def test_known_chunks_are_sent_once(self, fake_openai):
+        requests, stored = [], set()
+        ops = AgentOps(api_key="k", api_url="http://api.test", track_throughput=False,
+                       http_pool=self._server(requests, stored), dedupe_docs=True)
+        docs = ["Refunds are issued within 14 days.", "Shipping is free over $50."]
+        ops.evaluate("Q1?", "A.", retrieved_docs=docs)
+        ops.flush()
+        ops.evaluate("Q2?", "A.", retrieved_docs=docs + ["Returns need a receipt."])
+        ops.flush()
+        assert len(requests) == 2
+        assert len(requests[0]["documents"]) == 2
+        assert list(requests[1]["documents"].values()) == ["Returns need a receipt."]
+        assert all(e["retrieved_docs"] is None for r in requests for e in r["evaluations"])
+        stats = ops.metrics()["documents"]
+        assert stats["hits"] == 2
+        assert stats["size"] == 3
+        ops.close()
+    
+    def test_missing_hashes_are_resent(self, fake_openai):
+        requests, stored = [], set()
+        ops = AgentOps(api_key="k", api_url="http://api.test", track_throughput=False,
+                       http_pool=self._server(requests, stored), dedupe_docs=True)
+        docs = ["Refunds are issued within 14 days."]
+        ops.evaluate("Q1?", "A.", retrieved_docs=docs)
+        ops.flush()
+        stored.clear()  # the API lost its documents
+        ops.evaluate("Q2?", "A.", retrieved_docs=docs)
+        ops.flush()
+        assert "documents" not in requests[1]
+        assert list(requests[2]["documents"].values()) == docs
+        assert ops.metrics()["uploads"]["sent"] == 2
+        ops.close()
+    
+    def test_async_client_resends_missing_hashes(self, fake_openai):
+        import httpx
+        requests, stored = [], set()
+        sync_pool = self._server(requests, stored)
+        
+        async def handler(request):
+            return sync_pool._transport.handle_request(request)
+        
+        async def run():
+            async with AsyncAgentOps(api_key="k", api_url="http://api.test", track_throughput=False,
+                                     http_pool=HttpPool(async_transport=httpx.MockTransport(handler)),
+                                     dedupe_docs=True) as ops:
+                await ops.evaluate("Q1?", "A.", retrieved_docs=["chunk"])
+                await ops.flush()
+                stored.clear()
+                await ops.evaluate("Q2?", "A.", retrieved_docs=["chunk"])
+            return ops.metrics()["uploads"]
+        
+        uploads = asyncio.run(run())
+        assert "documents" not in requests[1]
+        assert list(requests[2]["documents"].values()) == ["chunk"]
+        assert uploads["sent"] == 2
+    
+    def test_dedupe_is_opt_in(self, fake_openai):
+        requests = []
+        ops = AgentOps(api_key="k", api_url="http://api.test", track_throughput=False,
+                       http_pool=self._server(requests, set()))
+        ops.evaluate("Q?", "A.", retrieved_docs=["chunk"])
+        ops.close()
+        assert requests[0]["evaluations"][0]["retrieved_docs"] == ["chunk"]
+        assert "documents" not in ops.metrics()
+
+
+class TestBodyEncoder:
+    """Test upload body compression."""
+    
+    def test_small_bodies_stay_plain(self):
+        body, headers = BodyEncoder("gzip", min_bytes=1024).encode({"a": 1})
+        assert json.loads(body) == {"a": 1}
+        assert "Content-Encoding" not in headers
+    
+    def test_large_bodies_are_compressed(self):
+        payload = {"evaluations": [{"retrieved_docs": ["same chunk of text"] * 200}]}
+        body, headers = BodyEncoder("gzip", min_bytes=1024).encode(payload)
+        assert headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(body)) == payload
+    
+    def test_compression_can_be_disabled(self):
+        body, headers = BodyEncoder(None).encode({"x": "y" * 5000})
+        assert "Content-Encoding" not in headers
+    
+    def test_clients_do_not_compress_by_default(self, fake_openai):
+        assert AgentOps().metrics()["compression"]["compression"] is None
+        assert AsyncAgentOps().metrics()["compression"]["compression"] is None
+    
+    def test_zstd_falls_back_to_gzip_without_zstandard(self, monkeypatch):
+        from agentops import transport
+        monkeypatch.setattr(transport, "zstd_available", lambda: False)
+        assert BodyEncoder("zstd").compression == "gzip"
+
+
+class TestUploadSpool:
+    """Test the durable upload spool."""
+    
+    def test_records_survive_reopen(self, tmp_path):
+        spool = UploadSpool(str(tmp_path))
+        spool.append([{"i": i} for i in range(5)])
+        spool.close()
+        reopened = UploadSpool(str(tmp_path))
+        assert reopened.depth == 5
+        payloads, _, cursor = reopened.read(3)
+        assert payloads == [{"i": 0}, {"i": 1}, {"i": 2}]
+        reopened.ack(cursor, 3)
+        assert [p["i"] for p in UploadSpool(str(tmp_path)).read(10)[0]] == [3, 4]
+    
+    def test_torn_tail_is_truncated(self, tmp_path):
+        spool = UploadSpool(str(tmp_path))
+        spool.append([{"i": 0}, {"i": 1}])
+        spool.close()
+        segment = next(tmp_path.glob("*.seg"))
+        segment.write_bytes(segment.read_bytes()[:-3])
+        reopened = UploadSpool(str(tmp_path))
+        assert reopened.depth == 1
+        reopened.append([{"i": 2}])
+        assert [p["i"] for p in reopened.read(10)[0]] == [0, 2]
+    
+    def test_rotation_and_disk_budget(self, tmp_path):
+        spool = UploadSpool(str(tmp_path), segment_max_bytes=200, max_bytes=600)
+        for i in range(40):
+            spool.append([{"i": i, "pad": "x" * 40}])
+        stats = spool.stats()
+        assert stats["segments"] > 1
+        assert stats["bytes"] <= 600 + 200
+        assert stats["dropped"] > 0
+        assert stats["depth"] == 40 - stats["dropped"]
+        payloads = spool.read(100)[0]
+        assert len(payloads) == stats["depth"]
+        assert payloads[-1]["i"] == 39
+    
+    def test_ack_after_budget_drop_is_ignored(self, tmp_path):
+        spool = UploadSpool(str(tmp_path), segment_max_bytes=200, max_bytes=600)
+        spool.append([{"i": i, "pad": "x" * 40} for i in range(3)])
+        _, _, stale = spool.read(3)
+        for i in range(3, 40):
+            spool.append([{"i": i, "pad": "x" * 40}])  # drops the segment being sent
+        assert spool.ack(stale, 3) == 0
+        stats = spool.stats()
+        assert stats["acked"] == 0
+        assert stats["dropped"] + stats["depth"] == 40
+        payloads, _, cursor = spool.read(100)
+        assert len(payloads) == stats["depth"]
+        assert payloads[-1]["i"] == 39
+        assert spool.ack(cursor, len(payloads)) == len(payloads)
+        assert spool.depth == 0
+    
+    def test_replayer_backs_off_then_delivers(self, tmp_path):
+        spool = UploadSpool(str(tmp_path))
+        spool.append([{"i": i} for i in range(3)])
+        attempts, delivered = [], []
+        
+        def send(payloads):
+            attempts.append(len(payloads))
+            if len(attempts) < 3:
+                return False
+            delivered.extend(payloads)
+            return True
+        
+        replayer = SpoolReplayer(spool, send, backoff_base_sec=0.01, idle_wait_sec=0.01)
+        replayer.start()
+        deadline = time.monotonic() + 5
+        while spool.depth and time.monotonic() < deadline:
+            time.sleep(0.01)
+        replayer.stop()
+        assert delivered == [{"i": 0}, {"i": 1}, {"i": 2}]
+        assert replayer.stats()["replay_failures"] == 2
+        assert spool.stats()["replay_lag_sec"] == 0.0
+    
+    def test_replayer_drops_rejected_batches(self, tmp_path):
+        spool = UploadSpool(str(tmp_path))
+        spool.append([{"i": 0}, {"i": 1}])
+        spool.append([{"i": 2}])
+        delivered = []
+        
+        def send(payloads):
+            if payloads[0]["i"] == 0:
+                raise UploadRejected(400)
+            delivered.extend(payloads)
+            return True
+        
+        replayer = SpoolReplayer(spool, send, batch_size=2, backoff_base_sec=0.01, idle_wait_sec=0.01)
+        replayer.start()
+        deadline = time.monotonic() + 5
+        while spool.depth and time.monotonic() < deadline:
+            time.sleep(0.01)
+        replayer.stop()
+        assert delivered == [{"i": 2}]
+        stats = replayer.stats()
+        assert stats["replay_rejected"] == 2
+        assert stats["replay_failures"] == 0
+    
+    def test_failed_uploads_are_replayed_after_restart(self, fake_openai, monkeypatch, tmp_path):
+        monkeypatch.setattr(AgentOps, "_upload_batch", lambda self, batch: False)
+        ops = AgentOps(api_key="k", api_url="http://api.test", track_throughput=False,
+                       spool_dir=str(tmp_path))
+        ops.evaluate("Q?", "A.", agent_name="bot")
+        ops.close()
+        assert UploadSpool(str(tmp_path)).depth == 1
+        
+        delivered = []
+        monkeypatch.setattr(AgentOps, "_upload_batch", lambda self, batch: delivered.extend(batch) or True)
+        ops = AgentOps(api_key="k", api_url="http://api.test", spool_dir=str(tmp_path))
+        deadline = time.monotonic() + 5
+        while ops.metrics()["spool"]["depth"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert delivered[0]["agent_name"] == "bot"
+        assert ops.metrics()["spool"]["replayed"] == 1
+        ops.close()
+
+
+class TestEvaluateStream:
+    """Test SDK evaluation of streamed responses."""
+    
+    def test_uploads_when_finished(self, fake_openai, monkeypatch):
+        payloads = []
+        monkeypatch.setattr(AgentOps, "_upload_batch", lambda self, batch: payloads.extend(batch) or True)
+        ops = AgentOps(api_key="k", api_url="http://api.test", track_throughput=False)
+        stream = ops.evaluate_stream("Q?", agent_name="bot")
+        for chunk in stream.consume(["An", "swer."]):
+            pass
+        result = stream.finish()
+        ops.flush()
+        assert result["hallucinated"] in (True, False)
+        assert payloads[0]["response"] == "Answer."
+        assert payloads[0]["agent_name"] == "bot"
+    
+    def test_sampled_out_stream_passes_chunks(self, fake_openai):
+        class Never(RateSampler):
+            def sample(self, agent_name=None, model_name=None):
+                return None
+        
+        ops = AgentOps(track_throughput=False, sampler=Never(1.0))
+        stream = ops.evaluate_stream("Q?")
+        assert list(stream.consume(["a", "b"])) == ["a", "b"]
+        assert stream.finish()["sampled"] is False
+        assert fake_openai.embedding_calls == []
+        assert fake_openai.chat_calls == []
+
+
+class TestSampling:
+    """Test traffic sampling policies."""
+    
+    def test_rate_sampler_weights(self):
+        sampler = RateSampler(0.25, rng=random.Random(0))
+        decisions = [sampler.sample() for _ in range(4000)]
+        kept = [w for w in decisions if w is not None]
+        assert 800 < len(kept) < 1200
+        assert all(w == 4.0 for w in kept)
+    
+    def test_reservoir_keeps_about_k_per_window(self, monkeypatch):
+        now = [0.0]
+        monkeypatch.setattr(sampling, "time", SimpleNamespace(monotonic=lambda: now[0]))
+        sampler = ReservoirSampler(k=10, window_sec=60, rng=random.Random(0))
+        for _ in range(1000):
+            sampler.sample()
+        now[0] = 60.0
+        kept = [w for w in (sampler.sample() for _ in range(1000)) if w is not None]
+        assert 3 <= len(kept) <= 20
+    
+    def test_reservoir_weights_sum_to_arrivals(self, monkeypatch):
+        now = [0.0]
+        monkeypatch.setattr(sampling, "time", SimpleNamespace(monotonic=lambda: now[0]))
+        # First window, steady state, a 10x surge and a window after a gap
+        arrivals = [1000, 1000, 10000, 1000]
+        starts = [0.0, 60.0, 120.0, 300.0]
+        totals = [0.0] * len(arrivals)
+        runs = 200
+        for seed in range(runs):
+            sampler = ReservoirSampler(k=10, window_sec=60, rng=random.Random(seed))
+            for i, (count, start) in enumerate(zip(arrivals, starts)):
+                now[0] = start
+                totals[i] += sum(w for w in (sampler.sample() for _ in range(count)) if w is not None)
+        for total, count in zip(totals, arrivals):
+            assert total / runs == pytest.approx(count, rel=0.1)
+    
+    def test_stratified_samples_each_agent(self):
+        sampler = StratifiedSampler(lambda: ReservoirSampler(k=2, window_sec=60))
+        for _ in range(50):
+            sampler.sample(agent_name="busy")
+        assert sampler.sample(agent_name="quiet") is not None
+        assert set(sampler.stats()["strata"]) == {"busy/None", "quiet/None"}
+    
+    def test_adaptive_upsamples_on_hallucinations(self):
+        sampler = AdaptiveSampler(base_rate=0.1, max_rate=1.0, alpha=0.5)
+        assert sampler.rate == pytest.approx(0.1)
+        for _ in range(10):
+            sampler.observe({"hallucinated": True})
+        assert sampler.rate == pytest.approx(1.0, abs=0.01)
+    
+    def test_skipped_calls_return_immediately(self, fake_openai, monkeypatch):
+        from agentops import client
+        ops = AgentOps(sampler=RateSampler(1e-9, rng=random.Random(0)))
+        ops.reset_metrics()
+        # A skip must not build the full metrics snapshot
+        monkeypatch.setattr(client, "get_throughput_stats", lambda: 1 / 0)
+        result = ops.evaluate("Q?", "A.")
+        monkeypatch.undo()
+        assert result["sampled"] is False
+        assert result["hallucinated"] is None
+        assert fake_openai.embedding_calls == []
+        stats = ops.metrics()
+        assert stats["skipped_evaluations"] == 1
+        assert stats["total_requests"] == 1
+    
+    def test_sample_weight_uploaded(self, fake_openai, monkeypatch):
+        payloads = []
+        monkeypatch.setattr(AgentOps, "_upload_batch", lambda self, batch: payloads.extend(batch) or True)
+        ops = AgentOps(api_key="k", api_url="http://api.test", sampler=RateSampler(1.0))
+        result = ops.evaluate("Q?", "A.")
+        ops.flush()
+        assert result["sampled"] is True
+        assert payloads[0]["sample_weight"] == 1.0
+
+
 class TestMetrics:
     """Test metrics retrieval."""
     
@@ -141,6 +1037,8 @@ class TestMetrics:
         assert "total_time_sec" in stats
         assert "throughput_qps" in stats
         assert stats["total_evaluations"] == 0
+        assert "hits" in stats["embedding_cache"]
+        assert "evictions" in stats["embedding_cache"]
 
 
 if __name__ == "__main__":